@@ -1,10 +1,12 @@
 /**
  * 画像ストア実装
  *
- * インメモリで画像データを保存し、MCPリソースURIを生成する。
+ * インメモリで画像の参照を保存し、MCPリソースURIを生成する。
+ * 画像データは読み取られた時点で jupyter-server の画像ストアから取得する。
  */
 
 import { randomUUID } from "crypto";
+import { jupyterClient } from "../jupyter-client/client.js";
 import type { StoredImage, ImageReference, ImageOutput } from "./types.js";
 import { buildResourceUri, extractImageIdFromUri } from "./uri-utils.js";
 
@@ -34,7 +36,7 @@ class ImageStore {
     if (!sessionId || typeof sessionId !== 'string') {
       throw new Error('Invalid sessionId');
     }
-    if (!imageData || !imageData.mime_type || !imageData.data) {
+    if (!imageData || !imageData.mime_type || (!imageData.data && !imageData.sha256)) {
       throw new Error('Invalid imageData');
     }
 
@@ -58,6 +60,7 @@ class ImageStore {
       sessionId,
       mimeType: imageData.mime_type,
       data: imageData.data,
+      sha256: imageData.sha256,
       width: imageData.width,
       height: imageData.height,
       createdAt: new Date(),
@@ -96,6 +99,24 @@ class ImageStore {
     return this.images.get(imageId);
   }
 
+  /**
+   * リソースURIから画像データを取得（未取得の場合は jupyter-server から取得する）
+   *
+   * @param resourceUri MCPリソースURI
+   * @returns data を含む StoredImage または undefined
+   * @throws Error resourceUri が無効な形式の場合・画像を取得できない場合
+   */
+  async load(resourceUri: string): Promise<StoredImage | undefined> {
+    const image = this.get(resourceUri);
+    if (!image || image.data || !image.sha256) {
+      return image;
+    }
+
+    const fetched = await jupyterClient.getImage(image.sha256);
+    image.data = fetched.data;
+    return image;
+  }
+
   /**
    * 全セッションの全画像を取得
    *
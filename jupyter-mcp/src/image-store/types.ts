@@ -12,8 +12,10 @@ export interface StoredImage {
   sessionId: string;
   /** MIMEタイプ（例: image/png） */
   mimeType: string;
-  /** base64エンコードされた画像データ */
-  data: string;
+  /** base64エンコードされた画像データ（未取得の場合は undefined） */
+  data?: string;
+  /** jupyter-server の画像ストアでのSHA-256（data が無い場合はこれで取得する） */
+  sha256?: string;
   /** 画像の幅（ピクセル、オプション） */
   width?: number;
   /** 画像の高さ（ピクセル、オプション） */
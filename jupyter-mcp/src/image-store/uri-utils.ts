@@ -26,8 +26,10 @@ export function getExtensionFromMimeType(mimeType: string): string {
   const mapping: Record<string, string> = {
     "image/png": "png",
     "image/jpeg": "jpg",
+    "image/webp": "webp",
     "image/svg+xml": "svg",
     "image/gif": "gif",
+    "application/vnd.plotly.v1+json": "json",
   };
 
   return mapping[mimeType] || "png";
@@ -191,6 +191,29 @@ export class JupyterClient {
     return response.data;
   }
 
+  // ===========================================================================
+  // 画像
+  // ===========================================================================
+
+  // 画像ストアの画像を取得（base64）
+  async getImage(sha256: string): Promise<{ mimeType: string; data: string }> {
+    try {
+      const response = await this.axios.get<ArrayBuffer>(`/api/images/${sha256}`, {
+        responseType: 'arraybuffer',
+      });
+      return {
+        mimeType: String(response.headers['content-type'] ?? ''),
+        data: Buffer.from(response.data).toString('base64'),
+      };
+    } catch (error) {
+      if (error instanceof AxiosError && error.response?.status === 404) {
+        // 保持期間（IMAGE_STORE_MAX_AGE）を過ぎた画像
+        throw new JupyterClientError(`画像が見つかりません: ${sha256}`, 'NOT_FOUND', 404);
+      }
+      throw this.handleError(error);
+    }
+  }
+
   // ===========================================================================
   // 変数管理
   // ===========================================================================
@@ -61,6 +61,10 @@ export interface CreateSessionRequest {
 export interface ExecuteRequest {
   code: string;
   timeout?: number;
+  inline_images?: boolean;
+  image_format?: 'original' | 'png' | 'jpeg' | 'webp';
+  image_max_size?: number;
+  image_quality?: number;
 }
 
 export interface Output {
@@ -71,7 +75,11 @@ export interface Output {
 export interface ImageOutput {
   id: string;
   mime_type: string;
-  data: string;
+  // base64（inline_images: true の場合のみ）
+  data?: string;
+  sha256?: string;
+  size?: number;
+  url?: string;
   width?: number;
   height?: number;
 }
@@ -50,11 +50,13 @@ export function listResources(uriPrefix?: string): { resources: Resource[] } {
  * @returns MCP BlobResourceContents
  * @throws Error 画像が見つからない場合
  */
-export function readResource(uri: string): { contents: Array<{ uri: string; mimeType: string; blob: string }> } {
+export async function readResource(
+  uri: string
+): Promise<{ contents: Array<{ uri: string; mimeType: string; blob: string }> }> {
   // 画像データを取得
-  const image = imageStore.get(uri);
+  const image = await imageStore.load(uri);
 
-  if (!image) {
+  if (!image || !image.data) {
     throw new Error(`Image not found: ${uri}`);
   }
 
@@ -14,6 +14,10 @@ import { validateStringParameter } from "../utils/validation.js";
 import { resolveKernelId } from "../utils/session-resolver.js";
 import { imageStore } from "../image-store/index.js";
 
+// LLM に渡す画像はサーバー側で縮小・圧縮する（長辺のピクセル数と形式）
+const IMAGE_MAX_SIZE = 1024;
+const IMAGE_FORMAT = "webp";
+
 interface ExecuteCodeArgs {
   session_id: string;
   code: string;
@@ -92,6 +96,8 @@ export async function executeExecuteCode(
     const result = await jupyterClient.executeCode(kernelId, {
       code,
       timeout,
+      image_format: IMAGE_FORMAT,
+      image_max_size: IMAGE_MAX_SIZE,
     });
 
     // 成功時のレスポンス
@@ -107,6 +113,7 @@ export async function executeExecuteCode(
         .join("");
 
       // 画像をストアに保存し、ImageReference形式に変換
+      // （SVG / Plotly の図は変換されず、元の形式のまま参照できる）
       const imageReferences = result.images.map((img) => {
         return imageStore.store(kernelId, img);
       });
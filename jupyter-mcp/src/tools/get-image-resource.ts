@@ -49,9 +49,9 @@ export async function executeGetImageResource(
 
   try {
     // 画像データを取得
-    const image = imageStore.get(validatedResourceUri);
+    const image = await imageStore.load(validatedResourceUri);
 
-    if (!image) {
+    if (!image || !image.data) {
       return createErrorResponse(
         "指定されたリソースURIの画像が見つかりません",
         "NOT_FOUND"
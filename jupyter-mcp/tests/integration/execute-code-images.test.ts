@@ -78,8 +78,8 @@ plt.show()
     expect(images).toHaveLength(1);
 
     const image = images[0];
-    expect(image.resource_uri).toMatch(/^jupyter:\/\/sessions\/.+\/images\/.+\.png$/);
-    expect(image.mime_type).toBe('image/png');
+    expect(image.resource_uri).toMatch(/^jupyter:\/\/sessions\/.+\/images\/.+\.webp$/);
+    expect(image.mime_type).toBe('image/webp');
     expect(image.description).toContain('matplotlib');
   }, 30000); // matplotlib のインポートに時間がかかる場合があるため、タイムアウトを延長
 
@@ -65,6 +65,29 @@ describe('コード実行の結合テスト', () => {
       expect(executeData.result == null).toBe(true);
     });
 
+    test('1 回の print で出力上限を超えた場合、先頭と末尾の両方が返る', async () => {
+      // 1. セッション作成
+      const createResult = await handleToolCall('session_create', {
+        name: 'python3',
+      });
+      const createData = parseToolCallResult(createResult);
+      createdSessionIds.push(createData.session_id as string);
+
+      // 2. 上限（MAX_OUTPUT_SIZE、デフォルト 1MB）を超える出力を 1 回で書き込む
+      const executeResult = await handleToolCall('execute_code', {
+        session_id: createData.session_id,
+        code: 'print("\\n".join(str(i) for i in range(200000)))',
+      });
+
+      // 3. 先頭・末尾と省略の注記を確認
+      const executeData = parseToolCallResult(executeResult);
+      expect(executeData.success).toBe(true);
+      const stdout = executeData.stdout as string;
+      expect(stdout.startsWith('0\n1\n2\n')).toBe(true);
+      expect(stdout.endsWith('199998\n199999\n')).toBe(true);
+      expect(executeData.stderr).toContain('bytes omitted');
+    });
+
     test.skip('戻り値を持つ式（1 + 1）の result が返る', async () => {
       // Note: このテストは何らかの理由でタイムアウトするため、スキップ
       // ワークフローテストで DataFrame の result 検証が行われている
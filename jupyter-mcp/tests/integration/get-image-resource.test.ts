@@ -77,7 +77,7 @@ plt.show()
 
     // 4. レスポンスの検証
     expect(imageData.success).toBe(true);
-    expect(imageData.mime_type).toBe('image/png');
+    expect(imageData.mime_type).toBe('image/webp');
     expect(imageData.data).toBeDefined();
     expect(typeof imageData.data).toBe('string');
 
@@ -190,7 +190,7 @@ plt.show()
 
       // 4. 各画像のレスポンスを検証
       expect(imageData.success).toBe(true);
-      expect(imageData.mime_type).toBe('image/png');
+      expect(imageData.mime_type).toBe('image/webp');
       expect(imageData.data).toBeDefined();
       expect(typeof imageData.data).toBe('string');
       expect(imageData.data.length).toBeGreaterThan(0);
@@ -109,7 +109,7 @@ plt.show()
           (r) => r.uri === resourceUri
         );
         expect(foundResource).toBeDefined();
-        expect(foundResource?.mimeType).toBe('image/png');
+        expect(foundResource?.mimeType).toBe('image/webp');
 
         // 5. readResource で画像データを取得
         const resourceData = await client.readResource({ uri: resourceUri });
@@ -119,7 +119,7 @@ plt.show()
 
         const content = resourceData.contents[0];
         expect(content.uri).toBe(resourceUri);
-        expect(content.mimeType).toBe('image/png');
+        expect(content.mimeType).toBe('image/webp');
         expect(content.blob).toBeDefined();
         expect(typeof content.blob).toBe('string');
 
@@ -136,7 +136,7 @@ plt.show()
 
         const imageData = parseMcpToolCallResult(getImageResult);
         expect(imageData.success).toBe(true);
-        expect(imageData.mime_type).toBe('image/png');
+        expect(imageData.mime_type).toBe('image/webp');
         expect(imageData.data).toBeDefined();
 
         // resources/read と get_image_resource のデータが一致することを確認
@@ -306,8 +306,8 @@ plt.show()
 
         const content = resourceData.contents[0];
 
-        // mimeType が "image/png"
-        expect(content.mimeType).toBe('image/png');
+        // mimeType が "image/webp"（execute_code が webp を指定する）
+        expect(content.mimeType).toBe('image/webp');
 
         // blob が有効な base64 文字列
         expect(content.blob).toBeDefined();
@@ -1,9 +1,19 @@
-import { describe, test, expect, beforeEach } from 'vitest';
+import { describe, test, expect, vi, beforeEach } from 'vitest';
 import { imageStore } from '../../../src/image-store/index.js';
 import type { ImageOutput } from '../../../src/image-store/types.js';
 
+// 画像データの取得先（jupyter-server）をモック
+vi.mock('../../../src/jupyter-client/client.js', () => ({
+  jupyterClient: {
+    getImage: vi.fn(),
+  },
+}));
+
+import { jupyterClient } from '../../../src/jupyter-client/client.js';
+
 // テスト前にストアをクリア
 beforeEach(() => {
+  vi.clearAllMocks();
   // シングルトンなので、deleteBySession で全セッションをクリア
   const allImages = imageStore.listAll();
   const sessionIds = new Set(allImages.map(img => img.sessionId));
@@ -127,6 +137,35 @@ describe('ImageStore', () => {
     });
   });
 
+  describe('load', () => {
+    test('参照のみの画像 => jupyter-server から取得してキャッシュ', async () => {
+      vi.mocked(jupyterClient.getImage).mockResolvedValue({ mimeType: 'image/webp', data: 'fetcheddata' });
+      const ref = imageStore.store('session-1', { mime_type: 'image/webp', sha256: 'abc123' } as ImageOutput);
+
+      const first = await imageStore.load(ref.resource_uri);
+      const second = await imageStore.load(ref.resource_uri);
+
+      expect(first?.data).toBe('fetcheddata');
+      expect(second?.data).toBe('fetcheddata');
+      expect(jupyterClient.getImage).toHaveBeenCalledTimes(1);
+      expect(jupyterClient.getImage).toHaveBeenCalledWith('abc123');
+    });
+
+    test('データを含む画像 => 取得しない', async () => {
+      const ref = imageStore.store('session-1', { mime_type: 'image/png', data: 'base64data' } as ImageOutput);
+
+      const stored = await imageStore.load(ref.resource_uri);
+
+      expect(stored?.data).toBe('base64data');
+      expect(jupyterClient.getImage).not.toHaveBeenCalled();
+    });
+
+    test('存在しない画像 => undefined', async () => {
+      const result = await imageStore.load('jupyter://sessions/session-1/images/nonexistent.png');
+      expect(result).toBeUndefined();
+    });
+  });
+
   describe('listAll', () => {
     test('全画像を取得 => 全StoredImageの配列', () => {
       const imageData: ImageOutput = {
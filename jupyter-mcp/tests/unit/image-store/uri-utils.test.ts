@@ -17,6 +17,14 @@ describe('getExtensionFromMimeType', () => {
     expect(getExtensionFromMimeType('image/jpeg')).toBe('jpg');
   });
 
+  test('image/webp => "webp"', () => {
+    expect(getExtensionFromMimeType('image/webp')).toBe('webp');
+  });
+
+  test('application/vnd.plotly.v1+json => "json"', () => {
+    expect(getExtensionFromMimeType('application/vnd.plotly.v1+json')).toBe('json');
+  });
+
   test('image/svg+xml => "svg"', () => {
     expect(getExtensionFromMimeType('image/svg+xml')).toBe('svg');
   });
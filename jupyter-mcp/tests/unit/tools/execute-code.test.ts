@@ -21,6 +21,7 @@ vi.mock('../../../src/image-store/index.js', () => ({
 
 import { jupyterClient } from '../../../src/jupyter-client/client.js';
 import { resolveKernelId } from '../../../src/utils/session-resolver.js';
+import { imageStore } from '../../../src/image-store/index.js';
 
 describe('executeExecuteCode', () => {
   beforeEach(() => {
@@ -52,6 +53,8 @@ describe('executeExecuteCode', () => {
       expect(jupyterClient.executeCode).toHaveBeenCalledWith('kernel-123', {
         code: 'print("Hello, World!")',
         timeout: 30,
+        image_format: 'webp',
+        image_max_size: 1024,
       });
       expect(result.content[0].text).toContain('"success": true');
       expect(result.content[0].text).toContain('Hello, World!');
@@ -78,6 +81,8 @@ describe('executeExecuteCode', () => {
       expect(jupyterClient.executeCode).toHaveBeenCalledWith('kernel-123', {
         code: 'import time; time.sleep(1)',
         timeout: 60,
+        image_format: 'webp',
+        image_max_size: 1024,
       });
     });
 
@@ -100,6 +105,38 @@ describe('executeExecuteCode', () => {
 
       expect(result.content[0].text).toContain('"success": true');
     });
+
+    test('SVG / Plotly の図 => ラスター画像と同様に保存', async () => {
+      const images = [
+        { id: 'img-1', mime_type: 'image/webp', sha256: 'a'.repeat(64) },
+        { id: 'img-2', mime_type: 'image/svg+xml', sha256: 'b'.repeat(64) },
+        { id: 'img-3', mime_type: 'application/vnd.plotly.v1+json', sha256: 'c'.repeat(64) },
+      ];
+      const mockResult: ExecuteResult = {
+        success: true,
+        outputs: [],
+        result: null,
+        execution_count: 1,
+        images,
+        execution_time_ms: 10,
+      };
+
+      vi.mocked(jupyterClient.executeCode).mockResolvedValue(mockResult);
+      vi.mocked(imageStore.store).mockImplementation((_sessionId, img) => ({
+        resource_uri: `jupyter://sessions/kernel-123/images/${img.id}`,
+        mime_type: img.mime_type,
+        description: 'matplotlib output',
+      }));
+
+      const result = await executeExecuteCode({
+        session_id: 'session-123',
+        code: 'fig.show()',
+      });
+
+      expect(imageStore.store).toHaveBeenCalledTimes(3);
+      expect(result.content[0].text).toContain('image/svg+xml');
+      expect(result.content[0].text).toContain('application/vnd.plotly.v1+json');
+    });
   });
 
   describe('バリデーションエラー', () => {
@@ -4,12 +4,51 @@ Custom API Extension for Jupyter Server
 api-contracts.md に定義された REST API を提供する Jupyter Server 拡張機能。
 """
 
+import logging
+
+from jupyter_server.extension.application import ExtensionApp
+from tornado.ioloop import IOLoop
+
+from .dataset_index import DatasetIndex
+from .directory_listing import DirectoryLister
+from .execution_guard import ExecutionGuard
+from .file_transfer import UploadStore
 from .handlers import get_handlers
+from .image_store import ImageStore
+from .jobs import JobStore
+from .kernel_culler import KernelCuller
+from .kernel_connection import KernelConnectionPool
+from .kernel_pool import KernelPool
+from .metrics import register_collector, unregister_collector
+from .notebook_cache import NotebookCache
+from .output_buffer import SpillStore
+from .scheduler import ExecutionScheduler
+
+
+class CustomApiApp(ExtensionApp):
+    """拡張機能のアプリケーション
+
+    Jupyter Server は停止時に ExtensionApp の stop_extension のみを呼び出すため、
+    後処理を行うために ExtensionApp として登録する。
+    """
+
+    name = "custom_api"
+    # 他の拡張機能（jupyter_server_terminals 等）も読み込む
+    load_other_extensions = True
+
+    def initialize(self):
+        """設定・ハンドラーを登録（ExtensionApp の静的ファイル・テンプレートは使わない）"""
+        _load_jupyter_server_extension(self.serverapp)
+
+    async def stop_extension(self):
+        """停止時の後処理（この後 Jupyter Server がカーネルを停止する）"""
+        await _stop_extension(self.serverapp.web_app.settings)
+        self.serverapp.log.info("Custom API extension stopped")
 
 
 def _jupyter_server_extension_points():
     """Jupyter Server 拡張機能のエントリーポイント"""
-    return [{"module": "custom_api"}]
+    return [{"module": "custom_api", "app": CustomApiApp}]
 
 
 def _load_jupyter_server_extension(server_app):
@@ -17,12 +56,102 @@ def _load_jupyter_server_extension(server_app):
     web_app = server_app.web_app
     host_pattern = ".*$"
 
+    # 各モジュールのログを Jupyter Server のログに出力する（tornado のロガーと同じ方法）
+    logging.getLogger(__name__).parent = server_app.log
+    base_url = web_app.settings["base_url"].rstrip("/")
+
+    # カーネル接続プール（サーバーの稼働期間中チャネルを使い回す）
+    web_app.settings["custom_api_kernel_connections"] = KernelConnectionPool(
+        web_app.settings["kernel_manager"]
+    )
+
+    # カーネルごとの実行待ち行列
+    web_app.settings["custom_api_scheduler"] = ExecutionScheduler()
+
+    # タイムアウト・切断時の実行の打ち切り
+    web_app.settings["custom_api_execution_guard"] = ExecutionGuard(
+        web_app.settings["kernel_manager"], web_app.settings["custom_api_kernel_connections"]
+    )
+
+    # 非同期ジョブのストア
+    web_app.settings["custom_api_jobs"] = JobStore()
+
+    # ウォームアップ済みカーネルのプール（IOLoop の開始後に補充を始める）
+    kernel_pool = KernelPool(web_app.settings["kernel_manager"], web_app.settings["custom_api_kernel_connections"])
+    web_app.settings["custom_api_kernel_pool"] = kernel_pool
+    IOLoop.current().add_callback(kernel_pool.start)
+
+    # アイドルカーネルの停止（IOLoop の開始後に確認を始める）
+    kernel_culler = KernelCuller(
+        web_app.settings["kernel_manager"],
+        web_app.settings["custom_api_kernel_connections"],
+        web_app.settings["custom_api_scheduler"],
+        kernel_pool,
+    )
+    web_app.settings["custom_api_kernel_culler"] = kernel_culler
+    IOLoop.current().add_callback(kernel_culler.start)
+
+    # ファイル一覧の走査とキャッシュ
+    web_app.settings["custom_api_directory_lister"] = DirectoryLister.from_contents_manager(
+        web_app.settings["contents_manager"]
+    )
+
+    # 受信中のアップロード
+    web_app.settings["custom_api_uploads"] = UploadStore.from_contents_manager(web_app.settings["contents_manager"])
+
+    # データディレクトリのファイルの情報（保存済みのインデックスを読み込む）
+    web_app.settings["custom_api_dataset_index"] = DatasetIndex()
+
+    # 編集中のノートブックのキャッシュ（セル編集の保存をまとめる）
+    web_app.settings["custom_api_notebook_cache"] = NotebookCache(web_app.settings["contents_manager"])
+
+    # 実行結果画像のストア
+    web_app.settings["custom_api_image_store"] = ImageStore(url_prefix=f"{base_url}/api/images")
+
+    # 上限を超えた実行出力の退避先（期限切れ・容量超過のファイルを削除する）
+    web_app.settings["custom_api_output_spills"] = SpillStore(url_prefix=f"{base_url}/api/outputs")
+
+    # GET /metrics（Jupyter Server）にカーネル・待ち行列等の状態を追加
+    web_app.settings["custom_api_metrics_collector"] = register_collector(web_app.settings)
+
     # ハンドラーを登録
-    handlers = get_handlers(web_app.settings["base_url"].rstrip("/"))
+    handlers = get_handlers(base_url)
     web_app.add_handlers(host_pattern, handlers)
 
     server_app.log.info("Custom API extension loaded")
 
 
+async def _stop_extension(settings: dict):
+    """未保存のノートブックを保存し、バックグラウンド処理・カーネルへの接続・受信途中のデータを破棄する"""
+    collector = settings.pop("custom_api_metrics_collector", None)
+    if collector is not None:
+        unregister_collector(collector)
+
+    uploads = settings.get("custom_api_uploads")
+    if uploads is not None:
+        uploads.close()
+
+    # 保存の遅延中に停止しても編集が失われないように保存を待つ
+    notebook_cache = settings.get("custom_api_notebook_cache")
+    if notebook_cache is not None:
+        await notebook_cache.close()
+
+    jobs = settings.get("custom_api_jobs")
+    if jobs is not None:
+        jobs.close()
+
+    kernel_culler = settings.get("custom_api_kernel_culler")
+    if kernel_culler is not None:
+        kernel_culler.close()
+
+    kernel_pool = settings.get("custom_api_kernel_pool")
+    if kernel_pool is not None:
+        kernel_pool.close()
+
+    connections = settings.get("custom_api_kernel_connections")
+    if connections is not None:
+        connections.close_all()
+
+
 # 後方互換性のためのエイリアス
 load_jupyter_server_extension = _load_jupyter_server_extension
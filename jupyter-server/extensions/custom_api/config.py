@@ -0,0 +1,216 @@
+"""
+拡張機能の設定
+
+docker-compose.yml 等で指定された環境変数から設定値を読み込む。
+"""
+
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    """整数の環境変数を取得（未設定・不正値の場合はデフォルト）"""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_str(name: str, default: str) -> str:
+    """文字列の環境変数を取得（未設定・空文字の場合はデフォルト）"""
+    return os.environ.get(name) or default
+
+
+# 1 回の実行で保持する出力の上限（バイト）
+MAX_OUTPUT_SIZE = _env_int("MAX_OUTPUT_SIZE", 1048576)
+
+# 出力ファイルの保存先
+OUTPUT_DIR = _env_str("OUTPUT_DIR", "/home/jovyan/output")
+
+# 上限を超えた実行出力の退避先
+OUTPUT_SPILL_DIR = _env_str("OUTPUT_SPILL_DIR", os.path.join(OUTPUT_DIR, "execute-outputs"))
+
+# 退避した実行出力の合計サイズ上限（バイト）
+OUTPUT_SPILL_MAX_BYTES = _env_int("OUTPUT_SPILL_MAX_BYTES", 1024 * 1024 * 1024)
+
+# 退避した実行出力の保持期間（秒）
+OUTPUT_SPILL_MAX_AGE = _env_int("OUTPUT_SPILL_MAX_AGE", 24 * 3600)
+
+# データファイルの配置先（docker-compose.yml でマウント）
+DATA_DIR = _env_str("DATA_DIR", "/home/jovyan/data")
+
+# 実行結果画像の保存先
+IMAGE_STORE_DIR = _env_str("IMAGE_STORE_DIR", os.path.join(OUTPUT_DIR, "images"))
+
+# 画像ストアの合計サイズ上限（バイト）
+IMAGE_STORE_MAX_BYTES = _env_int("IMAGE_STORE_MAX_BYTES", 512 * 1024 * 1024)
+
+# 画像の保持期間（秒）
+IMAGE_STORE_MAX_AGE = _env_int("IMAGE_STORE_MAX_AGE", 7 * 24 * 3600)
+
+# 画像変換のワーカースレッド数
+IMAGE_WORKERS = _env_int("IMAGE_WORKERS", 2)
+
+# 変数の統計量・メモリ使用量をサンプルから求める行数の閾値
+VARIABLE_SAMPLE_ROWS = _env_int("VARIABLE_SAMPLE_ROWS", 1000000)
+
+# 行取得 API の 1 回あたりの最大行数
+VARIABLE_ROWS_MAX_LIMIT = _env_int("VARIABLE_ROWS_MAX_LIMIT", 10000)
+
+# 変数一覧・詳細で 1 つの変数について返す値の大きさの上限（バイト）
+VARIABLE_VALUE_MAX_BYTES = _env_int("VARIABLE_VALUE_MAX_BYTES", 65536)
+
+# 一括実行で 1 回に受け付けるセル数の上限
+EXECUTE_BATCH_MAX_CELLS = _env_int("EXECUTE_BATCH_MAX_CELLS", 100)
+
+# 事前に起動しておくカーネル数（0 の場合はプールを使わない）
+KERNEL_POOL_SIZE = _env_int("KERNEL_POOL_SIZE", 1)
+
+# 要求が多い場合に増やすプールの上限
+KERNEL_POOL_MAX_SIZE = _env_int("KERNEL_POOL_MAX_SIZE", 4)
+
+# プールで起動するカーネル
+KERNEL_POOL_KERNEL_NAME = _env_str("KERNEL_POOL_KERNEL_NAME", "python3")
+
+# プールのカーネルで事前に実行するコード（ユーザーの名前空間に名前を残さない）
+KERNEL_POOL_WARMUP = _env_str(
+    "KERNEL_POOL_WARMUP", "import numpy, pandas, matplotlib.pyplot; del numpy, pandas, matplotlib"
+)
+
+# ウォームアップのタイムアウト（秒）
+KERNEL_POOL_WARMUP_TIMEOUT = _env_int("KERNEL_POOL_WARMUP_TIMEOUT", 120)
+
+# ウォームアップに連続してこの回数失敗した場合はプールを停止する（0 の場合は停止しない）
+KERNEL_POOL_MAX_WARMUP_FAILURES = _env_int("KERNEL_POOL_MAX_WARMUP_FAILURES", 5)
+
+# 利用可能なメモリがこれを下回る場合はプールのカーネルを起動しない（バイト）
+KERNEL_POOL_MIN_AVAILABLE_MEMORY = _env_int("KERNEL_POOL_MIN_AVAILABLE_MEMORY", 1024 * 1024 * 1024)
+
+# 最後に使われてからカーネルを停止するまでの時間（秒、0 の場合は停止しない）
+KERNEL_TIMEOUT = _env_int("KERNEL_TIMEOUT", 1800)
+
+# アイドルカーネルを確認する間隔（秒）
+KERNEL_CULL_INTERVAL = _env_int("KERNEL_CULL_INTERVAL", 60)
+
+# 利用可能なメモリがこれを下回る場合は、タイムアウト前でも最後に使われた時刻が古い
+# アイドルカーネルから停止する（バイト、0 の場合は停止しない）
+KERNEL_CULL_MIN_AVAILABLE_MEMORY = _env_int("KERNEL_CULL_MIN_AVAILABLE_MEMORY", 512 * 1024 * 1024)
+
+# メモリが少ない場合も、最後に使われてからこの時間が経っていないカーネルは停止しない（秒）
+KERNEL_CULL_MEMORY_MIN_IDLE = _env_int("KERNEL_CULL_MEMORY_MIN_IDLE", 60)
+
+# 停止前にユーザー変数をファイルに保存するか（1: 保存する）
+KERNEL_CULL_SNAPSHOT = _env_int("KERNEL_CULL_SNAPSHOT", 0)
+
+# 停止前に保存したユーザー変数の保存先
+KERNEL_CULL_SNAPSHOT_DIR = _env_str("KERNEL_CULL_SNAPSHOT_DIR", os.path.join(OUTPUT_DIR, "kernel-snapshots"))
+
+# ユーザー変数の保存のタイムアウト（秒）
+KERNEL_CULL_SNAPSHOT_TIMEOUT = _env_int("KERNEL_CULL_SNAPSHOT_TIMEOUT", 300)
+
+# サーバー全体で同時にコードを実行するカーネル数の上限
+EXECUTION_MAX_CONCURRENT = _env_int("EXECUTION_MAX_CONCURRENT", 8)
+
+# カーネルごとの実行待ち行列の上限（超えた要求は 429）
+EXECUTION_MAX_QUEUE = _env_int("EXECUTION_MAX_QUEUE", 16)
+
+# サーバー全体の実行待ち行列の上限（超えた要求は 429）
+EXECUTION_MAX_QUEUE_TOTAL = _env_int("EXECUTION_MAX_QUEUE_TOTAL", 128)
+
+# 保持するジョブ数の上限（未完了のジョブだけで上限に達した場合は 429）
+JOB_MAX_JOBS = _env_int("JOB_MAX_JOBS", 1000)
+
+# 完了したジョブが保持する出力の合計サイズの上限（バイト、超えた場合は古いジョブから削除）
+JOB_MAX_OUTPUT_BYTES = _env_int("JOB_MAX_OUTPUT_BYTES", 256 * 1024 * 1024)
+
+# 完了したジョブの保持期間（秒）
+JOB_TTL = _env_int("JOB_TTL", 3600)
+
+# ジョブのタイムアウトの上限（秒）
+JOB_MAX_TIMEOUT = _env_int("JOB_MAX_TIMEOUT", 6 * 3600)
+
+# ジョブ数が上限に達した場合の Retry-After（秒）
+JOB_RETRY_AFTER = _env_int("JOB_RETRY_AFTER", 30)
+
+# 実行がタイムアウトした場合の処理
+# （interrupt: カーネルを中断し、猶予時間内に止まらなければ再起動 / none: 実行を続けさせる）
+EXECUTION_TIMEOUT_ACTION = _env_str("EXECUTION_TIMEOUT_ACTION", "interrupt")
+
+# クライアントが実行中に切断した場合の処理（EXECUTION_TIMEOUT_ACTION と同じ値）
+EXECUTION_DISCONNECT_ACTION = _env_str("EXECUTION_DISCONNECT_ACTION", "interrupt")
+
+# 中断してから実行が止まるのを待つ時間（秒、超えた場合はカーネルを再起動）
+EXECUTION_INTERRUPT_GRACE = _env_int("EXECUTION_INTERRUPT_GRACE", 5)
+
+# レスポンスの JSON エンコード（auto: orjson が利用可能なら orjson / orjson / json）
+JSON_SERIALIZER = _env_str("JSON_SERIALIZER", "auto")
+
+# これより大きいと見積もられたレスポンスはワーカースレッドでエンコードする（バイト）
+JSON_OFFLOAD_MIN_BYTES = _env_int("JSON_OFFLOAD_MIN_BYTES", 256 * 1024)
+
+# これ以上のレスポンスは Accept-Encoding に応じて圧縮する（バイト、0 で常に圧縮）
+RESPONSE_COMPRESS_MIN_BYTES = _env_int("RESPONSE_COMPRESS_MIN_BYTES", 4096)
+
+# ノートブックの編集後、保存するまで待つ時間（秒、この間の編集はまとめて保存する）
+NOTEBOOK_SAVE_DELAY = _env_int("NOTEBOOK_SAVE_DELAY", 1)
+
+# 編集が続く場合も、最初の未保存の編集からこの時間以内に保存する（秒）
+NOTEBOOK_SAVE_MAX_DELAY = _env_int("NOTEBOOK_SAVE_MAX_DELAY", 5)
+
+# メモリに保持するノートブック数の上限
+NOTEBOOK_CACHE_MAX_DOCUMENTS = _env_int("NOTEBOOK_CACHE_MAX_DOCUMENTS", 32)
+
+# 使われていないノートブックをキャッシュから外すまでの時間（秒）
+NOTEBOOK_CACHE_IDLE_TIMEOUT = _env_int("NOTEBOOK_CACHE_IDLE_TIMEOUT", 600)
+
+# 1 回のセル操作要求に含められる操作数の上限
+NOTEBOOK_MAX_CELL_OPERATIONS = _env_int("NOTEBOOK_MAX_CELL_OPERATIONS", 1000)
+
+# ファイル一覧のキャッシュの有効期間（秒、ディレクトリの更新時刻が変わった場合はそれ以前でも作り直す）
+CONTENTS_LIST_CACHE_TTL = _env_int("CONTENTS_LIST_CACHE_TTL", 5)
+
+# ファイル一覧のキャッシュに保持するディレクトリ数の上限
+CONTENTS_LIST_CACHE_MAX_DIRS = _env_int("CONTENTS_LIST_CACHE_MAX_DIRS", 64)
+
+# ファイル一覧の 1 ページのエントリ数（デフォルト / 上限）
+CONTENTS_LIST_DEFAULT_LIMIT = _env_int("CONTENTS_LIST_DEFAULT_LIMIT", 1000)
+CONTENTS_LIST_MAX_LIMIT = _env_int("CONTENTS_LIST_MAX_LIMIT", 10000)
+
+# 再帰的なファイル一覧の深さの上限
+CONTENTS_LIST_MAX_DEPTH = _env_int("CONTENTS_LIST_MAX_DEPTH", 10)
+
+# 1 回の走査で集めるエントリ数の上限（超えた場合は truncated）
+CONTENTS_LIST_MAX_ENTRIES = _env_int("CONTENTS_LIST_MAX_ENTRIES", 100000)
+
+# GET /api/contents/{path} で内容を返すファイルサイズの上限（バイト、超える場合は /api/files を使う）
+CONTENTS_MAX_INLINE_BYTES = _env_int("CONTENTS_MAX_INLINE_BYTES", 64 * 1024 * 1024)
+
+# ファイルのダウンロードで 1 回に読み込んで送信する大きさ（バイト）
+FILE_STREAM_CHUNK_SIZE = _env_int("FILE_STREAM_CHUNK_SIZE", 1024 * 1024)
+
+# アップロードするファイルサイズの上限（バイト）
+UPLOAD_MAX_BYTES = _env_int("UPLOAD_MAX_BYTES", 50 * 1024 * 1024 * 1024)
+
+# 同時に受信中にできるアップロード数の上限
+UPLOAD_MAX_UPLOADS = _env_int("UPLOAD_MAX_UPLOADS", 100)
+
+# チャンクの送信が無いアップロードを削除するまでの時間（秒）
+UPLOAD_TTL = _env_int("UPLOAD_TTL", 24 * 3600)
+
+# アップロード数が上限に達した場合の Retry-After（秒）
+UPLOAD_RETRY_AFTER = _env_int("UPLOAD_RETRY_AFTER", 60)
+
+# データセットのインデックスの保存先
+DATASET_INDEX_PATH = _env_str("DATASET_INDEX_PATH", os.path.join(OUTPUT_DIR, "dataset-index.json"))
+
+# データセットの情報に含める先頭の行数
+DATASET_SAMPLE_ROWS = _env_int("DATASET_SAMPLE_ROWS", 5)
+
+# CSV の区切り文字・列の型の推定に読み込む先頭のバイト数
+DATASET_CSV_SNIFF_BYTES = _env_int("DATASET_CSV_SNIFF_BYTES", 256 * 1024)
+
+# CSV を Arrow 形式に変換したファイルの保存先（カーネルへの読み込み用）
+DATASET_CACHE_DIR = _env_str("DATASET_CACHE_DIR", os.path.join(OUTPUT_DIR, "dataset-cache"))
+
+# カーネルへのデータ読み込みのタイムアウト（秒、デフォルト / 上限）
+DATASET_LOAD_TIMEOUT = _env_int("DATASET_LOAD_TIMEOUT", 300)
+DATASET_LOAD_MAX_TIMEOUT = _env_int("DATASET_LOAD_MAX_TIMEOUT", 3600)
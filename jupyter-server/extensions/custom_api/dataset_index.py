@@ -0,0 +1,337 @@
+"""
+データセットのインデックス
+
+データディレクトリの表形式ファイル（CSV / TSV / Parquet / Feather・Arrow）の列・行数・
+先頭の数行を、カーネルで読み込まずに取得する。Parquet と Arrow はファイル末尾の
+メタデータから読み、CSV は先頭の一定バイト数のみを読んで区切り文字・列の型を推定し、
+行数をファイルサイズから見積もる。
+
+結果はパス・更新時刻・サイズをキーにファイルへ保存し、サーバーの再起動後も使う。
+一覧の取得時には変更されたファイルのみを読み直す。
+"""
+
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional
+
+from . import config
+from .directory_listing import DirectoryLister
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow が無い環境では Parquet / Arrow の情報を取得しない
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# インデックスファイルの形式（変更した場合は既存のインデックスを使わない）
+INDEX_VERSION = 2
+
+# 拡張子とファイル形式の対応
+FORMATS = {
+    ".csv": "csv",
+    ".tsv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "arrow",
+    ".arrow": "arrow",
+}
+
+# Arrow IPC ファイル（Feather V2）の先頭のマジックナンバー（Feather V1 は b"FEA1"）
+_ARROW_MAGIC = b"ARROW1"
+
+# 読み込み用のワーカースレッド（大量のファイルの読み直しで CPU を使い切らないよう 2 つまで）
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="custom-api-dataset")
+
+
+def dataset_format(path: str) -> Optional[str]:
+    return FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+def _arrow_columns(schema) -> list:
+    return [{"name": field.name, "dtype": str(field.type)} for field in schema]
+
+
+def _profile_parquet(os_path: str, sample_rows: int) -> dict:
+    parquet_file = pq.ParquetFile(os_path)
+    metadata = parquet_file.metadata
+    sample = []
+    if sample_rows > 0 and metadata.num_rows > 0:
+        # 先頭の行グループのみを読む
+        batch = next(parquet_file.iter_batches(batch_size=sample_rows), None)
+        sample = batch.to_pylist()[:sample_rows] if batch is not None else []
+    return {
+        "row_count": metadata.num_rows,
+        "row_count_estimated": False,
+        "columns": _arrow_columns(parquet_file.schema_arrow),
+        "sample": sample,
+    }
+
+
+def _profile_feather_v1(os_path: str, sample_rows: int) -> dict:
+    table = pa.feather.read_table(os_path, memory_map=True)
+    return {
+        "row_count": table.num_rows,
+        "row_count_estimated": False,
+        "columns": _arrow_columns(table.schema),
+        "sample": table.slice(0, sample_rows).to_pylist(),
+    }
+
+
+def _profile_arrow(os_path: str, sample_rows: int) -> dict:
+    with open(os_path, "rb") as f:
+        if f.read(len(_ARROW_MAGIC)) != _ARROW_MAGIC:
+            # Feather V1（Arrow IPC 形式ではない）
+            return _profile_feather_v1(os_path, sample_rows)
+    # メモリマップで開き、レコードバッチの行数のみを参照する（データはコピーしない）
+    with pa.memory_map(os_path) as source:
+        reader = pa.ipc.open_file(source)
+        row_count = 0
+        sample = []
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            row_count += batch.num_rows
+            if len(sample) < sample_rows:
+                sample.extend(batch.slice(0, sample_rows - len(sample)).to_pylist())
+        return {
+            "row_count": row_count,
+            "row_count_estimated": False,
+            "columns": _arrow_columns(reader.schema),
+            "sample": sample,
+        }
+
+
+def _infer_dtype(values: list) -> str:
+    """CSV の値から列の型を推定する（空の値は無視する）"""
+    values = [v for v in values if v != ""]
+    if not values:
+        return "object"
+    for dtype, parse in (("int64", int), ("float64", float), ("datetime64[ns]", datetime.fromisoformat)):
+        try:
+            for value in values:
+                parse(value)
+            return dtype
+        except ValueError:
+            continue
+    if all(v.lower() in ("true", "false") for v in values):
+        return "bool"
+    return "object"
+
+
+def _profile_csv(os_path: str, sample_rows: int, sniff_bytes: int) -> dict:
+    size = os.path.getsize(os_path)
+    with open(os_path, "rb") as f:
+        head = f.read(sniff_bytes)
+    complete = len(head) >= size
+    text = head.decode("utf-8-sig", errors="replace")
+    if not complete:
+        # 途中で切れた最後の行は使わない
+        text = text[:text.rfind("\n") + 1]
+
+    try:
+        dialect = csv.Sniffer().sniff(text[:64 * 1024], delimiters=",\t;|")
+    except csv.Error:
+        dialect = csv.excel_tab if os_path.lower().endswith(".tsv") else csv.excel
+    rows = list(csv.reader(io.StringIO(text), dialect))
+    rows = [row for row in rows if row]
+    if not rows:
+        return {"row_count": 0, "row_count_estimated": False, "columns": [], "sample": [], "delimiter": dialect.delimiter}
+
+    header, body = rows[0], rows[1:]
+    columns = [
+        {"name": name, "dtype": _infer_dtype([row[i] for row in body if i < len(row)])}
+        for i, name in enumerate(header)
+    ]
+    if complete:
+        row_count = len(body)
+    else:
+        # 読み込んだ行の平均バイト数から見積もる
+        header_bytes = len(text.split("\n", 1)[0].encode("utf-8")) + 1
+        body_bytes = len(text.encode("utf-8")) - header_bytes
+        row_count = int((size - header_bytes) / (body_bytes / len(body))) if body else 0
+    return {
+        "row_count": row_count,
+        "row_count_estimated": not complete,
+        "columns": columns,
+        "sample": [dict(zip(header, row)) for row in body[:sample_rows]],
+        "delimiter": dialect.delimiter,
+    }
+
+
+def profile_file(
+    os_path: str,
+    fmt: str,
+    sample_rows: int = config.DATASET_SAMPLE_ROWS,
+    sniff_bytes: int = config.DATASET_CSV_SNIFF_BYTES,
+) -> dict:
+    """ファイルの列・行数・先頭の行を取得する（読み込めない場合は error を含む）"""
+    try:
+        if fmt == "csv":
+            return _profile_csv(os_path, sample_rows, sniff_bytes)
+        if pa is None:
+            return {"error": "pyarrow is not installed"}
+        if fmt == "parquet":
+            return _profile_parquet(os_path, sample_rows)
+        return _profile_arrow(os_path, sample_rows)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+class DatasetIndex:
+    """データディレクトリのファイルの情報（ファイルに保存する）"""
+
+    def __init__(
+        self,
+        data_dir: str = config.DATA_DIR,
+        index_path: str = config.DATASET_INDEX_PATH,
+        cache_dir: str = config.DATASET_CACHE_DIR,
+    ):
+        self.data_dir = data_dir
+        self.index_path = index_path
+        self.cache_dir = cache_dir
+        self.lister = DirectoryLister(data_dir)
+        # パス → {"mtime_ns", "size", "format", 取得した情報}
+        self._entries: dict[str, dict] = self._load()
+        self._dirty = False
+        self.profiled = 0
+
+    def _load(self) -> dict:
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") == INDEX_VERSION:
+                return index["entries"]
+        except FileNotFoundError:
+            pass
+        except Exception:
+            logger.warning("Ignoring unreadable dataset index %s", self.index_path, exc_info=True)
+        return {}
+
+    def _save(self, entries: dict):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "entries": entries}, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, self.index_path)
+
+    async def _flush(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        loop = asyncio.get_event_loop()
+        try:
+            await loop.run_in_executor(_executor, self._save, dict(self._entries))
+        except Exception:
+            logger.exception("Failed to save dataset index %s", self.index_path)
+
+    async def _refresh(self, path: str, mtime_ns: int, size: int) -> dict:
+        """更新時刻・サイズが変わっていれば読み直す"""
+        entry = self._entries.get(path)
+        if entry is not None and entry["mtime_ns"] == mtime_ns and entry["size"] == size:
+            return entry
+        fmt = dataset_format(path)
+        loop = asyncio.get_event_loop()
+        profile = await loop.run_in_executor(_executor, profile_file, os.path.join(self.data_dir, path), fmt)
+        entry = {"mtime_ns": mtime_ns, "size": size, "format": fmt, **profile}
+        self._entries[path] = entry
+        self._dirty = True
+        self.profiled += 1
+        return entry
+
+    async def list(self, pattern: Optional[str] = None) -> list:
+        """データディレクトリの表形式ファイルの一覧（先頭の行は含まない）
+
+        インデックスに無い・変更されたファイルを読み直し、削除されたファイルをインデックスから除く。
+        """
+        try:
+            listing = await self.lister.list(
+                "", depth=config.CONTENTS_LIST_MAX_DEPTH, pattern=pattern, limit=self.lister.max_entries
+            )
+            files = [e for e in listing["contents"] if e["type"] == "file" and dataset_format(e["name"])]
+        except FileNotFoundError:
+            files = []
+
+        paths = [item["path"].lstrip("/") for item in files]
+        stats = await asyncio.get_event_loop().run_in_executor(None, self._stat_all, paths)
+        datasets = []
+        for path, st in zip(paths, stats):
+            if st is None:
+                continue
+            entry = await self._refresh(path, st.st_mtime_ns, st.st_size)
+            datasets.append(self._to_dict(path, entry, include_sample=False))
+
+        if pattern is None:
+            present = {d["path"].lstrip("/") for d in datasets}
+            for path in [p for p in self._entries if p not in present]:
+                del self._entries[path]
+                self._dirty = True
+        await self._flush()
+        return datasets
+
+    def _stat_all(self, paths: list) -> list:
+        stats = []
+        for path in paths:
+            try:
+                stats.append(os.stat(os.path.join(self.data_dir, path)))
+            except OSError:
+                stats.append(None)
+        return stats
+
+    async def get(self, path: str) -> dict:
+        """1 つのファイルの情報（先頭の行を含む）
+
+        Raises:
+            FileNotFoundError: ファイルが存在しない場合
+            ValueError: 表形式ファイルではない場合
+        """
+        if dataset_format(path) is None:
+            raise ValueError(f"Unsupported file type: {path} (supported: {', '.join(sorted(FORMATS))})")
+        if any(part.startswith(".") for part in path.split("/")):
+            raise FileNotFoundError(path)
+        st = await asyncio.get_event_loop().run_in_executor(None, os.stat, os.path.join(self.data_dir, path))
+        entry = await self._refresh(path, st.st_mtime_ns, st.st_size)
+        await self._flush()
+        return self._to_dict(path, entry, include_sample=True)
+
+    def arrow_cache_path(self, path: str) -> str:
+        """CSV を Arrow 形式に変換したファイルの保存先（ファイルの変更前の変換結果は削除する）
+
+        Raises:
+            FileNotFoundError: ファイルが存在しない場合
+        """
+        st = os.stat(os.path.join(self.data_dir, path))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        prefix = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+        name = f"{prefix}-{st.st_mtime_ns}-{st.st_size}.arrow"
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith(prefix + "-") and entry.name.endswith(".arrow") and entry.name != name:
+                    # 読み込み済みのカーネルのメモリマップは削除後も有効
+                    os.remove(entry.path)
+        return os.path.join(self.cache_dir, name)
+
+    def _to_dict(self, path: str, entry: dict, include_sample: bool) -> dict:
+        result = {
+            "path": "/" + path,
+            "format": entry["format"],
+            "size": entry["size"],
+            "modified_at": datetime.fromtimestamp(entry["mtime_ns"] / 1e9, tz=timezone.utc),
+        }
+        for key in ("row_count", "row_count_estimated", "columns", "delimiter", "error"):
+            if key in entry:
+                result[key] = entry[key]
+        if include_sample and "sample" in entry:
+            result["sample"] = entry["sample"]
+        return result
+
+    def stats(self) -> dict:
+        return {"indexed": len(self._entries), "profiled": self.profiled}
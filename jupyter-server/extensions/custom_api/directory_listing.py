@@ -0,0 +1,227 @@
+"""
+ディレクトリ一覧
+
+ContentsManager はエントリごとにモデルを作るため、大きなディレクトリの一覧は遅い。
+os.scandir で 1 回走査して名前・種類・サイズ・更新時刻のみを集め（再帰する場合は指定した
+深さまで）、結果をキャッシュする。キャッシュは走査したディレクトリの更新時刻が変わるか、
+一定時間が経過すると作り直す（ファイルの中身の変更はディレクトリの更新時刻を変えないため）。
+走査と更新時刻の確認はワーカースレッドで行う。
+"""
+
+import asyncio
+import base64
+import bisect
+import fnmatch
+import logging
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+
+class Listing:
+    """1 回の走査結果（entries は path の順）"""
+
+    def __init__(self, entries: list, dir_mtimes: dict, truncated: bool):
+        self.entries = entries
+        self.paths = [entry["path"] for entry in entries]
+        # 走査したディレクトリの更新時刻（キャッシュの有効性の確認用）
+        self.dir_mtimes = dir_mtimes
+        self.truncated = truncated
+        self.created = time.monotonic()
+
+
+def encode_cursor(path: str) -> str:
+    return base64.urlsafe_b64encode(path.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    """
+    Raises:
+        ValueError: 不正なカーソルの場合
+    """
+    try:
+        return base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode("utf-8")
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def _is_hidden(name: str) -> bool:
+    return name.startswith(".")
+
+
+class DirectoryLister:
+    """ディレクトリ一覧の走査とキャッシュ"""
+
+    def __init__(
+        self,
+        root_dir: str,
+        should_list: Callable[[str], bool] = lambda name: True,
+        allow_hidden: bool = False,
+        ttl: float = config.CONTENTS_LIST_CACHE_TTL,
+        max_dirs: int = config.CONTENTS_LIST_CACHE_MAX_DIRS,
+        max_entries: int = config.CONTENTS_LIST_MAX_ENTRIES,
+    ):
+        self.root_dir = os.path.abspath(root_dir)
+        self.should_list = should_list
+        self.allow_hidden = allow_hidden
+        self.ttl = ttl
+        self.max_dirs = max_dirs
+        self.max_entries = max_entries
+        # (path, depth) ごとの走査結果（最近使った順、末尾が最新）
+        self._cache: OrderedDict[tuple, Listing] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_contents_manager(cls, contents_manager) -> "DirectoryLister":
+        return cls(
+            contents_manager.root_dir,
+            should_list=contents_manager.should_list,
+            allow_hidden=contents_manager.allow_hidden,
+        )
+
+    async def list(
+        self,
+        path: str,
+        depth: int = 1,
+        pattern: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = config.CONTENTS_LIST_DEFAULT_LIMIT,
+    ) -> dict:
+        """path 配下のエントリを depth の深さまで一覧する
+
+        pattern は名前（"/" を含む場合は path からの相対パス）に対する glob。
+        cursor は前のページの next_cursor。
+
+        Raises:
+            FileNotFoundError: ディレクトリが存在しない場合
+            ValueError: 不正なカーソルの場合
+        """
+        after = decode_cursor(cursor) if cursor else None
+        loop = asyncio.get_event_loop()
+        listing = await loop.run_in_executor(None, self._get, path, depth)
+
+        entries = listing.entries
+        start = bisect.bisect_right(listing.paths, after) if after is not None else 0
+        if pattern:
+            prefix = len(path) + 2 if path else 1
+            key = (lambda e: e["path"][prefix:]) if "/" in pattern else (lambda e: e["name"])
+            page = []
+            for entry in entries[start:]:
+                if fnmatch.fnmatchcase(key(entry), pattern):
+                    page.append(entry)
+                    if len(page) > limit:
+                        break
+        else:
+            page = entries[start:start + limit + 1]
+
+        has_more = len(page) > limit
+        page = page[:limit]
+        return {
+            "contents": page,
+            "next_cursor": encode_cursor(page[-1]["path"]) if has_more else None,
+            "truncated": listing.truncated,
+        }
+
+    def _get(self, path: str, depth: int) -> Listing:
+        key = (path, depth)
+        with self._lock:
+            listing = self._cache.get(key)
+        if listing is not None and self._is_fresh(listing):
+            with self._lock:
+                self.hits += 1
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+            return listing
+
+        listing = self._scan(path, depth)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = listing
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_dirs:
+                self._cache.popitem(last=False)
+        return listing
+
+    def _is_fresh(self, listing: Listing) -> bool:
+        if time.monotonic() - listing.created > self.ttl:
+            return False
+        for os_dir, mtime in listing.dir_mtimes.items():
+            try:
+                if os.stat(os_dir).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def _scan(self, path: str, depth: int) -> Listing:
+        """depth の深さまで走査する（シンボリックリンクのディレクトリには入らない）"""
+        os_path = os.path.join(self.root_dir, path)
+        if not self.allow_hidden and any(_is_hidden(part) for part in path.split("/")):
+            raise FileNotFoundError(path)
+        try:
+            st = os.stat(os_path)
+        except OSError:
+            raise FileNotFoundError(path)
+        if not stat.S_ISDIR(st.st_mode):
+            # ファイルの一覧は空
+            return Listing([], {os_path: st.st_mtime_ns}, False)
+
+        entries = []
+        dir_mtimes = {os_path: st.st_mtime_ns}
+        truncated = False
+        stack = [(path, os_path, 1)]
+        while stack and not truncated:
+            rel_dir, os_dir, level = stack.pop()
+            try:
+                scanner = os.scandir(os_dir)
+            except OSError as e:
+                logger.debug("Cannot list %s: %r", os_dir, e)
+                continue
+            with scanner:
+                for entry in scanner:
+                    name = entry.name
+                    if not self.should_list(name) or (not self.allow_hidden and _is_hidden(name)):
+                        continue
+                    try:
+                        entry_st = entry.stat()
+                    except OSError:
+                        # 壊れたシンボリックリンク等
+                        continue
+                    rel_path = f"{rel_dir}/{name}" if rel_dir else name
+                    if stat.S_ISDIR(entry_st.st_mode):
+                        entry_type = "directory"
+                        size = None
+                        if level < depth and not entry.is_symlink():
+                            dir_mtimes[entry.path] = entry_st.st_mtime_ns
+                            stack.append((rel_path, entry.path, level + 1))
+                    elif stat.S_ISREG(entry_st.st_mode):
+                        entry_type = "notebook" if name.endswith(".ipynb") else "file"
+                        size = entry_st.st_size
+                    else:
+                        continue
+                    entries.append({
+                        "name": name,
+                        "path": "/" + rel_path,
+                        "type": entry_type,
+                        "size": size,
+                        "modified_at": datetime.fromtimestamp(entry_st.st_mtime, tz=timezone.utc),
+                    })
+                    if len(entries) >= self.max_entries:
+                        truncated = True
+                        break
+
+        entries.sort(key=lambda e: e["path"])
+        return Listing(entries, dir_mtimes, truncated)
+
+    def stats(self) -> dict:
+        return {"cached": len(self._cache), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,111 @@
+"""
+実行の打ち切り
+
+タイムアウトやクライアントの切断で結果を待たなくなった実行は、そのままでは
+カーネルで動き続け、同じカーネルへの以降の要求を待たせる。設定に従って
+カーネルを中断し、猶予時間内に止まらない場合は再起動して実行枠を解放する。
+"""
+
+import asyncio
+import logging
+
+from . import config
+from .kernel_connection import KernelConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# 打ち切りの理由
+TIMEOUT = "timeout"
+DISCONNECT = "disconnect"
+CANCEL = "cancel"
+
+# 打ち切りの処理
+ACTIONS = ("interrupt", "none")
+
+# 打ち切りの結果
+COMPLETED = "completed"  # 打ち切る前に実行が終わっていた
+INTERRUPTED = "interrupted"  # 中断で止まった
+RESTARTED = "restarted"  # 中断で止まらずカーネルを再起動した
+RUNNING = "running"  # 設定により打ち切らなかった
+FAILED = "failed"  # 中断・再起動に失敗した
+
+
+class ExecutionTimeoutError(TimeoutError):
+    """実行がタイムアウトした（outcome は打ち切りの結果）"""
+
+    def __init__(self, message: str, outcome: str):
+        super().__init__(message)
+        self.outcome = outcome
+
+
+class ExecutionGuard:
+    """結果を待たなくなった実行を打ち切る"""
+
+    def __init__(
+        self,
+        kernel_manager,
+        connections: KernelConnectionPool,
+        timeout_action: str = config.EXECUTION_TIMEOUT_ACTION,
+        disconnect_action: str = config.EXECUTION_DISCONNECT_ACTION,
+        grace: float = config.EXECUTION_INTERRUPT_GRACE,
+    ):
+        for action in (timeout_action, disconnect_action):
+            if action not in ACTIONS:
+                raise ValueError(f"Unknown execution action: {action} (expected one of {', '.join(ACTIONS)})")
+        self.kernel_manager = kernel_manager
+        self.connections = connections
+        self.actions = {TIMEOUT: timeout_action, DISCONNECT: disconnect_action, CANCEL: "interrupt"}
+        self.grace = grace
+        # 打ち切り処理中のカーネル（同時に要求された場合は同じ処理を待つ）
+        self._stopping: dict[str, asyncio.Future] = {}
+        self.counts = {reason: 0 for reason in self.actions}
+        self.outcomes = {outcome: 0 for outcome in (COMPLETED, INTERRUPTED, RESTARTED, RUNNING, FAILED)}
+
+    async def stop(self, kernel_id: str, msg_ids: list, reason: str) -> str:
+        """送信済みの execute_request の実行を打ち切り、結果を返す
+
+        中断後も grace 秒以内に要求の処理が終わらない場合はカーネルを再起動する。
+        カーネルの実行待ちに残っている後続の要求（バッチの未実行のセル）も対象に含める。
+        """
+        self.counts[reason] += 1
+        conn = self.connections.peek(kernel_id)
+        if conn is None or not conn.unfinished(msg_ids):
+            outcome = COMPLETED
+        elif self.actions[reason] == "none":
+            outcome = RUNNING
+        else:
+            task = self._stopping.get(kernel_id)
+            if task is None:
+                task = asyncio.ensure_future(self._interrupt(kernel_id, msg_ids))
+                self._stopping[kernel_id] = task
+                task.add_done_callback(lambda _: self._stopping.pop(kernel_id, None))
+            outcome = await asyncio.shield(task)
+
+        self.outcomes[outcome] += 1
+        if outcome != COMPLETED:
+            logger.info("Execution on kernel %s stopped by %s: %s", kernel_id, reason, outcome)
+        return outcome
+
+    async def _interrupt(self, kernel_id: str, msg_ids: list) -> str:
+        conn = self.connections.peek(kernel_id)
+        try:
+            await self.kernel_manager.interrupt_kernel(kernel_id)
+            if conn is not None and await conn.wait_finished(msg_ids, self.grace):
+                return INTERRUPTED
+
+            logger.warning("Kernel %s did not stop within %s seconds, restarting", kernel_id, self.grace)
+            self.connections.close(kernel_id)
+            await self.kernel_manager.restart_kernel(kernel_id)
+            return RESTARTED
+        except Exception:
+            logger.exception("Failed to stop execution on kernel %s", kernel_id)
+            return FAILED
+
+    def stats(self) -> dict:
+        return {
+            "timeouts": self.counts[TIMEOUT],
+            "disconnects": self.counts[DISCONNECT],
+            "cancels": self.counts[CANCEL],
+            **self.outcomes,
+        }
+
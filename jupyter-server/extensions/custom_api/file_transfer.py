@@ -0,0 +1,188 @@
+"""
+大きなファイルの転送
+
+ContentsManager はファイル全体を文字列（バイナリは base64）として読み書きするため、
+大きなファイルではメモリ使用量がファイルサイズの数倍になる。ダウンロードは一定サイズの
+チャンクに分けて読みながら送信し（Range 要求に対応）、アップロードは受信したチャンクを
+そのままディスクへ書き込む。どちらもサーバーのメモリ使用量はファイルサイズに依存しない。
+
+アップロードは途中から再開できる。受信中のデータは保存先と同じディレクトリの
+隠しファイルに書き込み、全体を受信した時点で保存先に置き換える。
+"""
+
+import hashlib
+import os
+import re
+import time
+import uuid
+from email.utils import formatdate
+from typing import Optional
+
+from . import config
+from .scheduler import QueueFullError
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# アップロードの状態
+UPLOADING = "uploading"
+COMPLETED = "completed"
+
+
+class RangeNotSatisfiableError(ValueError):
+    """Range の範囲がファイルの外にある"""
+
+
+def parse_range(header: str, size: int) -> Optional[tuple]:
+    """Range ヘッダーを解釈して (開始, 終了（含まない）) を返す
+
+    対応しない形式（複数の範囲等）の場合は None（ファイル全体を返す）。
+
+    Raises:
+        RangeNotSatisfiableError: 範囲がファイルの外にある場合
+    """
+    match = _RANGE_PATTERN.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # 末尾から last バイト
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiableError(header)
+        return max(size - length, 0), size
+    start = int(first)
+    end = min(int(last) + 1, size) if last else size
+    if start >= size or start >= end:
+        raise RangeNotSatisfiableError(header)
+    return start, end
+
+
+def make_etag(st: os.stat_result) -> str:
+    """ファイルの更新時刻とサイズから ETag を作る"""
+    digest = hashlib.sha1(f"{st.st_mtime_ns}-{st.st_size}-{st.st_ino}".encode()).hexdigest()[:16]
+    return f'"{digest}"'
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def local_path(root_dir: str, path: str, allow_hidden: bool = False) -> str:
+    """検証済みの相対パスをディスク上のパスにする
+
+    Raises:
+        FileNotFoundError: 隠しファイル・隠しディレクトリの場合（Jupyter Server と同じく存在しないものとして扱う）
+    """
+    if not allow_hidden and any(part.startswith(".") for part in path.split("/")):
+        raise FileNotFoundError(path)
+    return os.path.join(root_dir, path)
+
+
+class Upload:
+    """受信中のアップロード"""
+
+    def __init__(self, path: str, os_path: str, size: int):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.os_path = os_path
+        self.size = size
+        # 保存先と同じファイルシステム上に置き、完了時に置き換える
+        directory, name = os.path.split(os_path)
+        self.part_path = os.path.join(directory, f".{name}.{self.id}.upload")
+        self.offset = 0
+        self.status = UPLOADING
+        # チャンクを受信中（同じアップロードへの同時の送信は受け付けない）
+        self.active = False
+        self.last_activity = time.monotonic()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "path": "/" + self.path,
+            "size": self.size,
+            "offset": self.offset,
+            "status": self.status,
+        }
+
+
+class UploadStore:
+    """受信中のアップロードの保持（一定時間送信の無いものは削除する）"""
+
+    def __init__(
+        self,
+        root_dir: str,
+        allow_hidden: bool = False,
+        max_uploads: int = config.UPLOAD_MAX_UPLOADS,
+        ttl: int = config.UPLOAD_TTL,
+    ):
+        self.root_dir = os.path.abspath(root_dir)
+        self.allow_hidden = allow_hidden
+        self.max_uploads = max_uploads
+        self.ttl = ttl
+        self._uploads: dict[str, Upload] = {}
+
+    @classmethod
+    def from_contents_manager(cls, contents_manager) -> "UploadStore":
+        return cls(contents_manager.root_dir, allow_hidden=contents_manager.allow_hidden)
+
+    def create(self, path: str, size: int) -> Upload:
+        """アップロードを開始する（受信用の空のファイルを作る）
+
+        Raises:
+            FileNotFoundError: 保存先のディレクトリが存在しない場合
+            ValueError: 保存先がディレクトリの場合
+            QueueFullError: 受信中のアップロード数が上限に達している場合
+        """
+        self._expire()
+        os_path = local_path(self.root_dir, path, self.allow_hidden)
+        if os.path.isdir(os_path):
+            raise ValueError(f"Is a directory: {path}")
+        if not os.path.isdir(os.path.dirname(os_path)):
+            raise FileNotFoundError(os.path.dirname(path) or "/")
+        if len(self._uploads) >= self.max_uploads:
+            raise QueueFullError(f"Too many uploads in progress ({len(self._uploads)})", config.UPLOAD_RETRY_AFTER)
+        upload = Upload(path, os_path, size)
+        open(upload.part_path, "xb").close()
+        self._uploads[upload.id] = upload
+        return upload
+
+    def get(self, upload_id: str) -> Optional[Upload]:
+        self._expire()
+        return self._uploads.get(upload_id)
+
+    def complete(self, upload: Upload):
+        """受信したファイルを保存先に置き換える"""
+        os.replace(upload.part_path, upload.os_path)
+        upload.status = COMPLETED
+        self._uploads.pop(upload.id, None)
+
+    def remove(self, upload_id: str):
+        """アップロードを取り消し、受信したデータを削除する"""
+        upload = self._uploads.pop(upload_id, None)
+        if upload is not None:
+            try:
+                os.remove(upload.part_path)
+            except FileNotFoundError:
+                pass
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [
+            upload.id for upload in self._uploads.values()
+            if not upload.active and now - upload.last_activity > self.ttl
+        ]
+        for upload_id in expired:
+            self.remove(upload_id)
+
+    def stats(self) -> dict:
+        return {
+            "uploads": len(self._uploads),
+            "receiving": sum(1 for upload in self._uploads.values() if upload.active),
+        }
+
+    def close(self):
+        """受信途中のデータを削除する（停止後は再開できないため）"""
+        for upload_id in list(self._uploads):
+            self.remove(upload_id)
@@ -4,17 +4,44 @@
 api-contracts.md に定義された仕様に従った API を提供する。
 """
 
+import asyncio
 import json
+import mimetypes
+import os
+import stat
 import time
 import traceback
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Optional
 
 from jupyter_server.base.handlers import APIHandler
 from tornado import web
-
-from .kernel_executor import KernelExecutor
+from tornado.iostream import StreamClosedError
+
+from . import config, metrics, serialization
+from .dataset_index import DatasetIndex, dataset_format
+from .directory_listing import DirectoryLister
+from .execution_guard import DISCONNECT, ExecutionGuard, ExecutionTimeoutError
+from .file_transfer import (
+    RangeNotSatisfiableError,
+    UploadStore,
+    http_date,
+    local_path,
+    make_etag,
+    parse_range,
+)
+from .image_processing import IMAGE_FORMATS, ImageOptions
+from .image_store import ImageStore
+from .jobs import QUEUED, Job, JobStore
+from .kernel_connection import KernelConnectionPool
+from .kernel_culler import KernelCuller
+from .kernel_executor import AgentError, KernelExecutor
+from .kernel_pool import KernelPool
+from .notebook_cache import CellOperationError, NotebookCache, NotebookConflictError
+from .output_buffer import SpillStore
+from .scheduler import PRIORITIES, ExecutionScheduler, QueueFullError, Ticket
 
 
 def make_response(data: Any) -> dict:
@@ -27,6 +54,93 @@ def make_error(code: str, message: str) -> dict:
     return {"error": {"code": code, "message": message}}
 
 
+def make_execution_error(e: Exception, timeout: float) -> dict:
+    """実行時の例外からエラー情報を生成"""
+    if isinstance(e, TimeoutError):
+        error = {
+            "type": "TimeoutError",
+            "message": f"Execution timed out after {timeout} seconds",
+            "traceback": [],
+        }
+        if isinstance(e, ExecutionTimeoutError):
+            # 実行の打ち切りの結果（interrupted / restarted 等）
+            error["outcome"] = e.outcome
+        return error
+    return {
+        "type": type(e).__name__,
+        "message": str(e),
+        "traceback": traceback.format_exc().split("\n"),
+    }
+
+
+def validate_code(code: Any, name: str = "code"):
+    """実行するコードを検証
+
+    Raises:
+        ValueError: 不正な値の場合
+    """
+    # 空文字列の場合はそのまま処理（何もしない）
+    if not isinstance(code, str):
+        raise ValueError(f"{name} must be a string")
+
+    # 長さチェック（DoS対策）
+    if len(code) > 1000000:
+        raise ValueError(f"{name} exceeds maximum length (1000000 characters)")
+
+    # NULLバイト攻撃対策
+    if "\0" in code:
+        raise ValueError(f"{name} contains invalid characters")
+
+
+def validate_timeout(timeout: Any, maximum: int = 300):
+    """実行のタイムアウト（秒）を検証
+
+    Raises:
+        ValueError: 不正な値の場合
+    """
+    if not isinstance(timeout, (int, float)):
+        raise ValueError("timeout must be a number")
+    if timeout <= 0:
+        raise ValueError("timeout must be positive")
+    if timeout > maximum:
+        raise ValueError(f"timeout exceeds maximum ({maximum} seconds)")
+
+
+def parse_image_options(body: dict) -> ImageOptions:
+    """リクエストボディから画像出力の返却方法を取得
+
+    Raises:
+        ValueError: 不正な値の場合
+    """
+    inline = body.get("inline_images", False)
+    image_format = body.get("image_format", "original")
+    max_size = body.get("image_max_size")
+    quality = body.get("image_quality", 80)
+
+    if not isinstance(inline, bool):
+        raise ValueError("inline_images must be a boolean")
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"image_format must be one of: {', '.join(IMAGE_FORMATS)}")
+    if max_size is not None and (not isinstance(max_size, int) or isinstance(max_size, bool) or max_size < 16):
+        raise ValueError("image_max_size must be an integer of at least 16")
+    if not isinstance(quality, int) or isinstance(quality, bool) or not 1 <= quality <= 100:
+        raise ValueError("image_quality must be an integer between 1 and 100")
+
+    return ImageOptions(inline=inline, format=image_format, max_size=max_size, quality=quality)
+
+
+def parse_priority(body: dict) -> str:
+    """リクエストボディから実行の優先度を取得
+
+    Raises:
+        ValueError: 不正な値の場合
+    """
+    priority = body.get("priority", "normal")
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of: {', '.join(PRIORITIES)}")
+    return priority
+
+
 def validate_path(user_input: str, base_dir: str = "/home/jovyan/work") -> str:
     """
     パストラバーサル攻撃を防ぐためのパス検証
@@ -39,8 +153,11 @@ def validate_path(user_input: str, base_dir: str = "/home/jovyan/work") -> str:
         検証済みの相対パス
 
     Raises:
-        ValueError: 不正なパスの場合
+        ValueError: 不正なパス・文字列でない場合
     """
+    # JSON ボディの数値・オブジェクト等
+    if not isinstance(user_input, str):
+        raise ValueError(f"パスは文字列で指定してください: {user_input!r}")
     if not user_input:
         return ""
 
@@ -63,20 +180,122 @@ def validate_path(user_input: str, base_dir: str = "/home/jovyan/work") -> str:
 class BaseCustomHandler(APIHandler):
     """カスタムハンドラーの基底クラス"""
 
+    # レスポンスの JSON エンコード・書き込みの時間を実行の段階として記録する場合の名前
+    metrics_endpoint: Optional[str] = None
+    _bytes_out = 0
+    _serialized_at: Optional[float] = None
+
+    # 実行中のコード（クライアントの切断時に打ち切る）
+    _executing: Optional[KernelExecutor] = None
+    _disconnected = False
+    _disconnect_stop: Optional[asyncio.Future] = None
+
+    def on_connection_close(self):
+        super().on_connection_close()
+        self.stop_on_disconnect()
+
+    def stop_on_disconnect(self):
+        """クライアントが切断した場合、実行中のコードを打ち切る"""
+        self._disconnected = True
+        executor = self._executing
+        if executor is not None and self._disconnect_stop is None:
+            self._disconnect_stop = asyncio.ensure_future(
+                self.execution_guard.stop(executor.kernel_id, executor.inflight, DISCONNECT)
+            )
+
+    @asynccontextmanager
+    async def executing(self, executor: KernelExecutor):
+        """executor による実行の間、クライアントの切断を監視する
+
+        切断された場合は打ち切りが終わるまで抜けない（実行枠を保持したままにする）。
+        """
+        self._executing = executor
+        try:
+            yield
+        finally:
+            self._executing = None
+            if self._disconnect_stop is not None:
+                await self._disconnect_stop
+
     def write_json(self, data: dict, status_code: int = 200):
-        """JSONレスポンスを書き込む"""
+        """JSONレスポンスを書き込む（Accept-Encoding に応じて圧縮する）"""
+        started = time.perf_counter()
+        body, encoding = serialization.encode(data, self._accepted_encoding())
+        self._write_encoded(body, encoding, status_code, started)
+
+    async def write_json_async(self, data: dict, status_code: int = 200):
+        """write_json と同じ（大きなレスポンスはワーカースレッドでエンコード・圧縮する）"""
+        started = time.perf_counter()
+        body, encoding = await serialization.encode_async(data, self._accepted_encoding())
+        self._write_encoded(body, encoding, status_code, started)
+
+    def _accepted_encoding(self) -> Optional[str]:
+        return serialization.negotiate_encoding(self.request.headers.get("Accept-Encoding", ""))
+
+    def _write_encoded(self, body: bytes, encoding: Optional[str], status_code: int, started: float):
+        if self.metrics_endpoint is not None:
+            self._serialized_at = time.perf_counter()
+            metrics.observe_phase(self.metrics_endpoint, "serialize", self._serialized_at - started)
         self.set_status(status_code)
         self.set_header("Content-Type", "application/json")
-        self.write(json.dumps(data, ensure_ascii=False, default=str))
+        self.add_header("Vary", "Accept-Encoding")
+        if encoding is not None:
+            self.set_header("Content-Encoding", encoding)
+        self.write(body)
+
+    def write(self, chunk):
+        """レスポンスを書き込む（送信バイト数を数える）"""
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        if isinstance(chunk, bytes):
+            self._bytes_out += len(chunk)
+        super().write(chunk)
+
+    def on_finish(self):
+        super().on_finish()
+        handler = type(self).__name__
+        metrics.REQUEST_BYTES.labels(handler).inc(len(self.request.body or b""))
+        metrics.RESPONSE_BYTES.labels(handler).inc(self._bytes_out)
+        if self._serialized_at is not None:
+            metrics.observe_phase(self.metrics_endpoint, "write", time.perf_counter() - self._serialized_at)
 
     def write_success(self, data: Any):
         """成功レスポンスを書き込む"""
         self.write_json(make_response(data))
 
+    async def write_success_async(self, data: Any):
+        """成功レスポンスを書き込む（大きくなり得るレスポンス用、write_json_async を参照）"""
+        await self.write_json_async(make_response(data))
+
     def write_error_response(self, code: str, message: str, status_code: int = 400):
         """エラーレスポンスを書き込む"""
         self.write_json(make_error(code, message), status_code)
 
+    def write_queue_full(self, e: QueueFullError):
+        """実行待ち行列が満杯のレスポンスを書き込む"""
+        self.set_header("Retry-After", str(e.retry_after))
+        self.write_error_response("QUEUE_FULL", str(e), 429)
+
+    def wants_event_stream(self) -> bool:
+        """ストリーミング応答（Server-Sent Events）が要求されているか"""
+        if self.get_argument("stream", "").lower() in ("1", "true"):
+            return True
+        return "text/event-stream" in self.request.headers.get("Accept", "")
+
+    def start_event_stream(self):
+        """Server-Sent Events のレスポンスヘッダーを設定"""
+        self.set_status(200)
+        self.set_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.set_header("Cache-Control", "no-cache")
+        # リバースプロキシでのバッファリングを無効化
+        self.set_header("X-Accel-Buffering", "no")
+
+    async def write_event(self, event: str, data: Any):
+        """Server-Sent Events の 1 イベントを書き込み、即座に送信する"""
+        payload = serialization.dumps(data)
+        self.write(b"event: %s\ndata: %s\n\n" % (event.encode("utf-8"), payload))
+        await self.flush()
+
     def get_json_body(self) -> dict:
         """リクエストボディをJSONとしてパース"""
         try:
@@ -86,7 +305,8 @@ class BaseCustomHandler(APIHandler):
 
     def check_kernel_exists(self, kernel_id: str) -> bool:
         """カーネルの存在確認"""
-        if kernel_id not in self.kernel_manager:
+        # 割り当て前のプールのカーネルは存在しないものとして扱う
+        if kernel_id not in self.kernel_manager or self.kernel_pool.is_pooled(kernel_id):
             self.write_error_response("KERNEL_NOT_FOUND", f"Kernel not found: {kernel_id}", 404)
             return False
         return True
@@ -96,6 +316,77 @@ class BaseCustomHandler(APIHandler):
         """カーネルマネージャーを取得"""
         return self.settings["kernel_manager"]
 
+    @property
+    def kernel_connections(self) -> KernelConnectionPool:
+        """カーネル接続プールを取得"""
+        return self.settings["custom_api_kernel_connections"]
+
+    @property
+    def kernel_pool(self) -> KernelPool:
+        """ウォームアップ済みカーネルのプール"""
+        return self.settings["custom_api_kernel_pool"]
+
+    @property
+    def kernel_culler(self) -> KernelCuller:
+        """アイドルカーネルの停止"""
+        return self.settings["custom_api_kernel_culler"]
+
+    @property
+    def jobs(self) -> JobStore:
+        """非同期ジョブのストア"""
+        return self.settings["custom_api_jobs"]
+
+    @property
+    def image_store(self) -> ImageStore:
+        """画像ストアを取得"""
+        return self.settings["custom_api_image_store"]
+
+    @property
+    def output_spills(self) -> SpillStore:
+        """上限を超えた実行出力の退避先"""
+        return self.settings["custom_api_output_spills"]
+
+    @property
+    def scheduler(self) -> ExecutionScheduler:
+        """実行スケジューラー"""
+        return self.settings["custom_api_scheduler"]
+
+    @property
+    def execution_guard(self) -> ExecutionGuard:
+        """タイムアウト・切断時の実行の打ち切り"""
+        return self.settings["custom_api_execution_guard"]
+
+    def get_executor(self, kernel_id: str) -> KernelExecutor:
+        """カーネル実行ヘルパーを生成"""
+        return KernelExecutor(
+            kernel_id,
+            self.kernel_connections,
+            self.image_store,
+            self.scheduler,
+            self.execution_guard,
+            self.output_spills,
+        )
+
+    @property
+    def directory_lister(self) -> DirectoryLister:
+        """ファイル一覧の走査とキャッシュ"""
+        return self.settings["custom_api_directory_lister"]
+
+    @property
+    def dataset_index(self) -> DatasetIndex:
+        """データディレクトリのファイルの情報"""
+        return self.settings["custom_api_dataset_index"]
+
+    @property
+    def uploads(self) -> UploadStore:
+        """受信中のアップロード"""
+        return self.settings["custom_api_uploads"]
+
+    @property
+    def notebook_cache(self) -> NotebookCache:
+        """編集中のノートブックのキャッシュ"""
+        return self.settings["custom_api_notebook_cache"]
+
     @property
     def contents_manager(self):
         """コンテンツマネージャーを取得"""
@@ -112,11 +403,20 @@ class HealthHandler(BaseCustomHandler):
 
     @web.authenticated
     def get(self):
-        kernels = list(self.kernel_manager.list_kernel_ids())
+        kernels = [k for k in self.kernel_manager.list_kernel_ids() if not self.kernel_pool.is_pooled(k)]
         self.write_json({
             "status": "healthy",
             "version": "1.0.0",
             "kernels_active": len(kernels),
+            "kernel_pool": self.kernel_pool.stats(),
+            "kernel_culler": self.kernel_culler.stats(),
+            "scheduler": self.scheduler.stats(),
+            "jobs": self.jobs.stats(),
+            "interrupts": self.execution_guard.stats(),
+            "notebook_cache": self.notebook_cache.stats(),
+            "contents_list": self.directory_lister.stats(),
+            "uploads": self.uploads.stats(),
+            "datasets": self.dataset_index.stats(),
         })
 
 
@@ -134,6 +434,8 @@ class KernelsHandler(BaseCustomHandler):
         kernel_ids = self.kernel_manager.list_kernel_ids()
         kernels = []
         for kernel_id in kernel_ids:
+            if self.kernel_pool.is_pooled(kernel_id):
+                continue
             kernel = self.kernel_manager.get_kernel(kernel_id)
             kernels.append({
                 "id": kernel_id,
@@ -150,12 +452,17 @@ class KernelsHandler(BaseCustomHandler):
         kernel_name = body.get("name", "python3")
 
         try:
-            kernel_id = await self.kernel_manager.start_kernel(kernel_name=kernel_name)
+            # ウォームアップ済みのカーネルがあれば割り当てる（プールは非同期に補充される）
+            kernel_id = self.kernel_pool.acquire(kernel_name)
+            warm = kernel_id is not None
+            if not warm:
+                kernel_id = await self.kernel_manager.start_kernel(kernel_name=kernel_name)
             kernel = self.kernel_manager.get_kernel(kernel_id)
             self.write_success({
                 "id": kernel_id,
                 "name": kernel.kernel_name,
-                "status": "starting",
+                "status": kernel.execution_state if warm else "starting",
+                "warm": warm,
                 "started_at": datetime.utcnow().isoformat() + "Z",
             })
         except Exception as e:
@@ -172,15 +479,27 @@ class KernelHandler(BaseCustomHandler):
             return
 
         kernel = self.kernel_manager.get_kernel(kernel_id)
-        executor = KernelExecutor(kernel_id, self.kernel_manager)
-        execution_count = await executor.get_execution_count()
+        # 接続が受信したメッセージから記録した状態を返す（カーネルには問い合わせない）
+        conn = self.kernel_connections.peek(kernel_id)
+        if conn is None:
+            # 接続の確立（実行中のセルの後に実行カウントを取得する）は待たず、
+            # 今回はカーネルマネージャーの状態を返す
+            self.kernel_connections.connect_in_background(kernel_id)
+
+        status = kernel.execution_state or "unknown"
+        if conn is not None and conn.execution_state is not None and status != "dead":
+            status = conn.execution_state
+        last_activity = conn.last_activity if conn is not None else None
 
         self.write_success({
             "id": kernel_id,
             "name": kernel.kernel_name,
-            "status": kernel.execution_state or "unknown",
-            "execution_count": execution_count,
+            "status": status,
+            "execution_count": conn.execution_count if conn is not None else 0,
+            "current_msg_id": conn.current_msg_id if conn is not None else None,
+            "queued": self.scheduler.queue_depth(kernel_id),
             "started_at": kernel.last_activity.isoformat() if kernel.last_activity else None,
+            "last_activity": last_activity.isoformat() if last_activity else None,
         })
 
     @web.authenticated
@@ -189,7 +508,9 @@ class KernelHandler(BaseCustomHandler):
         if not self.check_kernel_exists(kernel_id):
             return
 
+        self.kernel_connections.close(kernel_id)
         await self.kernel_manager.shutdown_kernel(kernel_id)
+        self.scheduler.forget(kernel_id)
         self.write_success({
             "id": kernel_id,
             "status": "deleted",
@@ -222,6 +543,8 @@ class KernelRestartHandler(BaseCustomHandler):
         if not self.check_kernel_exists(kernel_id):
             return
 
+        # 再起動後は新しいチャネルで接続し直す
+        self.kernel_connections.close(kernel_id)
         await self.kernel_manager.restart_kernel(kernel_id)
         self.write_success({
             "id": kernel_id,
@@ -237,6 +560,8 @@ class KernelRestartHandler(BaseCustomHandler):
 class KernelExecuteHandler(BaseCustomHandler):
     """POST /api/kernels/{kernel_id}/execute"""
 
+    metrics_endpoint = "execute"
+
     @web.authenticated
     async def post(self, kernel_id: str):
         """コードを実行"""
@@ -252,66 +577,371 @@ class KernelExecuteHandler(BaseCustomHandler):
             self.write_error_response("VALIDATION_ERROR", "code is required", 400)
             return
 
-        # 空文字列の場合はそのまま処理（何もしない）
-        if not isinstance(code, str):
-            self.write_error_response("VALIDATION_ERROR", "code must be a string", 400)
+        try:
+            validate_code(code)
+            validate_timeout(timeout)
+        except ValueError as e:
+            self.write_error_response("VALIDATION_ERROR", str(e), 400)
             return
 
-        # 長さチェック（DoS対策）
-        if len(code) > 1000000:
-            self.write_error_response("VALIDATION_ERROR", "code exceeds maximum length (1000000 characters)", 400)
+        try:
+            image_options = parse_image_options(body)
+            priority = parse_priority(body)
+        except ValueError as e:
+            self.write_error_response("VALIDATION_ERROR", str(e), 400)
             return
 
-        # NULLバイト攻撃対策
-        if "\0" in code:
-            self.write_error_response("VALIDATION_ERROR", "code contains invalid characters", 400)
+        # カーネルの実行待ち行列に入れる（満杯なら待たせずに 429）
+        try:
+            ticket = self.scheduler.admit(kernel_id, priority)
+        except QueueFullError as e:
+            self.write_queue_full(e)
             return
 
-        # timeout パラメータの検証
-        if not isinstance(timeout, (int, float)):
-            self.write_error_response("VALIDATION_ERROR", "timeout must be a number", 400)
+        executor = self.get_executor(kernel_id)
+
+        async with ticket, self.executing(executor):
+            if self._disconnected:
+                # 順番待ちの間にクライアントが切断した
+                return
+
+            if self.wants_event_stream():
+                await self._execute_streaming(executor, code, timeout, image_options, ticket)
+                return
+
+            start_time = time.time()
+
+            try:
+                result = await executor.execute(code, timeout=timeout, image_options=image_options)
+                metrics.observe_execution("execute", executor, ticket.wait_ms, time.time() - start_time)
+                execution_time_ms = int((time.time() - start_time) * 1000)
+                result["execution_time_ms"] = execution_time_ms
+                result["queue_wait_ms"] = ticket.wait_ms
+                await self.write_success_async(result)
+            except Exception as e:
+                metrics.observe_execution("execute", executor, ticket.wait_ms, time.time() - start_time)
+                execution_time_ms = int((time.time() - start_time) * 1000)
+                self.write_success({
+                    "success": False,
+                    "execution_count": 0,
+                    "error": make_execution_error(e, timeout),
+                    "execution_time_ms": execution_time_ms,
+                    "queue_wait_ms": ticket.wait_ms,
+                })
+
+    async def _execute_streaming(
+        self, executor: KernelExecutor, code: str, timeout: float, image_options: ImageOptions, ticket: Ticket
+    ):
+        """出力を Server-Sent Events として到着順に送信する"""
+        self.start_event_stream()
+        start_time = time.time()
+        success = True
+        execution_count = 0
+
+        events = executor.stream(code, timeout=timeout, image_options=image_options)
+        try:
+            async for event in events:
+                kind = event.pop("event")
+                if kind == "done":
+                    execution_count = event["execution_count"]
+                    continue
+                if kind == "error":
+                    success = False
+                await self.write_event(kind, event)
+        except StreamClosedError:
+            # クライアントが切断した
+            self.stop_on_disconnect()
             return
+        except Exception as e:
+            success = False
+            await self.write_event("error", {"error": make_execution_error(e, timeout)})
+        finally:
+            # 途中で抜けた場合も受信口の登録等の後始末をすぐに行う
+            await events.aclose()
+
+        metrics.observe_execution("execute", executor, ticket.wait_ms, time.time() - start_time)
+        await self.write_event("done", {
+            "success": success,
+            "execution_count": execution_count,
+            "execution_time_ms": int((time.time() - start_time) * 1000),
+            "queue_wait_ms": ticket.wait_ms,
+        })
+        self.finish()
+
+
+class KernelExecuteBatchHandler(BaseCustomHandler):
+    """POST /api/kernels/{kernel_id}/execute_batch"""
+
+    metrics_endpoint = "execute_batch"
 
-        if timeout <= 0:
-            self.write_error_response("VALIDATION_ERROR", "timeout must be positive", 400)
+    @web.authenticated
+    async def post(self, kernel_id: str):
+        """複数のコードを順に実行"""
+        if not self.check_kernel_exists(kernel_id):
             return
 
-        if timeout > 300:
-            self.write_error_response("VALIDATION_ERROR", "timeout exceeds maximum (300 seconds)", 400)
+        body = self.get_json_body()
+        cells = body.get("cells")
+        timeout = body.get("timeout", 30)
+        stop_on_error = body.get("stop_on_error", True)
+
+        if not isinstance(cells, list) or not cells:
+            self.write_error_response("VALIDATION_ERROR", "cells must be a non-empty array", 400)
+            return
+
+        if len(cells) > config.EXECUTE_BATCH_MAX_CELLS:
+            self.write_error_response(
+                "VALIDATION_ERROR", f"cells exceeds maximum ({config.EXECUTE_BATCH_MAX_CELLS} cells)", 400
+            )
+            return
+
+        if not isinstance(stop_on_error, bool):
+            self.write_error_response("VALIDATION_ERROR", "stop_on_error must be a boolean", 400)
+            return
+
+        try:
+            for index, code in enumerate(cells):
+                validate_code(code, f"cells[{index}]")
+            validate_timeout(timeout)
+            image_options = parse_image_options(body)
+            priority = parse_priority(body)
+        except ValueError as e:
+            self.write_error_response("VALIDATION_ERROR", str(e), 400)
+            return
+
+        # バッチ全体で 1 つの実行枠を使う
+        try:
+            ticket = self.scheduler.admit(kernel_id, priority)
+        except QueueFullError as e:
+            self.write_queue_full(e)
             return
 
-        executor = KernelExecutor(kernel_id, self.kernel_manager)
+        executor = self.get_executor(kernel_id)
+
+        async with ticket, self.executing(executor):
+            if self._disconnected:
+                # 順番待ちの間にクライアントが切断した
+                return
+
+            if self.wants_event_stream():
+                await self._execute_streaming(executor, cells, timeout, stop_on_error, image_options, ticket)
+                return
+
+            result = await executor.execute_batch(
+                cells, timeout=timeout, stop_on_error=stop_on_error, image_options=image_options
+            )
+            result["queue_wait_ms"] = ticket.wait_ms
+            metrics.observe_execution("execute_batch", executor, ticket.wait_ms, result["execution_time_ms"] / 1000)
+            await self.write_success_async(result)
+
+    async def _execute_streaming(
+        self,
+        executor: KernelExecutor,
+        cells: list,
+        timeout: float,
+        stop_on_error: bool,
+        image_options: ImageOptions,
+        ticket: Ticket,
+    ):
+        """出力を Server-Sent Events として到着順に送信する（各イベントに cell を付ける）"""
+        self.start_event_stream()
         start_time = time.time()
+        cell_start = start_time
+        cell_success = True
+        success = True
+        finished = 0
 
+        events = executor.stream_batch(cells, timeout=timeout, stop_on_error=stop_on_error, image_options=image_options)
         try:
-            result = await executor.execute(code, timeout=timeout)
-            execution_time_ms = int((time.time() - start_time) * 1000)
-            result["execution_time_ms"] = execution_time_ms
-            self.write_success(result)
-        except TimeoutError:
-            execution_time_ms = int((time.time() - start_time) * 1000)
-            self.write_success({
-                "success": False,
-                "execution_count": 0,
-                "error": {
-                    "type": "TimeoutError",
-                    "message": f"Execution timed out after {timeout} seconds",
-                    "traceback": [],
-                },
-                "execution_time_ms": execution_time_ms,
-            })
+            async for event in events:
+                kind = event.pop("event")
+                if kind == "error":
+                    cell_success = False
+                if kind != "done":
+                    await self.write_event(kind, event)
+                    continue
+
+                now = time.time()
+                status = event["status"] or ("ok" if cell_success else "error")
+                cell_success = cell_success and status != "aborted"
+                await self.write_event("cell_done", {
+                    "cell": event["cell"],
+                    "status": status,
+                    "success": cell_success,
+                    "execution_count": event["execution_count"],
+                    "execution_time_ms": int((now - cell_start) * 1000),
+                })
+                success = success and cell_success
+                finished += 1
+                cell_start = now
+                cell_success = True
+        except StreamClosedError:
+            # クライアントが切断した
+            self.stop_on_disconnect()
+            return
         except Exception as e:
-            execution_time_ms = int((time.time() - start_time) * 1000)
-            self.write_success({
-                "success": False,
-                "execution_count": 0,
-                "error": {
-                    "type": type(e).__name__,
-                    "message": str(e),
-                    "traceback": traceback.format_exc().split("\n"),
-                },
-                "execution_time_ms": execution_time_ms,
-            })
+            success = False
+            await self.write_event("error", {"cell": finished, "error": make_execution_error(e, timeout)})
+        finally:
+            # 途中で抜けた場合も受信口の登録等の後始末をすぐに行う
+            await events.aclose()
+
+        metrics.observe_execution("execute_batch", executor, ticket.wait_ms, time.time() - start_time)
+        await self.write_event("done", {
+            "success": success and finished == len(cells),
+            "cells": len(cells),
+            "finished": finished,
+            "execution_time_ms": int((time.time() - start_time) * 1000),
+            "queue_wait_ms": ticket.wait_ms,
+        })
+        self.finish()
+
+
+class KernelJobsHandler(BaseCustomHandler):
+    """POST /api/kernels/{kernel_id}/jobs"""
+
+    @web.authenticated
+    async def post(self, kernel_id: str):
+        """コードを非同期ジョブとして実行（完了を待たずにジョブ ID を返す）"""
+        if not self.check_kernel_exists(kernel_id):
+            return
+
+        body = self.get_json_body()
+        code = body.get("code")
+        timeout = body.get("timeout", config.JOB_MAX_TIMEOUT)
+
+        if code is None:
+            self.write_error_response("VALIDATION_ERROR", "code is required", 400)
+            return
+
+        try:
+            validate_code(code)
+            validate_timeout(timeout, config.JOB_MAX_TIMEOUT)
+            image_options = parse_image_options(body)
+            priority = parse_priority(body)
+        except ValueError as e:
+            self.write_error_response("VALIDATION_ERROR", str(e), 400)
+            return
+
+        job = Job(kernel_id, code, self.output_spills)
+        try:
+            self.jobs.add(job)
+            ticket = self.scheduler.admit(kernel_id, priority)
+        except QueueFullError as e:
+            self.jobs.remove(job.id)
+            self.write_queue_full(e)
+            return
+
+        executor = self.get_executor(kernel_id)
+        job.task = asyncio.ensure_future(job.run(executor, ticket, timeout, image_options))
+        self.write_json(make_response(job.to_dict()), 202)
+
+
+class JobHandler(BaseCustomHandler):
+    """GET/DELETE /api/jobs/{job_id}"""
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            self.write_error_response("JOB_NOT_FOUND", f"Job not found: {job_id}", 404)
+        return job
+
+    @web.authenticated
+    async def get(self, job_id: str):
+        """ジョブの状態・途中の出力・結果を取得"""
+        job = self.get_job(job_id)
+        if job is None:
+            return
+        await self.write_success_async(job.to_dict())
+
+    @web.authenticated
+    async def delete(self, job_id: str):
+        """ジョブを取り消す（完了済みの場合は結果を削除する）"""
+        job = self.get_job(job_id)
+        if job is None:
+            return
+
+        if job.finished:
+            self.jobs.remove(job_id)
+            self.write_success({"id": job_id, "status": "deleted"})
+            return
+
+        queued = job.status == QUEUED
+        job.cancel(self.execution_guard)
+        if queued:
+            # 順番待ちのジョブは実行されずに cancelled になる
+            try:
+                await job.task
+            except asyncio.CancelledError:
+                pass
+        self.write_success(job.to_dict())
+
+
+class ImageHandler(BaseCustomHandler):
+    """GET /api/images/{sha256}"""
+
+    @web.authenticated
+    def get(self, digest: str):
+        """保存済み画像を返す"""
+        image = self.image_store.get(digest)
+        if image is None:
+            self.write_error_response("NOT_FOUND", f"Image not found: {digest}", 404)
+            return
+
+        # 内容のハッシュがキーのため、同じ URL の内容は変わらない
+        etag = f'"{digest}"'
+        self.set_header("ETag", etag)
+        self.set_header("Cache-Control", "private, max-age=31536000, immutable")
+        if etag in self.request.headers.get("If-None-Match", ""):
+            self.set_status(304)
+            return
+
+        try:
+            with open(image.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            # 取得後に保持期間・容量の上限で削除された
+            self.clear_header("ETag")
+            self.clear_header("Cache-Control")
+            self.write_error_response("NOT_FOUND", f"Image not found: {digest}", 404)
+            return
+        # APIHandler.finish() が Content-Type を application/json にしないよう指定する
+        self.finish(data, set_content_type=image.mime_type)
+
+
+class OutputHandler(BaseCustomHandler):
+    """GET /api/outputs/{id}"""
+
+    @web.authenticated
+    async def get(self, spill_id: str):
+        """上限を超えて退避した実行出力の全体を返す"""
+        path = await self.output_spills.get(spill_id)
+        if path is None:
+            self.write_error_response("NOT_FOUND", f"Output not found: {spill_id}", 404)
+            return
+
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            # 取得後に保持期間・容量の上限で削除された
+            self.write_error_response("NOT_FOUND", f"Output not found: {spill_id}", 404)
+            return
+
+        content_type = "text/plain; charset=utf-8"
+        self.set_header("Content-Type", content_type)
+        loop = asyncio.get_event_loop()
+        with f:
+            while True:
+                chunk = await loop.run_in_executor(None, f.read, config.FILE_STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.write(chunk)
+                try:
+                    await self.flush()
+                except StreamClosedError:
+                    return
+        # APIHandler.finish は Content-Type を指定しない場合 application/json にする
+        self.finish(set_content_type=content_type)
 
 
 # =============================================================================
@@ -328,10 +958,12 @@ class KernelVariablesHandler(BaseCustomHandler):
         if not self.check_kernel_exists(kernel_id):
             return
 
-        executor = KernelExecutor(kernel_id, self.kernel_manager)
+        since = self.get_argument("since", None)
+        executor = self.get_executor(kernel_id)
         try:
-            variables = await executor.get_variables()
-            self.write_success({"variables": variables})
+            await self.write_success_async(await executor.get_variables(since))
+        except QueueFullError as e:
+            self.write_queue_full(e)
         except Exception as e:
             self.write_error_response("INTERNAL_ERROR", str(e), 500)
 
@@ -345,13 +977,157 @@ class KernelVariableHandler(BaseCustomHandler):
         if not self.check_kernel_exists(kernel_id):
             return
 
-        executor = KernelExecutor(kernel_id, self.kernel_manager)
+        profile = self.get_argument("profile", "fast")
+        if profile not in ("fast", "exact"):
+            self.write_error_response("VALIDATION_ERROR", "profile must be 'fast' or 'exact'", 400)
+            return
+
+        sample_rows = self.get_argument("sample_rows", str(config.VARIABLE_SAMPLE_ROWS))
+        if not sample_rows.isdigit() or int(sample_rows) <= 0:
+            self.write_error_response("VALIDATION_ERROR", "sample_rows must be a positive integer", 400)
+            return
+
+        executor = self.get_executor(kernel_id)
         try:
-            variable = await executor.get_variable(name)
+            variable = await executor.get_variable(name, profile=profile, sample_rows=int(sample_rows))
             if variable is None:
                 self.write_error_response("NOT_FOUND", f"Variable not found: {name}", 404)
                 return
-            self.write_success(variable)
+            await self.write_success_async(variable)
+        except QueueFullError as e:
+            self.write_queue_full(e)
+        except Exception as e:
+            self.write_error_response("INTERNAL_ERROR", str(e), 500)
+
+
+class KernelVariableRowsHandler(BaseCustomHandler):
+    """GET /api/kernels/{kernel_id}/variables/{name}/rows"""
+
+    @web.authenticated
+    async def get(self, kernel_id: str, name: str):
+        """DataFrame の指定範囲の行を取得"""
+        if not self.check_kernel_exists(kernel_id):
+            return
+
+        offset = self.get_argument("offset", "0")
+        if not offset.isdigit():
+            self.write_error_response("VALIDATION_ERROR", "offset must be a non-negative integer", 400)
+            return
+
+        limit = self.get_argument("limit", "100")
+        if not limit.isdigit() or not 0 < int(limit) <= config.VARIABLE_ROWS_MAX_LIMIT:
+            self.write_error_response(
+                "VALIDATION_ERROR", f"limit must be between 1 and {config.VARIABLE_ROWS_MAX_LIMIT}", 400
+            )
+            return
+
+        orient = self.get_argument("format", "columnar")
+        if orient not in ("columnar", "records"):
+            self.write_error_response("VALIDATION_ERROR", "format must be 'columnar' or 'records'", 400)
+            return
+
+        columns = self.get_argument("columns", None)
+        columns = [c for c in columns.split(",") if c] if columns else None
+        sort = self.get_argument("sort", None) or None
+
+        executor = self.get_executor(kernel_id)
+        try:
+            rows = await executor.get_rows(
+                name, offset=int(offset), limit=int(limit), columns=columns, sort=sort, orient=orient
+            )
+            if rows is None:
+                self.write_error_response("NOT_FOUND", f"Variable not found: {name}", 404)
+                return
+            await self.write_success_async(rows)
+        except AgentError as e:
+            # 存在しない列・DataFrame 以外の変数など
+            if e.ename in ("KeyError", "TypeError", "ValueError"):
+                self.write_error_response("VALIDATION_ERROR", e.evalue.strip("'\""), 400)
+            else:
+                self.write_error_response("INTERNAL_ERROR", str(e), 500)
+        except QueueFullError as e:
+            self.write_queue_full(e)
+        except Exception as e:
+            self.write_error_response("INTERNAL_ERROR", str(e), 500)
+
+
+class KernelLoadHandler(BaseCustomHandler):
+    """POST /api/kernels/{kernel_id}/load"""
+
+    @web.authenticated
+    async def post(self, kernel_id: str):
+        """データディレクトリのファイルをカーネルの変数に読み込む"""
+        if not self.check_kernel_exists(kernel_id):
+            return
+
+        body = self.get_json_body()
+        name = body.get("name")
+        columns = body.get("columns")
+        filters = body.get("filters")
+        limit = body.get("limit")
+        output = body.get("output", "pandas")
+        timeout = body.get("timeout", config.DATASET_LOAD_TIMEOUT)
+
+        try:
+            if not isinstance(name, str) or not name.isidentifier():
+                raise ValueError("name must be a valid Python identifier")
+            if columns is not None and (
+                not isinstance(columns, list) or not columns or not all(isinstance(c, str) for c in columns)
+            ):
+                raise ValueError("columns must be a non-empty array of strings")
+            if filters is not None and (
+                not isinstance(filters, list)
+                or not all(isinstance(f, list) and len(f) == 3 and isinstance(f[0], str) for f in filters)
+            ):
+                raise ValueError("filters must be an array of [column, operator, value]")
+            if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit <= 0):
+                raise ValueError("limit must be a positive integer")
+            if output not in ("pandas", "arrow", "polars"):
+                raise ValueError("output must be 'pandas', 'arrow' or 'polars'")
+            validate_timeout(timeout, config.DATASET_LOAD_MAX_TIMEOUT)
+            # パストラバーサル対策
+            path = validate_path(body.get("path", ""), base_dir=config.DATA_DIR)
+            fmt = dataset_format(path)
+            if fmt is None:
+                raise ValueError(f"Unsupported file type: {path}")
+        except ValueError as e:
+            self.write_error_response("VALIDATION_ERROR", str(e), 400)
+            return
+
+        os_path = os.path.join(config.DATA_DIR, path)
+        try:
+            if any(part.startswith(".") for part in path.split("/")):
+                raise FileNotFoundError(path)
+            if fmt == "csv":
+                cache_path = await asyncio.get_event_loop().run_in_executor(
+                    None, self.dataset_index.arrow_cache_path, path
+                )
+            elif os.path.isfile(os_path):
+                cache_path = None
+            else:
+                raise FileNotFoundError(path)
+        except (FileNotFoundError, NotADirectoryError):
+            self.write_error_response("DATASET_NOT_FOUND", f"Dataset not found: {path}", 404)
+            return
+
+        executor = self.get_executor(kernel_id)
+        try:
+            result = await executor.load_dataset(
+                name, os_path, fmt, timeout,
+                columns=columns, filters=filters, limit=limit, output=output, cache_path=cache_path,
+            )
+            self.write_success({"path": "/" + path, "format": fmt, **result})
+        except AgentError as e:
+            # 存在しない列・不正な絞り込み条件など
+            if e.ename in ("KeyError", "TypeError", "ValueError", "ArrowInvalid", "ArrowTypeError", "ArrowNotImplementedError"):
+                self.write_error_response("VALIDATION_ERROR", e.evalue.strip("'\""), 400)
+            else:
+                self.write_error_response("INTERNAL_ERROR", str(e), 500)
+        except QueueFullError as e:
+            self.write_queue_full(e)
+        except TimeoutError:
+            # カーネルでの読み込みは続く（止める場合は /interrupt）
+            self.write_error_response("EXECUTION_TIMEOUT", f"Loading timed out after {timeout} seconds", 504)
         except Exception as e:
             self.write_error_response("INTERNAL_ERROR", str(e), 500)
 
@@ -366,26 +1142,40 @@ class ContentsListHandler(BaseCustomHandler):
 
     @web.authenticated
     async def get(self):
-        """ファイル一覧を取得"""
+        """ファイル一覧を取得（depth が 2 以上の場合は再帰的に取得）"""
         path = self.get_argument("path", "/")
 
+        depth = self.get_argument("depth", "1")
+        if not depth.isdigit() or not 0 < int(depth) <= config.CONTENTS_LIST_MAX_DEPTH:
+            self.write_error_response(
+                "VALIDATION_ERROR", f"depth must be between 1 and {config.CONTENTS_LIST_MAX_DEPTH}", 400
+            )
+            return
+
+        limit = self.get_argument("limit", str(config.CONTENTS_LIST_DEFAULT_LIMIT))
+        if not limit.isdigit() or not 0 < int(limit) <= config.CONTENTS_LIST_MAX_LIMIT:
+            self.write_error_response(
+                "VALIDATION_ERROR", f"limit must be between 1 and {config.CONTENTS_LIST_MAX_LIMIT}", 400
+            )
+            return
+
+        pattern = self.get_argument("pattern", None) or None
+        cursor = self.get_argument("cursor", None) or None
+
         try:
             # パストラバーサル対策
-            path = validate_path(path)
-            model = await self.contents_manager.get(path, content=True)
-            contents = []
-            if model["type"] == "directory":
-                for item in model.get("content", []):
-                    contents.append({
-                        "name": item["name"],
-                        "type": item["type"],
-                        "size": item.get("size"),
-                        "modified_at": item.get("last_modified"),
-                    })
-            self.write_success({
+            path = validate_path(path).strip("/")
+            listing = await self.directory_lister.list(
+                path, depth=int(depth), pattern=pattern, cursor=cursor, limit=int(limit)
+            )
+            await self.write_success_async({
                 "path": "/" + path if path else "/",
-                "contents": contents,
+                **listing,
             })
+        except FileNotFoundError:
+            self.write_error_response("NOTEBOOK_NOT_FOUND", f"Not found: {path}", 404)
+        except ValueError as e:
+            self.write_error_response("VALIDATION_ERROR", str(e), 400)
         except Exception as e:
             self.write_error_response("INTERNAL_ERROR", str(e), 500)
 
@@ -433,16 +1223,37 @@ class ContentsHandler(BaseCustomHandler):
         try:
             # パストラバーサル対策
             path = validate_path(path)
+            if path.endswith(".ipynb"):
+                # 未保存のセル編集を含む内容をキャッシュから返す
+                doc = await self.notebook_cache.get(path)
+                await self.write_success_async({
+                    "path": "/" + path,
+                    "type": "notebook",
+                    "content": doc.content,
+                    "modified_at": doc.mtime,
+                })
+                return
+
+            model = await self.contents_manager.get(path, content=False)
+            if model["type"] == "file" and (model.get("size") or 0) > config.CONTENTS_MAX_INLINE_BYTES:
+                # 内容全体をメモリに読み込まないよう /api/files での取得を求める
+                self.write_error_response(
+                    "FILE_TOO_LARGE",
+                    f"File exceeds {config.CONTENTS_MAX_INLINE_BYTES} bytes, use /api/files/{path}",
+                    413,
+                )
+                return
+
             model = await self.contents_manager.get(path, content=True)
             if model["type"] == "notebook":
-                self.write_success({
+                await self.write_success_async({
                     "path": "/" + path,
                     "type": "notebook",
                     "content": model["content"],
                     "modified_at": model.get("last_modified"),
                 })
             else:
-                self.write_success({
+                await self.write_success_async({
                     "path": "/" + path,
                     "type": model["type"],
                     "content": model.get("content"),
@@ -450,6 +1261,8 @@ class ContentsHandler(BaseCustomHandler):
                 })
         except FileNotFoundError:
             self.write_error_response("NOTEBOOK_NOT_FOUND", f"Not found: {path}", 404)
+        except NotebookConflictError as e:
+            self.write_error_response("NOTEBOOK_CONFLICT", str(e), 409)
         except Exception as e:
             self.write_error_response("INTERNAL_ERROR", str(e), 500)
 
@@ -490,6 +1303,8 @@ class ContentsHandler(BaseCustomHandler):
             path = validate_path(path)
             model = await self.contents_manager.get(path, content=False)
             model["content"] = content
+            # 全体を置き換えるため、キャッシュ中の未保存のセル編集は破棄する
+            await self.notebook_cache.discard(path)
             await self.contents_manager.save(model, path)
             self.write_success({"path": "/" + path, "status": "updated"})
         except FileNotFoundError:
@@ -503,6 +1318,7 @@ class ContentsHandler(BaseCustomHandler):
         try:
             # パストラバーサル対策
             path = validate_path(path)
+            await self.notebook_cache.discard(path)
             await self.contents_manager.delete(path)
             self.write_success({"path": "/" + path, "status": "deleted"})
         except FileNotFoundError:
@@ -516,62 +1332,307 @@ class ContentsCellsHandler(BaseCustomHandler):
 
     @web.authenticated
     async def patch(self, path: str):
-        """セルを追加・更新・削除"""
+        """セルを追加・更新・削除・移動（複数の操作をまとめて適用）"""
         body = self.get_json_body()
-        action = body.get("action")
-        cell = body.get("cell")
-        index = body.get("index")
+        bulk = "operations" in body
+        # operations が無い場合は本文を 1 つの操作として扱う
+        operations = body["operations"] if bulk else [body]
+
+        if not isinstance(operations, list) or not operations:
+            self.write_error_response("VALIDATION_ERROR", "operations must be a non-empty array", 400)
+            return
+        if len(operations) > config.NOTEBOOK_MAX_CELL_OPERATIONS:
+            self.write_error_response(
+                "VALIDATION_ERROR",
+                f"operations exceeds maximum ({config.NOTEBOOK_MAX_CELL_OPERATIONS} operations)",
+                400,
+            )
+            return
 
         try:
             # パストラバーサル対策
             path = validate_path(path)
-            model = await self.contents_manager.get(path, content=True)
-            if model["type"] != "notebook":
-                self.write_error_response("VALIDATION_ERROR", "Not a notebook", 400)
-                return
+            doc = await self.notebook_cache.apply(path, operations)
+            self.write_success({
+                "path": "/" + path,
+                "status": "updated",
+                "applied": len(operations),
+                "cell_count": len(doc.cells),
+            })
 
-            cells = model["content"].get("cells", [])
-
-            if action == "add":
-                new_cell = {
-                    "cell_type": cell.get("cell_type", "code"),
-                    "source": cell.get("source", ""),
-                    "metadata": {},
-                }
-                if new_cell["cell_type"] == "code":
-                    new_cell["outputs"] = []
-                    new_cell["execution_count"] = None
-
-                if index is not None and 0 <= index <= len(cells):
-                    cells.insert(index, new_cell)
-                else:
-                    cells.append(new_cell)
-
-            elif action == "update":
-                if index is None or index < 0 or index >= len(cells):
-                    self.write_error_response("INVALID_CELL_INDEX", f"Invalid index: {index}", 400)
-                    return
-                if cell.get("source") is not None:
-                    cells[index]["source"] = cell["source"]
-                if cell.get("cell_type") is not None:
-                    cells[index]["cell_type"] = cell["cell_type"]
-
-            elif action == "delete":
-                if index is None or index < 0 or index >= len(cells):
-                    self.write_error_response("INVALID_CELL_INDEX", f"Invalid index: {index}", 400)
-                    return
-                cells.pop(index)
+        except CellOperationError as e:
+            message = f"operations[{e.index}]: {e}" if bulk else str(e)
+            code = "INVALID_CELL_INDEX" if e.invalid_cell_index else "VALIDATION_ERROR"
+            self.write_error_response(code, message, 400)
+        except FileNotFoundError:
+            self.write_error_response("NOTEBOOK_NOT_FOUND", f"Not found: {path}", 404)
+        except NotebookConflictError as e:
+            self.write_error_response("NOTEBOOK_CONFLICT", str(e), 409)
+        except ValueError as e:
+            self.write_error_response("VALIDATION_ERROR", str(e), 400)
+        except Exception as e:
+            self.write_error_response("INTERNAL_ERROR", str(e), 500)
 
-            else:
-                self.write_error_response("VALIDATION_ERROR", f"Unknown action: {action}", 400)
-                return
 
-            model["content"]["cells"] = cells
-            await self.contents_manager.save(model, path)
-            self.write_success({"path": "/" + path, "status": "updated"})
+class FileHandler(BaseCustomHandler):
+    """GET/HEAD /api/files/{path}"""
 
-        except FileNotFoundError:
+    @web.authenticated
+    async def head(self, path: str):
+        """ファイルのサイズ等をヘッダーで返す"""
+        await self.get(path, include_body=False)
+
+    @web.authenticated
+    async def get(self, path: str, include_body: bool = True):
+        """ファイルの内容をそのまま返す（Range 要求に対応）"""
+        try:
+            # パストラバーサル対策
+            path = validate_path(path)
+            os_path = local_path(self.contents_manager.root_dir, path, self.contents_manager.allow_hidden)
+            st = os.stat(os_path)
+            if not stat.S_ISREG(st.st_mode):
+                raise FileNotFoundError(path)
+        except (FileNotFoundError, NotADirectoryError):
             self.write_error_response("NOTEBOOK_NOT_FOUND", f"Not found: {path}", 404)
+            return
+        except ValueError as e:
+            self.write_error_response("VALIDATION_ERROR", str(e), 400)
+            return
+
+        etag = make_etag(st)
+        self.set_header("Accept-Ranges", "bytes")
+        self.set_header("ETag", etag)
+        self.set_header("Last-Modified", http_date(st.st_mtime))
+        if etag in self.request.headers.get("If-None-Match", ""):
+            self.set_status(304)
+            return
+
+        start, end = 0, st.st_size
+        range_header = self.request.headers.get("Range")
+        # If-Range が一致しない（ファイルが変更された）場合は全体を返す
+        if range_header and self.request.headers.get("If-Range", etag) == etag:
+            try:
+                byte_range = parse_range(range_header, st.st_size)
+            except RangeNotSatisfiableError:
+                self.set_header("Content-Range", f"bytes */{st.st_size}")
+                self.write_error_response("RANGE_NOT_SATISFIABLE", f"Invalid range: {range_header}", 416)
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                self.set_status(206)
+                self.set_header("Content-Range", f"bytes {start}-{end - 1}/{st.st_size}")
+
+        mime_type, _ = mimetypes.guess_type(path)
+        mime_type = mime_type or "application/octet-stream"
+        self.set_header("Content-Type", mime_type)
+        self.set_header("Content-Length", str(end - start))
+        if include_body:
+            await self._send_file(os_path, start, end)
+        # APIHandler.finish は Content-Type を指定しない場合 application/json にする
+        self.finish(set_content_type=mime_type)
+
+    async def _send_file(self, os_path: str, start: int, end: int):
+        """チャンクごとに読み込んで送信する（送信済みになるまで次を読まない）"""
+        loop = asyncio.get_event_loop()
+        with open(os_path, "rb") as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = await loop.run_in_executor(None, f.read, min(config.FILE_STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                self.write(chunk)
+                try:
+                    await self.flush()
+                except StreamClosedError:
+                    return
+
+
+class UploadsHandler(BaseCustomHandler):
+    """POST /api/uploads"""
+
+    @web.authenticated
+    def post(self):
+        """アップロードを開始"""
+        body = self.get_json_body()
+        size = body.get("size")
+        if not isinstance(size, int) or isinstance(size, bool) or not 0 < size <= config.UPLOAD_MAX_BYTES:
+            self.write_error_response(
+                "VALIDATION_ERROR", f"size must be between 1 and {config.UPLOAD_MAX_BYTES}", 400
+            )
+            return
+
+        path = body.get("path", "")
+        try:
+            # パストラバーサル対策
+            path = validate_path(path)
+            if not path:
+                raise ValueError("path is required")
+            upload = self.uploads.create(path, size)
+            self.set_status(201)
+            self.write_success(upload.to_dict())
+        except FileNotFoundError as e:
+            self.write_error_response("NOTEBOOK_NOT_FOUND", f"Not found: {e}", 404)
+        except ValueError as e:
+            self.write_error_response("VALIDATION_ERROR", str(e), 400)
+        except QueueFullError as e:
+            self.write_queue_full(e)
+        except Exception as e:
+            self.write_error_response("INTERNAL_ERROR", str(e), 500)
+
+
+@web.stream_request_body
+class UploadHandler(BaseCustomHandler):
+    """GET/PUT/DELETE /api/uploads/{upload_id}
+
+    PUT のボディは受信したチャンクごとにディスクへ書き込む（全体をメモリに保持しない）。
+    """
+
+    _upload = None
+    _file = None
+
+    async def prepare(self):
+        await super().prepare()
+        if self._finished or self.request.method != "PUT":
+            return
+        if not self.current_user:
+            # put の @web.authenticated はボディの受信後に呼ばれるため、受信前に認証する
+            raise web.HTTPError(403)
+
+        upload = self.uploads.get(self.path_args[0])
+        if upload is None:
+            self.write_error_response("UPLOAD_NOT_FOUND", f"Upload not found: {self.path_args[0]}", 404)
+            self.finish()
+            return
+        offset = self.request.headers.get("Upload-Offset", "")
+        if not offset.isdigit():
+            self.write_error_response("VALIDATION_ERROR", "Upload-Offset header must be a non-negative integer", 400)
+            self.finish()
+            return
+        if int(offset) != upload.offset:
+            self.set_header("Upload-Offset", str(upload.offset))
+            self.write_error_response(
+                "UPLOAD_OFFSET_MISMATCH", f"Upload-Offset must be {upload.offset} (got {offset})", 409
+            )
+            self.finish()
+            return
+        if upload.active:
+            self.write_error_response("UPLOAD_IN_PROGRESS", f"Another request is sending to upload {upload.id}", 409)
+            self.finish()
+            return
+
+        # 残りのサイズを超えるボディは受け付けない
+        remaining = upload.size - upload.offset
+        content_length = self.request.headers.get("Content-Length", "0")
+        if content_length.isdigit() and int(content_length) > remaining:
+            self.write_error_response(
+                "VALIDATION_ERROR", f"Body exceeds the remaining size of the upload ({remaining} bytes)", 400
+            )
+            self.finish()
+            return
+        self.request.connection.set_max_body_size(remaining)
+        self._file = open(upload.part_path, "r+b")
+        self._file.seek(upload.offset)
+        self._upload = upload
+        upload.active = True
+
+    def data_received(self, chunk: bytes):
+        if self._file is None:
+            return
+        self._file.write(chunk)
+        self._upload.offset += len(chunk)
+        self._upload.last_activity = time.monotonic()
+        metrics.REQUEST_BYTES.labels(type(self).__name__).inc(len(chunk))
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._upload.active = False
+
+    def on_connection_close(self):
+        # 途中までに受信したデータは残し、再開できるようにする
+        super().on_connection_close()
+        self._close_file()
+
+    def on_finish(self):
+        super().on_finish()
+        self._close_file()
+
+    @web.authenticated
+    def get(self, upload_id: str):
+        """アップロードの状態（再開する位置）を取得"""
+        upload = self.uploads.get(upload_id)
+        if upload is None:
+            self.write_error_response("UPLOAD_NOT_FOUND", f"Upload not found: {upload_id}", 404)
+            return
+        self.set_header("Upload-Offset", str(upload.offset))
+        self.write_success(upload.to_dict())
+
+    @web.authenticated
+    async def put(self, upload_id: str):
+        """チャンクを受信（全体を受信した時点で保存先に置き換える）"""
+        upload = self._upload
+        self._close_file()
+        try:
+            if upload.offset == upload.size:
+                # 全体を置き換えるため、キャッシュ中の未保存のセル編集は破棄する
+                await self.notebook_cache.discard(upload.path)
+                self.uploads.complete(upload)
+            self.set_header("Upload-Offset", str(upload.offset))
+            self.write_success(upload.to_dict())
+        except Exception as e:
+            self.write_error_response("INTERNAL_ERROR", str(e), 500)
+
+    @web.authenticated
+    def delete(self, upload_id: str):
+        """アップロードを取り消す"""
+        upload = self.uploads.get(upload_id)
+        if upload is None:
+            self.write_error_response("UPLOAD_NOT_FOUND", f"Upload not found: {upload_id}", 404)
+            return
+        if upload.active:
+            self.write_error_response("UPLOAD_IN_PROGRESS", f"Another request is sending to upload {upload.id}", 409)
+            return
+        self.uploads.remove(upload_id)
+        self.write_success({"id": upload_id, "status": "deleted"})
+
+
+# =============================================================================
+# データセット
+# =============================================================================
+
+
+class DatasetsHandler(BaseCustomHandler):
+    """GET /api/datasets"""
+
+    @web.authenticated
+    async def get(self):
+        """データディレクトリの表形式ファイルの一覧を取得"""
+        pattern = self.get_argument("pattern", None) or None
+        try:
+            datasets = await self.dataset_index.list(pattern)
+            await self.write_success_async({"datasets": datasets})
+        except Exception as e:
+            self.write_error_response("INTERNAL_ERROR", str(e), 500)
+
+
+class DatasetHandler(BaseCustomHandler):
+    """GET /api/datasets/{path}"""
+
+    @web.authenticated
+    async def get(self, path: str):
+        """ファイルの列・行数・先頭の行を取得"""
+        try:
+            # パストラバーサル対策
+            path = validate_path(path, base_dir=config.DATA_DIR)
+            dataset = await self.dataset_index.get(path)
+            await self.write_success_async(dataset)
+        except (FileNotFoundError, NotADirectoryError):
+            self.write_error_response("DATASET_NOT_FOUND", f"Dataset not found: {path}", 404)
+        except ValueError as e:
+            self.write_error_response("VALIDATION_ERROR", str(e), 400)
         except Exception as e:
             self.write_error_response("INTERNAL_ERROR", str(e), 500)
 
@@ -590,9 +1651,21 @@ def get_handlers(base_url: str = ""):
         (f"{base_url}/api/kernels/([^/]+)/interrupt", KernelInterruptHandler),
         (f"{base_url}/api/kernels/([^/]+)/restart", KernelRestartHandler),
         (f"{base_url}/api/kernels/([^/]+)/execute", KernelExecuteHandler),
+        (f"{base_url}/api/kernels/([^/]+)/execute_batch", KernelExecuteBatchHandler),
+        (f"{base_url}/api/kernels/([^/]+)/jobs", KernelJobsHandler),
+        (f"{base_url}/api/jobs/([0-9a-f]{{32}})", JobHandler),
+        (f"{base_url}/api/images/([0-9a-f]{{64}})", ImageHandler),
+        (f"{base_url}/api/outputs/([0-9a-f]{{32}})", OutputHandler),
         (f"{base_url}/api/kernels/([^/]+)/variables", KernelVariablesHandler),
         (f"{base_url}/api/kernels/([^/]+)/variables/([^/]+)", KernelVariableHandler),
+        (f"{base_url}/api/kernels/([^/]+)/variables/([^/]+)/rows", KernelVariableRowsHandler),
+        (f"{base_url}/api/kernels/([^/]+)/load", KernelLoadHandler),
         (f"{base_url}/api/contents", ContentsListHandler),
         (f"{base_url}/api/contents/(.*)/cells", ContentsCellsHandler),
         (f"{base_url}/api/contents/(.*)", ContentsHandler),
+        (f"{base_url}/api/files/(.*)", FileHandler),
+        (f"{base_url}/api/uploads", UploadsHandler),
+        (f"{base_url}/api/uploads/([0-9a-f]{{32}})", UploadHandler),
+        (f"{base_url}/api/datasets", DatasetsHandler),
+        (f"{base_url}/api/datasets/(.+)", DatasetHandler),
     ]
@@ -0,0 +1,160 @@
+"""
+画像出力の変換
+
+カーネルから届いた図（PNG / SVG / Plotly）を必要に応じて縮小・形式変換し、
+画像ストアに保存する。Pillow による変換はイベントループを止めないよう
+ワーカースレッドで実行する。
+"""
+
+import asyncio
+import base64
+import io
+import json
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from . import config
+from .image_store import ImageStore
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow が無い環境では変換せずに元の画像を返す
+    Image = None
+
+PLOTLY_MIME_TYPE = "application/vnd.plotly.v1+json"
+
+# 出力バンドルから取り出す MIME タイプ（優先順）
+FIGURE_MIME_TYPES = (PLOTLY_MIME_TYPE, "image/png", "image/jpeg", "image/svg+xml")
+
+# 変換対象のラスター画像
+RASTER_MIME_TYPES = ("image/png", "image/jpeg")
+
+# 指定可能な出力形式
+IMAGE_FORMATS = {
+    "original": None,
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+_PIL_FORMATS = {"image/png": "PNG", "image/jpeg": "JPEG", "image/webp": "WEBP"}
+
+_executor = ThreadPoolExecutor(max_workers=config.IMAGE_WORKERS, thread_name_prefix="custom-api-image")
+
+
+@dataclass
+class ImageOptions:
+    """画像出力の返却方法"""
+
+    # base64 データ（SVG は文字列、Plotly は JSON）をレスポンスに含めるか
+    inline: bool = False
+    # 出力形式（"original" の場合は変換しない）
+    format: str = "original"
+    # 長辺の最大ピクセル数（None の場合は縮小しない）
+    max_size: Optional[int] = None
+    # JPEG / WebP の品質
+    quality: int = 80
+
+    @property
+    def transforms(self) -> bool:
+        return self.format != "original" or self.max_size is not None
+
+
+def pick_figure(data: dict) -> Optional[str]:
+    """出力バンドルから返却対象の MIME タイプを選ぶ"""
+    for mime_type in FIGURE_MIME_TYPES:
+        if mime_type in data:
+            return mime_type
+    return None
+
+
+def _encode_payload(mime_type: str, value: Any) -> bytes:
+    """出力バンドルの値を保存用のバイト列にする"""
+    if mime_type == PLOTLY_MIME_TYPE:
+        return json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+    if mime_type == "image/svg+xml":
+        return value.encode("utf-8") if isinstance(value, str) else "".join(value).encode("utf-8")
+    return base64.b64decode(value)
+
+
+def _inline_payload(mime_type: str, data: bytes) -> Any:
+    """保存用のバイト列をレスポンス用の値に戻す"""
+    if mime_type == PLOTLY_MIME_TYPE:
+        return json.loads(data)
+    if mime_type == "image/svg+xml":
+        return data.decode("utf-8")
+    return base64.b64encode(data).decode("ascii")
+
+
+def _png_size(data: bytes) -> Optional[tuple]:
+    """PNG の IHDR から画像サイズを読む（デコード不要）"""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    return None
+
+
+def _transform(data: bytes, mime_type: str, options: ImageOptions) -> tuple:
+    """ラスター画像を縮小・形式変換する（変換不要なら元のデータを返す）"""
+    target_mime = IMAGE_FORMATS.get(options.format) or mime_type
+    if Image is None or mime_type not in RASTER_MIME_TYPES or not options.transforms:
+        return data, mime_type, _png_size(data)
+
+    with Image.open(io.BytesIO(data)) as img:
+        if options.max_size is not None and max(img.size) > options.max_size:
+            img.thumbnail((options.max_size, options.max_size), Image.LANCZOS)
+        elif target_mime == mime_type:
+            return data, mime_type, img.size
+
+        if target_mime == "image/jpeg" and img.mode not in ("RGB", "L"):
+            # JPEG は透過を扱えないため白背景に合成する
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.convert("RGBA").split()[-1])
+            img = background
+
+        out = io.BytesIO()
+        save_kwargs = {"optimize": True}
+        if target_mime in ("image/jpeg", "image/webp"):
+            save_kwargs["quality"] = options.quality
+        img.save(out, format=_PIL_FORMATS[target_mime], **save_kwargs)
+        return out.getvalue(), target_mime, img.size
+
+
+def prepare_image(store: Optional[ImageStore], mime_type: str, value: Any, options: ImageOptions) -> dict:
+    """図を変換して画像ストアに保存し、レスポンス用のフィールドを返す"""
+    original = _encode_payload(mime_type, value)
+    data, out_mime, size = _transform(original, mime_type, options)
+
+    fields: dict = {"mime_type": out_mime}
+    if size is not None:
+        fields["width"], fields["height"] = size
+
+    if store is not None:
+        stored = store.put(data, out_mime)
+        fields["sha256"] = stored.digest
+        fields["size"] = stored.size
+        fields["url"] = store.url_for(stored.digest)
+        if data is not original:
+            # 変換前の画像も参照できるようにする
+            source = store.put(original, mime_type)
+            fields["original"] = {
+                "mime_type": mime_type,
+                "sha256": source.digest,
+                "size": source.size,
+                "url": store.url_for(source.digest),
+            }
+
+    if options.inline or store is None:
+        if data is original and mime_type != "image/svg+xml":
+            # 変換していない場合は受信した値をそのまま返す
+            fields["data"] = value
+        else:
+            fields["data"] = _inline_payload(out_mime, data)
+    return fields
+
+
+async def prepare_image_async(store: Optional[ImageStore], mime_type: str, value: Any, options: ImageOptions) -> dict:
+    """prepare_image をワーカースレッドで実行"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, prepare_image, store, mime_type, value, options)
@@ -0,0 +1,146 @@
+"""
+画像ストア
+
+実行結果の画像を内容のハッシュ（SHA-256）をキーにディスクへ保存する。
+同じ画像は 1 度だけ書き込まれ、合計サイズと経過時間に基づいて古いものから削除する。
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Optional
+
+from . import config
+
+# MIME タイプと保存時の拡張子の対応
+_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/webp": ".webp",
+    "image/svg+xml": ".svg",
+    "application/vnd.plotly.v1+json": ".plotly.json",
+}
+_MIME_TYPES = {ext: mime for mime, ext in _EXTENSIONS.items()}
+
+# 期限切れ画像の確認間隔（秒）
+_EXPIRE_CHECK_INTERVAL = 60
+
+
+class StoredImage:
+    """保存済み画像のメタデータ"""
+
+    __slots__ = ("digest", "mime_type", "path", "size", "stored_at")
+
+    def __init__(self, digest: str, mime_type: str, path: str, size: int, stored_at: float):
+        self.digest = digest
+        self.mime_type = mime_type
+        self.path = path
+        self.size = size
+        self.stored_at = stored_at
+
+
+class ImageStore:
+    """コンテンツアドレス方式の画像ストア"""
+
+    def __init__(
+        self,
+        root: str = config.IMAGE_STORE_DIR,
+        max_bytes: int = config.IMAGE_STORE_MAX_BYTES,
+        max_age: int = config.IMAGE_STORE_MAX_AGE,
+        url_prefix: str = "/api/images",
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.url_prefix = url_prefix
+        self._images: dict[str, StoredImage] = {}
+        self._total_bytes = 0
+        self._last_expire_check = 0.0
+        # 画像変換のワーカースレッドからも呼ばれるため排他する
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """既存の保存ファイルからインデックスを復元"""
+        if not os.path.isdir(self.root):
+            return
+        for entry in os.scandir(self.root):
+            if not entry.is_file():
+                continue
+            digest, _, ext = entry.name.partition(".")
+            mime_type = _MIME_TYPES.get("." + ext)
+            if mime_type is None or len(digest) != 64:
+                continue
+            stat = entry.stat()
+            self._images[digest] = StoredImage(digest, mime_type, entry.path, stat.st_size, stat.st_mtime)
+            self._total_bytes += stat.st_size
+
+    def url_for(self, digest: str) -> str:
+        return f"{self.url_prefix}/{digest}"
+
+    def put(self, data: bytes, mime_type: str) -> StoredImage:
+        """画像を保存（同じ内容が保存済みなら書き込まずに再利用）"""
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            return self._put(digest, data, mime_type)
+
+    def _put(self, digest: str, data: bytes, mime_type: str) -> StoredImage:
+        now = time.time()
+        image = self._images.get(digest)
+        if image is not None and os.path.exists(image.path):
+            # 再利用された画像は削除対象の順序を後ろに回す
+            image.stored_at = now
+            return image
+
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, digest + _EXTENSIONS.get(mime_type, ".bin"))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        image = StoredImage(digest, mime_type, path, len(data), now)
+        self._images[digest] = image
+        self._total_bytes += image.size
+        self._evict(now)
+        return image
+
+    def get(self, digest: str) -> Optional[StoredImage]:
+        """保存済み画像を取得（存在しない・期限切れの場合は None）"""
+        with self._lock:
+            image = self._images.get(digest)
+            if image is None:
+                return None
+            if time.time() - image.stored_at > self.max_age or not os.path.exists(image.path):
+                self._remove(digest)
+                return None
+            return image
+
+    def stats(self) -> dict:
+        return {"images": len(self._images), "total_bytes": self._total_bytes}
+
+    def _evict(self, now: float):
+        """期限切れと容量超過の画像を古い順に削除"""
+        if now - self._last_expire_check >= _EXPIRE_CHECK_INTERVAL:
+            self._last_expire_check = now
+            for digest, image in list(self._images.items()):
+                if now - image.stored_at > self.max_age:
+                    self._remove(digest)
+
+        if self._total_bytes <= self.max_bytes:
+            return
+        for image in sorted(self._images.values(), key=lambda i: i.stored_at):
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._remove(image.digest)
+
+    def _remove(self, digest: str):
+        image = self._images.pop(digest, None)
+        if image is None:
+            return
+        self._total_bytes -= image.size
+        try:
+            os.remove(image.path)
+        except FileNotFoundError:
+            pass
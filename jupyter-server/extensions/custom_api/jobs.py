@@ -0,0 +1,203 @@
+"""
+非同期ジョブ
+
+長時間のコード実行を HTTP 接続から切り離し、ジョブ ID で状態・途中の出力・結果を
+取得できるようにする。ジョブは上限付きのストアに保持し、完了から一定時間が
+経過したもの・上限を超えた古いものから削除する。
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from . import config, metrics
+from .execution_guard import CANCEL, ExecutionGuard, ExecutionTimeoutError
+from .image_processing import ImageOptions
+from .kernel_executor import KernelExecutor, ResultCollector
+from .output_buffer import SpillStore
+from .scheduler import QueueFullError, Ticket
+
+# ジョブの状態
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+def _now_iso() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+class Job:
+    """1 回のコード実行ジョブ"""
+
+    def __init__(self, kernel_id: str, code: str, spills: Optional[SpillStore] = None):
+        self.id = uuid.uuid4().hex
+        self.kernel_id = kernel_id
+        self.code = code
+        self.status = QUEUED
+        self.created_at = _now_iso()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        # 完了時刻（保持期間の判定用）
+        self.finished_monotonic: Optional[float] = None
+        # 完了時に保持している出力のバイト数（保持量の上限の判定用）
+        self.output_bytes = 0
+        self.queue_wait_ms: Optional[int] = None
+        self.execution_time_ms: Optional[int] = None
+        self.cancel_requested = False
+        # 実行中の取り消しによる打ち切りの結果
+        self.cancel_outcome: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self._collector = ResultCollector(spills)
+        self._executor: Optional[KernelExecutor] = None
+        self._stop: Optional[asyncio.Future] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    async def run(self, executor: KernelExecutor, ticket: Ticket, timeout: float, image_options: ImageOptions):
+        """実行の順番を待ってコードを実行し、出力を逐次保持する"""
+        try:
+            async with ticket:
+                self.status = RUNNING
+                self.started_at = _now_iso()
+                self.queue_wait_ms = ticket.wait_ms
+                self._executor = executor
+                start_time = time.time()
+                try:
+                    async for event in executor.stream(self.code, timeout=timeout, image_options=image_options):
+                        self._collector.add(event)
+                finally:
+                    self.execution_time_ms = int((time.time() - start_time) * 1000)
+                    metrics.observe_execution("job", executor, ticket.wait_ms, time.time() - start_time)
+                    # 打ち切りが終わるまで実行枠を保持する
+                    if self._stop is not None:
+                        self.cancel_outcome = await self._stop
+        except asyncio.CancelledError:
+            self._finish(CANCELLED)
+            raise
+        except Exception as e:
+            self._collector.error = {"type": type(e).__name__, "message": str(e), "traceback": []}
+            if isinstance(e, ExecutionTimeoutError):
+                self._collector.error.update(type="TimeoutError", outcome=e.outcome)
+            self._finish(CANCELLED if self.cancel_requested else FAILED)
+            return
+
+        if self.cancel_requested:
+            self._finish(CANCELLED)
+        else:
+            self._finish(COMPLETED if self._collector.error is None else FAILED)
+
+    def cancel(self, guard: ExecutionGuard):
+        """ジョブを取り消す
+
+        順番待ちのジョブは実行せずに取り消し、実行中のジョブはカーネルの実行を
+        打ち切る（中断で止まらない場合は再起動する）。実行が終わると cancelled になる。
+        """
+        if self.status == QUEUED:
+            self.task.cancel()
+        elif self.status == RUNNING and not self.cancel_requested:
+            self.cancel_requested = True
+            self._stop = asyncio.ensure_future(guard.stop(self.kernel_id, self._executor.inflight, CANCEL))
+
+    def _finish(self, status: str):
+        self.status = status
+        self.finished_at = _now_iso()
+        self.finished_monotonic = time.monotonic()
+        self._collector.close()
+        self.output_bytes = self._collector.held_bytes()
+
+    def to_dict(self) -> dict:
+        """ジョブの状態（実行中の場合はそれまでの出力）"""
+        snapshot = self._collector.as_dict()
+        if not self.finished:
+            snapshot["success"] = None
+        elif self.status == CANCELLED:
+            snapshot["success"] = False
+        return {
+            "id": self.id,
+            "kernel_id": self.kernel_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_wait_ms": self.queue_wait_ms,
+            "execution_time_ms": self.execution_time_ms,
+            "cancel_requested": self.cancel_requested,
+            "cancel_outcome": self.cancel_outcome,
+            **snapshot,
+        }
+
+
+class JobStore:
+    """ジョブの保持（件数・完了したジョブの出力の合計サイズの上限と完了後の保持期間付き）"""
+
+    def __init__(
+        self,
+        max_jobs: int = config.JOB_MAX_JOBS,
+        ttl: int = config.JOB_TTL,
+        max_output_bytes: int = config.JOB_MAX_OUTPUT_BYTES,
+    ):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self.max_output_bytes = max_output_bytes
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+
+    def add(self, job: Job):
+        """ジョブを登録する
+
+        Raises:
+            QueueFullError: 未完了のジョブだけで上限に達している場合
+        """
+        self._evict(reserve=1)
+        if len(self._jobs) >= self.max_jobs:
+            raise QueueFullError(f"Too many jobs ({len(self._jobs)})", config.JOB_RETRY_AFTER)
+        self._jobs[job.id] = job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._evict()
+        return self._jobs.get(job_id)
+
+    def remove(self, job_id: str):
+        self._jobs.pop(job_id, None)
+
+    def _evict(self, reserve: int = 0):
+        """保持期間を過ぎた完了済みジョブと、件数・出力の合計サイズの上限を超えた古い完了済みジョブを削除
+
+        reserve: 追加のために空けておく件数
+        """
+        now = time.monotonic()
+        finished = [job for job in self._jobs.values() if job.finished]
+        for job in finished:
+            if now - job.finished_monotonic > self.ttl:
+                del self._jobs[job.id]
+        excess = len(self._jobs) + reserve - self.max_jobs
+        kept = sorted((j for j in finished if j.id in self._jobs), key=lambda j: j.finished_monotonic)
+        output_bytes = sum(job.output_bytes for job in kept)
+        for job in kept:
+            if excess <= 0 and output_bytes <= self.max_output_bytes:
+                break
+            del self._jobs[job.id]
+            excess -= 1
+            output_bytes -= job.output_bytes
+
+    def stats(self) -> dict:
+        counts = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        output_bytes = sum(job.output_bytes for job in self._jobs.values())
+        return {"jobs": len(self._jobs), "output_bytes": output_bytes, **counts}
+
+    def close(self):
+        """実行中・待機中のジョブを取り消す"""
+        for job in self._jobs.values():
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
@@ -0,0 +1,878 @@
+"""
+カーネル常駐イントロスペクションエージェント
+
+このファイルはサーバー側では import せず、ソースをカーネルへ送って
+`_custom_api_agent` モジュールとして 1 度だけ読み込ませる。
+サーバーは execute_request の user_expressions（silent=True, store_history=False）で
+`call()` を呼び出し、結果は application/json として execute_reply で受け取る。
+ユーザーの名前空間・実行履歴・execution_count には影響しない。
+"""
+
+import hashlib
+import json
+import keyword
+import math
+import os
+import time
+
+# 変数一覧から除外する名前
+_EXCLUDE = {
+    'In', 'Out', 'get_ipython', 'exit', 'quit', '_', '__', '___',
+    '_i', '_ii', '_iii', '_oh', '_dh', '_sh',
+}
+
+# 単純な値として返す型
+_SCALAR_TYPES = ('int', 'float', 'str', 'bool')
+
+
+class _Result:
+    """IPython の表示フォーマッタに JSON として渡すためのラッパー"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def _repr_json_(self):
+        return self.data
+
+    def __repr__(self):
+        return '<custom_api result>'
+
+
+def _clean(value):
+    """JSON に変換できる値にする（NaN/inf は None、未知の型は文字列）"""
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {str(k): _clean(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value]
+    item = getattr(value, 'item', None)
+    if callable(item):
+        # numpy のスカラー
+        try:
+            return _clean(item())
+        except (TypeError, ValueError):
+            pass
+    return str(value)
+
+
+def _shell():
+    from IPython import get_ipython
+    return get_ipython()
+
+
+def _is_user_variable(ip, name, value):
+    if name.startswith('_') or name in _EXCLUDE or name in ip.user_ns_hidden:
+        return False
+    if callable(value) and not hasattr(value, '__module__'):
+        return False
+    module = getattr(value, '__module__', None)
+    if isinstance(module, str) and module.startswith('IPython'):
+        return False
+    return True
+
+
+# 値の大きさの上限を指定しない場合のデフォルト（バイト）
+_DEFAULT_MAX_BYTES = 65536
+
+# 入れ子の値を切り詰める際にたどる深さの上限
+_MAX_DEPTH = 20
+
+
+def _bounded(value, budget, depth=0):
+    """JSON にしたときの大きさがおおよそ budget バイトに収まるよう値を切り詰める
+
+    リスト・辞書は先頭から予算に収まる要素だけを変換するため、大きなコンテナでも
+    全要素を走査しない。
+
+    Returns:
+        (変換後の値, 使用したバイト数の見積もり, 切り詰めたか)
+    """
+    if isinstance(value, dict) and depth < _MAX_DEPTH:
+        out, used, truncated = {}, 2, False
+        for key, item in value.items():
+            key = str(key)
+            cost = len(key) + 4
+            if used + cost >= budget:
+                truncated = True
+                break
+            item, size, cut = _bounded(item, budget - used - cost, depth + 1)
+            out[key] = item
+            used += cost + size
+            truncated = truncated or cut
+        return out, used, truncated
+
+    if isinstance(value, (list, tuple)) and depth < _MAX_DEPTH:
+        out, used, truncated = [], 2, False
+        for item in value:
+            if used + 2 >= budget:
+                truncated = True
+                break
+            item, size, cut = _bounded(item, budget - used - 2, depth + 1)
+            out.append(item)
+            used += size + 2
+            truncated = truncated or cut
+        return out, used, truncated
+
+    cleaned = _clean(value) if not isinstance(value, (dict, list, tuple)) else str(value)
+    if isinstance(cleaned, str):
+        limit = max(budget - 2, 0)
+        if len(cleaned) > limit:
+            return cleaned[:limit], budget, True
+        return cleaned, len(cleaned) + 2, False
+    return cleaned, len(str(cleaned)), False
+
+
+# =============================================================================
+# 型ごとの要約
+# =============================================================================
+
+
+class _Summarizer:
+    """1 つの型に対する要約関数の組"""
+
+    __slots__ = ('summary', 'detail', 'fingerprint')
+
+    def __init__(self, summary, detail, fingerprint):
+        self.summary = summary
+        self.detail = detail
+        self.fingerprint = fingerprint
+
+
+# 型のキー（'モジュールの最上位パッケージ名.クラス名'）と要約関数の対応
+_SUMMARIZERS = {}
+
+
+def register(type_key, summary, detail=None, fingerprint=None):
+    """型ごとの要約関数を登録する（カーネル内から独自の型を追加できる）
+
+    Args:
+        type_key: 'pandas.DataFrame' のような最上位パッケージ名とクラス名（サブクラスにも適用）
+        summary: summary(value, sample_rows) -> 変数一覧に含める項目の dict
+        detail: detail(value, sample_rows, exact) -> 変数詳細に含める項目の dict（省略時は summary）
+        fingerprint: fingerprint(value) -> 変更検出のキー（指定した場合は一覧の要約をキャッシュする）
+    """
+    if detail is None:
+        def detail(value, sample_rows, exact):
+            return summary(value, sample_rows)
+    _SUMMARIZERS[type_key] = _Summarizer(summary, detail, fingerprint)
+
+
+def _type_keys(value):
+    """値の型とその基底クラスのキーを派生側から順に返す"""
+    for cls in type(value).__mro__:
+        module = getattr(cls, '__module__', None) or ''
+        yield f"{module.split('.')[0]}.{cls.__name__}"
+
+
+def _lookup(value):
+    """値の型（または基底クラス）に登録された要約関数を返す"""
+    for key in _type_keys(value):
+        summarizer = _SUMMARIZERS.get(key)
+        if summarizer is not None:
+            return summarizer
+    return None
+
+
+def _sample_step(n_rows, sample_rows):
+    """行数が閾値を超える場合の等間隔サンプリングの間隔（1 は全行）"""
+    if not sample_rows or n_rows <= sample_rows:
+        return 1
+    return -(-n_rows // sample_rows)
+
+
+# 同じオブジェクトの内容の変更（値の代入・inplace の並べ替え等）の検出に使う行数
+_FINGERPRINT_ROWS = 32
+
+
+def _fingerprint_positions(n_rows):
+    """先頭・末尾を含む等間隔の行位置（最大 _FINGERPRINT_ROWS + 1 行）"""
+    if n_rows == 0:
+        return []
+    positions = list(range(0, n_rows, max(1, n_rows // _FINGERPRINT_ROWS)))
+    if positions[-1] != n_rows - 1:
+        positions.append(n_rows - 1)
+    return positions
+
+
+def _content_digest(rows):
+    return hashlib.sha1(repr(rows).encode('utf-8', 'replace')).hexdigest()
+
+
+def _frame_fingerprint(value):
+    """オブジェクトの同一性・形状と一部の行の内容から変更を検出するためのキー"""
+    positions = _fingerprint_positions(len(value))
+    if hasattr(value, 'iloc'):
+        rows = value.iloc[positions].values.tolist()
+    else:
+        rows = [value.row(i) for i in positions]
+    return (id(value), value.shape, tuple(str(dtype) for dtype in value.dtypes), _content_digest(rows))
+
+
+# ----------------------------------------------------------------------------
+# pandas
+# ----------------------------------------------------------------------------
+
+
+def _memory_bytes(df, sample_rows, exact=False):
+    """DataFrame のメモリ使用量と精度
+
+    exact でなく行数が閾値を超える場合は、等間隔サンプルの deep な使用量を
+    行数比で拡大した推定値を返す（object 列の全走査を避けるため）。
+    """
+    step = 1 if exact else _sample_step(len(df), sample_rows)
+    if step == 1:
+        return int(df.memory_usage(deep=True).sum()), 'exact'
+    sample = df.iloc[::step]
+    per_row = sample.memory_usage(deep=True, index=False).sum() / max(len(sample), 1)
+    index_bytes = df.index.memory_usage(deep=False)
+    return int(per_row * len(df) + index_bytes), 'estimated'
+
+
+def _describe(df, sample_rows, exact=False):
+    """数値列の count/mean/std/min/max を 1 回の集計で求める
+
+    exact でなく行数が閾値を超える場合は等間隔サンプルで集計する（count は全行）。
+    """
+    numeric = df.select_dtypes(include=['number'])
+    if numeric.shape[1] == 0:
+        return {}, 'exact', None
+
+    step = 1 if exact else _sample_step(len(numeric), sample_rows)
+    target = numeric if step == 1 else numeric.iloc[::step]
+    stats = target.agg(['mean', 'std', 'min', 'max'])
+    counts = numeric.count()
+
+    describe = {}
+    for col in numeric.columns:
+        describe[str(col)] = {
+            'count': int(counts[col]),
+            'mean': float(stats.at['mean', col]),
+            'std': float(stats.at['std', col]),
+            'min': float(stats.at['min', col]),
+            'max': float(stats.at['max', col]),
+        }
+    if step == 1:
+        return describe, 'exact', None
+    return describe, 'sampled', len(target)
+
+
+def _pandas_frame_summary(value, sample_rows):
+    memory_bytes, accuracy = _memory_bytes(value, sample_rows)
+    return {
+        'size': f"{len(value)} rows × {len(value.columns)} cols",
+        'memory_bytes': memory_bytes,
+        'accuracy': {'memory_bytes': accuracy},
+    }
+
+
+def _pandas_frame_detail(value, sample_rows, exact):
+    describe, describe_accuracy, sampled_rows = _describe(value, sample_rows, exact)
+    memory_bytes, memory_accuracy = _memory_bytes(value, sample_rows, exact)
+    info = {
+        'shape': list(value.shape),
+        'columns': [{'name': str(col), 'dtype': str(dtype)} for col, dtype in value.dtypes.items()],
+        'head': value.head(5).to_dict(orient='records'),
+        'describe': describe,
+        'memory_bytes': memory_bytes,
+        'accuracy': {'describe': describe_accuracy, 'memory_bytes': memory_accuracy},
+    }
+    if sampled_rows is not None:
+        info['sample_rows'] = sampled_rows
+    return info
+
+
+def _pandas_series_summary(value, sample_rows):
+    # to_frame はデータをコピーしない
+    memory_bytes, accuracy = _memory_bytes(value.to_frame(), sample_rows)
+    return {
+        'size': f"{len(value)} rows",
+        'dtype': str(value.dtype),
+        'memory_bytes': memory_bytes,
+        'accuracy': {'memory_bytes': accuracy},
+    }
+
+
+def _pandas_series_detail(value, sample_rows, exact):
+    frame = value.to_frame()
+    describe, describe_accuracy, sampled_rows = _describe(frame, sample_rows, exact)
+    memory_bytes, memory_accuracy = _memory_bytes(frame, sample_rows, exact)
+    info = {
+        'length': len(value),
+        'dtype': str(value.dtype),
+        'head': value.head(5).tolist(),
+        'describe': next(iter(describe.values()), None),
+        'memory_bytes': memory_bytes,
+        'accuracy': {'describe': describe_accuracy, 'memory_bytes': memory_accuracy},
+    }
+    if value.name is not None:
+        info['series_name'] = str(value.name)
+    if sampled_rows is not None:
+        info['sample_rows'] = sampled_rows
+    return info
+
+
+def _series_fingerprint(value):
+    positions = _fingerprint_positions(len(value))
+    if hasattr(value, 'iloc'):
+        rows = value.iloc[positions].tolist()
+    else:
+        rows = [value[i] for i in positions]
+    return (id(value), len(value), str(value.dtype), _content_digest(rows))
+
+
+# ----------------------------------------------------------------------------
+# NumPy
+# ----------------------------------------------------------------------------
+
+# 統計量を求める際に 1 度に変換する要素数
+_ARRAY_CHUNK_ELEMENTS = 1000000
+
+
+def _array_stats(arr):
+    """数値配列の min/max/mean/std を軸 0 方向のチャンクごとに求める
+
+    一時配列をチャンクの大きさに抑え、NaN は除外する。平均と分散は
+    チャンクごとの値を合成する（Chan らの方法）。
+    """
+    import numpy as np
+
+    if arr.ndim == 0:
+        arr = arr.reshape(1)
+    row_elements = max(arr.size // max(arr.shape[0], 1), 1)
+    chunk_rows = max(_ARRAY_CHUNK_ELEMENTS // row_elements, 1)
+
+    count, mean, m2 = 0, 0.0, 0.0
+    low, high = None, None
+    for start in range(0, arr.shape[0], chunk_rows):
+        block = np.asarray(arr[start:start + chunk_rows], dtype=np.float64).ravel()
+        block = block[~np.isnan(block)]
+        if block.size == 0:
+            continue
+        block_mean = float(block.mean())
+        block_m2 = float(((block - block_mean) ** 2).sum())
+        block_min, block_max = float(block.min()), float(block.max())
+        total = count + block.size
+        delta = block_mean - mean
+        mean += delta * block.size / total
+        m2 += block_m2 + delta * delta * count * block.size / total
+        count = total
+        low = block_min if low is None else min(low, block_min)
+        high = block_max if high is None else max(high, block_max)
+
+    if count == 0:
+        return None
+    return {
+        'count': count,
+        'mean': mean,
+        'std': math.sqrt(m2 / (count - 1)) if count > 1 else None,
+        'min': low,
+        'max': high,
+    }
+
+
+def _ndarray_summary(value, sample_rows):
+    return {
+        'size': ' × '.join(str(n) for n in value.shape) or 'scalar',
+        'dtype': str(value.dtype),
+        'memory_bytes': int(value.nbytes),
+    }
+
+
+def _ndarray_detail(value, sample_rows, exact):
+    info = {
+        'shape': list(value.shape),
+        'dtype': str(value.dtype),
+        'nbytes': int(value.nbytes),
+        # 先頭の要素（多次元配列は平坦化した順、flat のスライスは指定範囲だけをコピーする）
+        'head': value.flat[:10].tolist(),
+    }
+    if value.dtype.kind in 'biuf':
+        step = 1 if exact or value.ndim == 0 else _sample_step(value.shape[0], sample_rows)
+        # 基本スライスはビューなので元の配列をコピーしない
+        target = value if step == 1 else value[::step]
+        info['stats'] = _array_stats(target)
+        info['accuracy'] = {'stats': 'exact' if step == 1 else 'sampled'}
+        if step != 1:
+            info['sample_rows'] = len(target)
+    return info
+
+
+def _ndarray_fingerprint(value):
+    rows = value[_fingerprint_positions(len(value))].tolist() if value.ndim else value.tolist()
+    return (id(value), value.shape, str(value.dtype), _content_digest(rows))
+
+
+# ----------------------------------------------------------------------------
+# Polars
+# ----------------------------------------------------------------------------
+
+
+def _polars_schema(schema):
+    return [{'name': name, 'dtype': str(dtype)} for name, dtype in schema.items()]
+
+
+def _polars_describe(df, sample_rows, exact=False):
+    """数値列の count/mean/std/min/max を 1 回のクエリで求める（count は全行）"""
+    import polars as pl
+
+    numeric = [name for name, dtype in df.schema.items() if dtype.is_numeric()]
+    if not numeric:
+        return {}, 'exact', None
+
+    step = 1 if exact else _sample_step(df.height, sample_rows)
+    target = df if step == 1 else df.gather_every(step)
+    stats = ('mean', 'std', 'min', 'max')
+    exprs = [
+        getattr(pl.col(name), stat)().cast(pl.Float64).alias(f"{i}:{stat}")
+        for i, name in enumerate(numeric)
+        for stat in stats
+    ]
+    row = target.select(exprs).row(0)
+    # null_count は列のメタデータから求まる
+    nulls = df.select(numeric).null_count().row(0)
+
+    describe = {}
+    for i, name in enumerate(numeric):
+        values = row[i * len(stats):(i + 1) * len(stats)]
+        describe[name] = {'count': df.height - nulls[i], **dict(zip(stats, values))}
+    if step == 1:
+        return describe, 'exact', None
+    return describe, 'sampled', target.height
+
+
+def _polars_frame_summary(value, sample_rows):
+    return {
+        'size': f"{value.height} rows × {value.width} cols",
+        'memory_bytes': int(value.estimated_size()),
+        'accuracy': {'memory_bytes': 'estimated'},
+    }
+
+
+def _polars_frame_detail(value, sample_rows, exact):
+    describe, describe_accuracy, sampled_rows = _polars_describe(value, sample_rows, exact)
+    info = {
+        'shape': [value.height, value.width],
+        'columns': _polars_schema(value.schema),
+        'head': value.head(5).to_dicts(),
+        'describe': describe,
+        'memory_bytes': int(value.estimated_size()),
+        'accuracy': {'describe': describe_accuracy, 'memory_bytes': 'estimated'},
+    }
+    if sampled_rows is not None:
+        info['sample_rows'] = sampled_rows
+    return info
+
+
+def _polars_lazy_summary(value, sample_rows):
+    # collect_schema はクエリプランからスキーマを解決し、データを読み込まない
+    return {'size': f"{len(value.collect_schema())} cols (lazy)"}
+
+
+def _polars_lazy_detail(value, sample_rows, exact):
+    return {
+        'columns': _polars_schema(value.collect_schema()),
+        'plan': value.explain(optimized=False),
+    }
+
+
+def _polars_series_summary(value, sample_rows):
+    return {
+        'size': f"{len(value)} rows",
+        'dtype': str(value.dtype),
+        'memory_bytes': int(value.estimated_size()),
+        'accuracy': {'memory_bytes': 'estimated'},
+    }
+
+
+def _polars_series_detail(value, sample_rows, exact):
+    describe, describe_accuracy, sampled_rows = _polars_describe(value.to_frame(), sample_rows, exact)
+    info = {
+        'length': len(value),
+        'dtype': str(value.dtype),
+        'head': value.head(5).to_list(),
+        'describe': next(iter(describe.values()), None),
+        'memory_bytes': int(value.estimated_size()),
+        'accuracy': {'describe': describe_accuracy, 'memory_bytes': 'estimated'},
+        'series_name': value.name,
+    }
+    if sampled_rows is not None:
+        info['sample_rows'] = sampled_rows
+    return info
+
+
+# ----------------------------------------------------------------------------
+# 組み込み型
+# ----------------------------------------------------------------------------
+
+# リスト・辞書の詳細に含める要素数の上限
+_MAX_ITEMS = 100
+
+
+def _scalar_summary(value, sample_rows):
+    return {'value': value}
+
+
+def _container_summary(value, sample_rows):
+    return {'size': str(len(value))}
+
+
+def _list_detail(value, sample_rows, exact):
+    return {'value': value[:_MAX_ITEMS], 'size': str(len(value))}
+
+
+def _dict_detail(value, sample_rows, exact):
+    items = {}
+    for key, item in value.items():
+        if len(items) >= _MAX_ITEMS:
+            break
+        items[key] = item
+    return {'value': items, 'size': str(len(value))}
+
+
+for _key in _SCALAR_TYPES:
+    register(f"builtins.{_key}", _scalar_summary)
+register('builtins.list', _container_summary, _list_detail)
+register('builtins.dict', _container_summary, _dict_detail)
+register('pandas.DataFrame', _pandas_frame_summary, _pandas_frame_detail, _frame_fingerprint)
+register('pandas.Series', _pandas_series_summary, _pandas_series_detail, _series_fingerprint)
+register('numpy.ndarray', _ndarray_summary, _ndarray_detail, _ndarray_fingerprint)
+register('polars.DataFrame', _polars_frame_summary, _polars_frame_detail, _frame_fingerprint)
+register('polars.LazyFrame', _polars_lazy_summary, _polars_lazy_detail, id)
+register('polars.Series', _polars_series_summary, _polars_series_detail, _series_fingerprint)
+
+
+# =============================================================================
+# 変数一覧・詳細
+# =============================================================================
+
+# 計算コストの高い要約のキャッシュ {name: (fingerprint, summary)}
+_summary_cache = {}
+
+
+def _summarize(name, value, sample_rows=None, max_bytes=_DEFAULT_MAX_BYTES):
+    var_info = {'name': name, 'type': type(value).__name__}
+    summarizer = _lookup(value)
+    if summarizer is not None:
+        try:
+            var_info.update(summarizer.summary(value, sample_rows))
+        except Exception as e:
+            # 1 つの変数の要約に失敗しても一覧全体は返す
+            var_info['error'] = f"{type(e).__name__}: {e}"
+    summary, _, truncated = _bounded(var_info, max_bytes)
+    if truncated:
+        summary['truncated'] = True
+    return summary
+
+
+def list_variables(sample_rows=None, max_bytes=_DEFAULT_MAX_BYTES):
+    """定義済み変数の一覧
+
+    DataFrame などの要約は同一オブジェクトで形状が変わっていなければ再計算しない。
+    各変数の要約は max_bytes に収まるよう切り詰める。
+    """
+    ip = _shell()
+    variables = []
+    seen = set()
+    for name, value in list(ip.user_ns.items()):
+        if not _is_user_variable(ip, name, value):
+            continue
+
+        summarizer = _lookup(value)
+        if summarizer is None or summarizer.fingerprint is None:
+            variables.append(_summarize(name, value, sample_rows, max_bytes))
+            continue
+
+        fingerprint = summarizer.fingerprint(value)
+        seen.add(name)
+        cached = _summary_cache.get(name)
+        if cached is not None and cached[0] == fingerprint:
+            summary = cached[1]
+        else:
+            summary = _summarize(name, value, sample_rows, max_bytes)
+            _summary_cache[name] = (fingerprint, summary)
+        # 要約が同じでも内容が変わっていればサーバーで変更として扱う（レスポンスには含めない）
+        variables.append({**summary, 'content_digest': _content_digest(fingerprint)})
+
+    for name in list(_summary_cache):
+        if name not in seen:
+            del _summary_cache[name]
+    return variables
+
+
+def get_variable(name, profile='fast', sample_rows=None, max_bytes=_DEFAULT_MAX_BYTES):
+    """指定した変数の詳細（存在しない場合は None）
+
+    profile が 'fast' の場合、行数が sample_rows を超える DataFrame・配列の統計量と
+    メモリ使用量はサンプルから求め、各項目の精度を accuracy に示す。
+    'exact' の場合は全行から求める。結果は max_bytes に収まるよう切り詰める。
+    """
+    ip = _shell()
+    if name not in ip.user_ns:
+        return None
+
+    value = ip.user_ns[name]
+    var_info = {'name': name, 'type': type(value).__name__}
+    summarizer = _lookup(value)
+    if summarizer is not None:
+        var_info.update(summarizer.detail(value, sample_rows, profile == 'exact'))
+
+    result, _, truncated = _bounded(var_info, max_bytes)
+    if truncated:
+        result['truncated'] = True
+    return result
+
+
+def _resolve_columns(df, names):
+    """列名（文字列）を DataFrame の列ラベルに対応付ける"""
+    labels = {str(col): col for col in df.columns}
+    missing = [name for name in names if name not in labels]
+    if missing:
+        raise KeyError(f"Unknown columns: {', '.join(missing)}")
+    return [labels[name] for name in names]
+
+
+def _sorted_window(df, sort, stop):
+    """sort 指定（"col" で昇順、"-col" で降順、カンマ区切りで複数）で並べた先頭 stop 行"""
+    keys = [key for key in sort.split(',') if key]
+    names = [key.lstrip('-') for key in keys]
+    ascending = [not key.startswith('-') for key in keys]
+    by = _resolve_columns(df, names)
+
+    # 欠損値の無い単一の数値列なら全体を並べ替えずに必要な行数だけ取り出す
+    # （nsmallest / nlargest は NaN を除外するため欠損値がある場合は使わない）
+    if len(by) == 1 and df[by[0]].dtype.kind in 'iuf' and not df[by[0]].hasnans:
+        if ascending[0]:
+            return df.nsmallest(stop, by[0], keep='first')
+        return df.nlargest(stop, by[0], keep='first')
+    return df.sort_values(by=by, ascending=ascending, kind='stable').iloc[:stop]
+
+
+def get_rows(name, offset=0, limit=100, columns=None, sort=None, orient='columnar'):
+    """DataFrame の指定範囲の行を返す（存在しない場合は None）
+
+    columns で列を絞り込み、orient が 'columnar' の場合は列ごとの配列で返す。
+    """
+    ip = _shell()
+    if name not in ip.user_ns:
+        return None
+
+    value = ip.user_ns[name]
+    if 'pandas.DataFrame' not in _type_keys(value):
+        raise TypeError(f"{name} is not a DataFrame: {type(value).__name__}")
+
+    total_rows = len(value)
+    stop = offset + limit
+    if sort:
+        window = _sorted_window(value, sort, stop).iloc[offset:stop]
+    else:
+        window = value.iloc[offset:stop]
+    if columns:
+        window = window[_resolve_columns(value, columns)]
+
+    result = {
+        'name': name,
+        'total_rows': total_rows,
+        'offset': offset,
+        'limit': limit,
+        'columns': [str(col) for col in window.columns],
+        'dtypes': [str(dtype) for dtype in window.dtypes],
+        'orient': orient,
+    }
+    if orient == 'records':
+        result['rows'] = window.to_dict(orient='records')
+    else:
+        result['data'] = [window.iloc[:, i].tolist() for i in range(window.shape[1])]
+    return result
+
+
+# 行の絞り込みの演算子
+_FILTER_OPS = ('==', '!=', '<', '<=', '>', '>=', 'in', 'not in')
+
+
+def _filter_expression(filters):
+    """[[列, 演算子, 値], ...] を AND で結合した pyarrow の式にする"""
+    import pyarrow.compute as pc
+
+    expression = None
+    for column, op, value in filters:
+        field = pc.field(column)
+        if op == '==':
+            condition = field == value
+        elif op == '!=':
+            condition = field != value
+        elif op == '<':
+            condition = field < value
+        elif op == '<=':
+            condition = field <= value
+        elif op == '>':
+            condition = field > value
+        elif op == '>=':
+            condition = field >= value
+        elif op == 'in':
+            condition = field.isin(value)
+        elif op == 'not in':
+            condition = ~field.isin(value)
+        else:
+            raise ValueError(f"Unknown filter operator: {op} (expected one of {', '.join(_FILTER_OPS)})")
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _check_columns(schema, names):
+    missing = [name for name in dict.fromkeys(names) if schema.get_field_index(name) < 0]
+    if missing:
+        raise KeyError(f"Unknown columns: {', '.join(missing)}")
+
+
+def _csv_to_arrow(path, cache_path):
+    """CSV を Arrow IPC ファイルに変換する（ブロックごとに書き込み、全体をメモリに保持しない）"""
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    parse_options = pacsv.ParseOptions(delimiter='\t') if path.lower().endswith('.tsv') else None
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        try:
+            reader = pacsv.open_csv(path, parse_options=parse_options)
+            with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, reader.schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+        except pa.ArrowInvalid:
+            # 先頭のブロックから推定した型に合わない値が後にある場合は全体から推定し直す
+            table = pacsv.read_csv(path, parse_options=parse_options)
+            with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, cache_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# Arrow IPC ファイル（Feather V2）の先頭のマジックナンバー（Feather V1 は b'FEA1'）
+_ARROW_MAGIC = b'ARROW1'
+
+
+def _read_arrow(path):
+    """Arrow IPC / Feather ファイルを読み込む
+
+    Arrow IPC（Feather V2）はメモリマップで開く。圧縮されていないファイルはページキャッシュ上の
+    データをコピーせずに参照するが、圧縮されたファイル（pandas の to_feather の既定は lz4）は
+    展開したデータをメモリに保持する。Feather V1 は pyarrow.feather で読み込む。
+    """
+    import pyarrow as pa
+
+    with open(path, 'rb') as f:
+        magic = f.read(len(_ARROW_MAGIC))
+    if magic != _ARROW_MAGIC:
+        import pyarrow.feather as feather
+
+        return feather.read_table(path, memory_map=True)
+    return pa.ipc.open_file(pa.memory_map(path)).read_all()
+
+
+def load_dataset(name, path, format, columns=None, filters=None, limit=None, output='pandas', cache_path=None):
+    """ファイルを読み込んで変数 name に代入し、読み込んだ内容の概要を返す
+
+    Arrow / Feather はメモリマップで開き、Parquet は列と行の絞り込みを読み込み時に適用する
+    （行グループの統計情報で読み飛ばす）。CSV は初回に cache_path へ圧縮しない Arrow 形式で
+    変換し、以降はそれをメモリマップで開く。圧縮されていない Arrow ファイルはページキャッシュを
+    共有するため、output が 'arrow' / 'polars' の場合は複数のカーネルで読み込んでもメモリを
+    重複して使わない（圧縮されたファイルは展開するためカーネルごとにメモリを使う）。
+    """
+    if not name.isidentifier() or keyword.iskeyword(name):
+        raise ValueError(f"Invalid variable name: {name}")
+    started = time.perf_counter()
+    filter_columns = [f[0] for f in filters or []]
+    expression = _filter_expression(filters) if filters else None
+    cache_hit = None
+
+    if format == 'parquet':
+        import pyarrow.parquet as pq
+
+        _check_columns(pq.read_schema(path, memory_map=True), (columns or []) + filter_columns)
+        table = pq.read_table(path, columns=columns, filters=expression, memory_map=True)
+    else:
+        if format == 'csv':
+            cache_hit = os.path.exists(cache_path)
+            if not cache_hit:
+                _csv_to_arrow(path, cache_path)
+            path = cache_path
+        table = _read_arrow(path)
+        _check_columns(table.schema, (columns or []) + filter_columns)
+        if expression is not None:
+            table = table.filter(expression)
+        if columns:
+            table = table.select(columns)
+    if limit is not None:
+        table = table.slice(0, limit)
+
+    if output == 'arrow':
+        value = table
+    elif output == 'polars':
+        import polars
+
+        value = polars.from_arrow(table)
+    else:
+        value = table.to_pandas()
+    _shell().user_ns[name] = value
+
+    return {
+        'name': name,
+        'type': type(value).__name__,
+        'rows': table.num_rows,
+        'columns': [{'name': field.name, 'dtype': str(field.type)} for field in table.schema],
+        'cache_hit': cache_hit,
+        'load_ms': int((time.perf_counter() - started) * 1000),
+    }
+
+
+def snapshot_namespace(path):
+    """ユーザー変数を path に pickle で保存する
+
+    ファイルは変数ごとの (変数名, 値) の pickle を続けて書いたもの（全体をメモリ上で
+    1 つにまとめない）。pickle できない変数と、関数・クラス・モジュール（コードの再実行で
+    復元する）は保存しない。
+    """
+    import pickle
+    import types
+
+    ip = _shell()
+    saved = []
+    skipped = []
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for name, value in list(ip.user_ns.items()):
+            if not _is_user_variable(ip, name, value):
+                continue
+            if isinstance(value, (types.ModuleType, types.FunctionType, type)):
+                continue
+            position = f.tell()
+            try:
+                pickle.dump((name, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+                saved.append(name)
+            except Exception:
+                # 書きかけの内容を取り除く
+                f.seek(position)
+                f.truncate()
+                skipped.append(name)
+    os.replace(tmp_path, path)
+    return {'path': path, 'saved': saved, 'skipped': skipped, 'bytes': os.path.getsize(path)}
+
+
+# サーバーから呼び出せる関数
+_METHODS = {
+    'list_variables': list_variables,
+    'get_variable': get_variable,
+    'get_rows': get_rows,
+    'load_dataset': load_dataset,
+    'snapshot_namespace': snapshot_namespace,
+}
+
+
+def call(method, args_json='{}'):
+    """サーバーからの呼び出し口（引数は JSON 文字列で受け取る）"""
+    kwargs = json.loads(args_json)
+    return _Result({'result': _clean(_METHODS[method](**kwargs))})
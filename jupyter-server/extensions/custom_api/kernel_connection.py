@@ -0,0 +1,279 @@
+"""
+カーネル接続プール
+
+カーネルごとに 1 つのクライアントを保持し、チャネルの開始・終了を
+リクエストごとに行わずにサーバーの稼働期間中使い回す。
+IOPub / shell チャネルはそれぞれ 1 つの読み取りタスクが受信し、
+parent_header.msg_id をキーに要求ごとのキューへ振り分ける。
+振り分けの際に実行カウント・実行状態等を記録し、カーネルに問い合わせずに参照できるようにする。
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from jupyter_client import AsyncKernelClient
+
+from .variable_cache import VariableCache
+
+logger = logging.getLogger(__name__)
+
+# kernel_info による準備完了ハンドシェイクのタイムアウト（秒）
+READY_TIMEOUT = 30
+
+
+class ConnectionClosedError(RuntimeError):
+    """待機中に接続が閉じられた"""
+
+
+class PendingRequest:
+    """送信済み要求に対する応答メッセージの受信口"""
+
+    def __init__(self, conn: "KernelConnection", msg_id: str):
+        self.conn = conn
+        self.msg_id = msg_id
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def next(self, timeout: Optional[float] = None) -> dict:
+        """次のメッセージを取得（タイムアウト時は asyncio.TimeoutError）"""
+        msg = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        if msg is None:
+            raise ConnectionClosedError(f"Kernel connection closed: {self.conn.kernel_id}")
+        return msg
+
+    async def __aenter__(self) -> "PendingRequest":
+        return self
+
+    async def __aexit__(self, *exc):
+        self.conn.release(self.msg_id)
+
+
+class KernelConnection:
+    """1 つのカーネルに対する永続的なクライアント接続"""
+
+    def __init__(self, kernel_id: str, client: AsyncKernelClient):
+        self.kernel_id = kernel_id
+        self.client = client
+        self._routes: dict[str, PendingRequest] = {}
+        self._readers: list[asyncio.Task] = []
+        self._closed = False
+        # イントロスペクションエージェントを読み込み済みか
+        self.agent_installed = False
+        # 受信した execute_input の通番（他のクライアントの実行も含む）
+        self.input_seq = 0
+        # 受信した status: starting の回数（自動再起動で名前空間が空になったことを表す）
+        self.restarts = 0
+        self.variables = VariableCache()
+        # 受信したメッセージから記録するカーネルの状態
+        self.execution_count = 0
+        self.execution_state: Optional[str] = None
+        self.last_activity: Optional[datetime] = None
+        # 実行中の execute_request の msg_id
+        self.current_msg_id: Optional[str] = None
+        # 送信した execute_request のうち、カーネルが処理を終えていないもの
+        self._outstanding: dict[str, asyncio.Future] = {}
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    async def open(self, timeout: float = READY_TIMEOUT):
+        """チャネルを開始し、kernel_info の応答で準備完了を確認する"""
+        self.client.start_channels()
+        try:
+            await self.client.wait_for_ready(timeout=timeout)
+        except BaseException:
+            self.close()
+            raise
+        # ハンドシェイク後に読み取りタスクを開始（以降チャネルを直接読まない）
+        self._readers = [
+            asyncio.ensure_future(self._read_loop("iopub", self.client.get_iopub_msg)),
+            asyncio.ensure_future(self._read_loop("shell", self.client.get_shell_msg)),
+        ]
+        try:
+            await self._seed(timeout)
+        except BaseException:
+            # 送信の失敗・取り消し等（読み取りタスクとチャネルを残さない）
+            self.close()
+            raise
+
+    async def _seed(self, timeout: float):
+        """接続前の実行カウントを取得する
+
+        空のコードを履歴に残さずに実行し、execute_reply の execution_count
+        （最後に実行したセルの番号）と完了後の実行状態を記録させる。
+        """
+        async with self.execute("", silent=True, store_history=False) as request:
+            try:
+                while True:
+                    msg = await request.next(timeout=timeout)
+                    if msg["header"]["msg_type"] == "status" and msg["content"].get("execution_state") == "idle":
+                        break
+            except asyncio.TimeoutError:
+                # 応答は振り分けの際に記録される
+                logger.warning("Timed out reading execution count of kernel %s", self.kernel_id)
+
+    async def _read_loop(self, channel: str, get_msg):
+        """チャネルからメッセージを読み続け、要求ごとに振り分ける"""
+        while not self._closed:
+            try:
+                msg = await get_msg()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self._closed:
+                    break
+                logger.warning("Failed to read %s message from kernel %s: %s", channel, self.kernel_id, e)
+                await asyncio.sleep(0.1)
+                continue
+            msg["channel"] = channel
+            self._dispatch(msg)
+
+    def _dispatch(self, msg: dict):
+        self._track(msg)
+        parent_id = msg.get("parent_header", {}).get("msg_id")
+        request = self._routes.get(parent_id)
+        if request is not None:
+            request.queue.put_nowait(msg)
+
+    def _track(self, msg: dict):
+        """メッセージからカーネルの状態を記録する（他のクライアントの実行も含む）"""
+        msg_type = msg["header"]["msg_type"]
+        content = msg.get("content", {})
+        parent = msg.get("parent_header", {})
+        self.last_activity = datetime.now(timezone.utc)
+
+        if msg_type == "execute_input":
+            self.input_seq += 1
+            self.execution_count = content.get("execution_count", self.execution_count)
+        elif msg_type == "execute_reply":
+            self.execution_count = content.get("execution_count", self.execution_count)
+        elif msg_type == "status":
+            state = content.get("execution_state")
+            if state == "starting":
+                self.restarts += 1
+            if parent.get("msg_type") == "execute_request" or state == "starting":
+                # kernel_info 等の短い要求や control チャネルの状態は反映しない
+                self.execution_state = state
+                if state == "busy":
+                    self.current_msg_id = parent.get("msg_id")
+                elif self.current_msg_id == parent.get("msg_id"):
+                    self.current_msg_id = None
+                if state == "idle":
+                    finished = self._outstanding.pop(parent.get("msg_id"), None)
+                    if finished is not None and not finished.done():
+                        finished.set_result(None)
+
+    def execute(self, code: str, **kwargs) -> PendingRequest:
+        """execute_request を送信し、応答の受信口を返す"""
+        if self._closed:
+            raise ConnectionClosedError(f"Kernel connection closed: {self.kernel_id}")
+        # 送信から登録までの間に await を挟まないため取りこぼしは発生しない
+        msg_id = self.client.execute(code, **kwargs)
+        request = PendingRequest(self, msg_id)
+        self._routes[msg_id] = request
+        self._outstanding[msg_id] = asyncio.get_event_loop().create_future()
+        return request
+
+    def unfinished(self, msg_ids: list) -> list:
+        """カーネルが処理を終えていない（実行中・実行待ちの）要求の msg_id"""
+        return [msg_id for msg_id in msg_ids if msg_id in self._outstanding]
+
+    async def wait_finished(self, msg_ids: list, timeout: float) -> bool:
+        """要求がすべて処理を終えるまで待つ（タイムアウトした場合は False）"""
+        futures = [self._outstanding[msg_id] for msg_id in self.unfinished(msg_ids)]
+        if not futures:
+            return True
+        _, pending = await asyncio.wait(futures, timeout=timeout)
+        return not pending
+
+    def release(self, msg_id: str):
+        """要求の振り分けを解除（以降のメッセージは破棄される）"""
+        self._routes.pop(msg_id, None)
+
+    def close(self):
+        """読み取りタスクとチャネルを停止"""
+        if self._closed:
+            return
+        self._closed = True
+        for task in self._readers:
+            task.cancel()
+        for request in self._routes.values():
+            request.queue.put_nowait(None)
+        self._routes.clear()
+        for finished in self._outstanding.values():
+            finished.cancel()
+        self._outstanding.clear()
+        self.client.stop_channels()
+
+
+class KernelConnectionPool:
+    """カーネル ID ごとの KernelConnection を管理するプール"""
+
+    def __init__(self, kernel_manager):
+        self.kernel_manager = kernel_manager
+        self._connections: dict[str, KernelConnection] = {}
+        # 接続確立中のタスク（同時要求で二重に接続しないため）
+        self._pending: dict[str, asyncio.Task] = {}
+
+    async def get(self, kernel_id: str) -> KernelConnection:
+        """接続を取得（未接続の場合は確立する）"""
+        conn = self._connections.get(kernel_id)
+        if conn is not None and not conn.closed:
+            return conn
+
+        return await asyncio.shield(self._start(kernel_id))
+
+    def connect_in_background(self, kernel_id: str):
+        """接続の確立を開始して待たずに戻る（確立済み・確立中の場合は何もしない）"""
+        if self.peek(kernel_id) is None:
+            self._start(kernel_id)
+
+    def _start(self, kernel_id: str) -> asyncio.Task:
+        task = self._pending.get(kernel_id)
+        if task is None:
+            task = asyncio.ensure_future(self._connect(kernel_id))
+            self._pending[kernel_id] = task
+            task.add_done_callback(lambda t: self._forget_pending(kernel_id, t))
+        return task
+
+    def _forget_pending(self, kernel_id: str, task: asyncio.Task):
+        if self._pending.get(kernel_id) is task:
+            del self._pending[kernel_id]
+        # 待つ側が無い場合も失敗を記録する（例外の取得で未取得の警告も抑える）
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Failed to connect to kernel %s: %s", kernel_id, task.exception())
+
+    async def _connect(self, kernel_id: str) -> KernelConnection:
+        self.prune()
+        kernel = self.kernel_manager.get_kernel(kernel_id)
+        conn = KernelConnection(kernel_id, kernel.client())
+        await conn.open()
+        self._connections[kernel_id] = conn
+        return conn
+
+    def peek(self, kernel_id: str) -> Optional[KernelConnection]:
+        """確立済みの接続を取得（未接続の場合は None）"""
+        conn = self._connections.get(kernel_id)
+        return conn if conn is not None and not conn.closed else None
+
+    def close(self, kernel_id: str):
+        """指定カーネルの接続を閉じる（停止・再起動時に呼ぶ）"""
+        task = self._pending.pop(kernel_id, None)
+        if task is not None:
+            task.cancel()
+        conn: Optional[KernelConnection] = self._connections.pop(kernel_id, None)
+        if conn is not None:
+            conn.close()
+
+    def close_all(self):
+        """すべての接続を閉じる"""
+        for kernel_id in list(self._connections):
+            self.close(kernel_id)
+
+    def prune(self):
+        """カーネルマネージャーに存在しないカーネルの接続を破棄"""
+        for kernel_id in list(self._connections):
+            if kernel_id not in self.kernel_manager:
+                self.close(kernel_id)
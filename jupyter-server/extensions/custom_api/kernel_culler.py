@@ -0,0 +1,193 @@
+"""
+アイドルカーネルの停止
+
+最後に使われてから KERNEL_TIMEOUT 秒が経過したカーネルを定期的に停止する。利用可能な
+メモリが少ない場合は、タイムアウト前でも最後に使われた時刻が古いアイドルカーネルから順に、
+メモリが回復するまで停止する。実行中・実行待ちのあるカーネルとプールのカーネルは停止しない。
+
+停止の前にユーザー変数をファイルに保存できる（KERNEL_CULL_SNAPSHOT）。
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
+from . import config
+from .kernel_connection import KernelConnectionPool
+from .kernel_executor import KernelExecutor
+from .kernel_pool import KernelPool, available_memory
+from .scheduler import ExecutionScheduler
+
+logger = logging.getLogger(__name__)
+
+# 停止の理由
+IDLE = "idle"
+MEMORY = "memory"
+
+
+class KernelCuller:
+    """アイドルカーネルの定期的な停止"""
+
+    def __init__(
+        self,
+        kernel_manager,
+        connections: KernelConnectionPool,
+        scheduler: ExecutionScheduler,
+        kernel_pool: KernelPool,
+        timeout: int = config.KERNEL_TIMEOUT,
+        interval: int = config.KERNEL_CULL_INTERVAL,
+        min_available_memory: int = config.KERNEL_CULL_MIN_AVAILABLE_MEMORY,
+        memory_min_idle: int = config.KERNEL_CULL_MEMORY_MIN_IDLE,
+        snapshot: bool = bool(config.KERNEL_CULL_SNAPSHOT),
+        snapshot_dir: str = config.KERNEL_CULL_SNAPSHOT_DIR,
+        snapshot_timeout: int = config.KERNEL_CULL_SNAPSHOT_TIMEOUT,
+    ):
+        self.kernel_manager = kernel_manager
+        self.connections = connections
+        self.scheduler = scheduler
+        self.kernel_pool = kernel_pool
+        self.timeout = timeout
+        self.interval = interval
+        self.min_available_memory = min_available_memory
+        self.memory_min_idle = memory_min_idle
+        self.snapshot = snapshot
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_timeout = snapshot_timeout
+
+        # 理由ごとの停止したカーネル数
+        self.culled = {IDLE: 0, MEMORY: 0}
+        self.snapshots_saved = 0
+        self.snapshots_failed = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.timeout > 0 or self.min_available_memory > 0
+
+    def start(self):
+        """定期的な確認を開始する"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.cull()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to cull idle kernels")
+
+    def _idle_seconds(self, kernel_id: str, now: datetime) -> Optional[float]:
+        """最後に使われてからの秒数（停止の対象外の場合は None）
+
+        最後に使われた時刻は、Jupyter Server がカーネルの出力から記録する時刻と
+        本拡張機能の接続が受信した時刻のうち新しい方。
+        """
+        if kernel_id not in self.kernel_manager or self.kernel_pool.is_pooled(kernel_id):
+            return None
+        if not self.scheduler.is_idle(kernel_id):
+            return None
+        kernel = self.kernel_manager.get_kernel(kernel_id)
+        if kernel.execution_state == "busy":
+            return None
+        times = [kernel.last_activity]
+        conn = self.connections.peek(kernel_id)
+        if conn is not None:
+            if conn.execution_state == "busy":
+                return None
+            times.append(conn.last_activity)
+        times = [t for t in times if t is not None]
+        if not times:
+            return None
+        return (now - max(times)).total_seconds()
+
+    def idle_kernels(self) -> list:
+        """停止できるカーネルの (アイドル秒数, カーネル ID)（最後に使われた時刻が古い順）"""
+        now = datetime.now(timezone.utc)
+        kernels = []
+        for kernel_id in self.kernel_manager.list_kernel_ids():
+            seconds = self._idle_seconds(kernel_id, now)
+            if seconds is not None:
+                kernels.append((seconds, kernel_id))
+        kernels.sort(reverse=True)
+        return kernels
+
+    async def cull(self):
+        """タイムアウトしたカーネルと、メモリが少ない場合は古いアイドルカーネルを停止する"""
+        if self.timeout > 0:
+            for seconds, kernel_id in self.idle_kernels():
+                if seconds < self.timeout:
+                    break
+                await self._cull(kernel_id, IDLE, seconds)
+
+        if self.min_available_memory > 0:
+            memory = available_memory()
+            if memory is None or memory >= self.min_available_memory:
+                return
+            for seconds, kernel_id in self.idle_kernels():
+                if seconds < self.memory_min_idle:
+                    break
+                await self._cull(kernel_id, MEMORY, seconds, memory)
+                # 停止したカーネルのメモリは解放済み
+                memory = available_memory()
+                if memory is None or memory >= self.min_available_memory:
+                    return
+            if any(not self.kernel_pool.is_pooled(k) for k in self.kernel_manager.list_kernel_ids()):
+                logger.warning(
+                    "Available memory %d bytes is below %d bytes and no idle kernel can be stopped",
+                    memory, self.min_available_memory,
+                )
+
+    async def _cull(self, kernel_id: str, reason: str, idle_seconds: float, memory: Optional[int] = None):
+        snapshot_path = await self._snapshot(kernel_id) if self.snapshot else None
+        # 確認・保存の間に実行が始まっていないか
+        if kernel_id not in self.kernel_manager or not self.scheduler.is_idle(kernel_id):
+            logger.info("Kernel %s became active, not culling", kernel_id)
+            return
+
+        logger.info(
+            "Culling kernel %s: reason=%s idle=%ds available_memory=%s snapshot=%s",
+            kernel_id, reason, idle_seconds, memory, snapshot_path,
+        )
+        self.connections.close(kernel_id)
+        try:
+            await self.kernel_manager.shutdown_kernel(kernel_id)
+        except Exception:
+            logger.exception("Failed to shut down kernel %s", kernel_id)
+            return
+        self.scheduler.forget(kernel_id)
+        self.culled[reason] += 1
+
+    async def _snapshot(self, kernel_id: str) -> Optional[str]:
+        """ユーザー変数をファイルに保存する（保存できなかった場合も停止は続ける）"""
+        path = os.path.join(self.snapshot_dir, f"{kernel_id}.pkl")
+        executor = KernelExecutor(kernel_id, self.connections, scheduler=self.scheduler)
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            result = await executor.call_agent("snapshot_namespace", timeout=self.snapshot_timeout, path=path)
+        except Exception as e:
+            self.snapshots_failed += 1
+            logger.warning("Failed to save snapshot of kernel %s: %s", kernel_id, e)
+            return None
+        self.snapshots_saved += 1
+        if result["skipped"]:
+            logger.info("Snapshot of kernel %s skipped variables: %s", kernel_id, ", ".join(result["skipped"]))
+        return path
+
+    def stats(self) -> dict:
+        return {
+            "timeout": self.timeout,
+            "culled_idle": self.culled[IDLE],
+            "culled_memory": self.culled[MEMORY],
+            "snapshots_saved": self.snapshots_saved,
+            "snapshots_failed": self.snapshots_failed,
+        }
@@ -5,249 +5,489 @@ Jupyter カーネルとの通信を管理し、コード実行と変数取得を
 """
 
 import asyncio
-import base64
 import json
-from typing import Any, Optional
-
-from jupyter_client import AsyncKernelClient
-from jupyter_client.session import Session
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, AsyncIterator, Optional
+
+from . import config, metrics
+from .execution_guard import RUNNING, TIMEOUT, ExecutionGuard, ExecutionTimeoutError
+from .image_processing import ImageOptions, pick_figure, prepare_image_async
+from .image_store import ImageStore
+from .kernel_connection import KernelConnection, KernelConnectionPool, PendingRequest
+from .output_buffer import OutputBuffer, SpillStore
+from .scheduler import ExecutionScheduler
+
+
+class AgentError(RuntimeError):
+    """エージェント関数がカーネル内で例外を送出した"""
+
+    def __init__(self, ename: str, evalue: str):
+        super().__init__(f"{ename}: {evalue}")
+        self.ename = ename
+        self.evalue = evalue
+
+
+# カーネル内でエージェントを登録するモジュール名
+AGENT_MODULE = "_custom_api_agent"
+
+
+@lru_cache(maxsize=1)
+def _agent_source() -> str:
+    """カーネルへ送るエージェントのソース"""
+    return (Path(__file__).parent / "kernel_agent.py").read_text(encoding="utf-8")
+
+
+class ResultCollector:
+    """実行イベントを 1 回分の実行結果にまとめる"""
+
+    def __init__(self, spills: Optional[SpillStore] = None):
+        # stream 出力は上限付きバッファに結合して保持
+        self.output_buffer = OutputBuffer(spills=spills)
+        self.images = []
+        self.result = None
+        self.error = None
+        self.execution_count = 0
+        self.status = None
+
+    def add(self, event: dict):
+        kind = event.pop("event")
+        if kind == "stream":
+            self.output_buffer.append(event["type"], event["text"])
+        elif kind == "image":
+            self.images.append(event)
+        elif kind == "result":
+            self.result = event["result"]
+        elif kind == "error":
+            self.error = event["error"]
+        elif kind == "done":
+            self.execution_count = event["execution_count"]
+            self.status = event.get("status")
+
+    def close(self):
+        self.output_buffer.close()
+
+    def held_bytes(self) -> int:
+        """保持している出力のおおよそのバイト数（インラインの図を含む）"""
+        size = self.output_buffer.held_bytes
+        for image in self.images:
+            data = image.get("data")
+            if data is not None:
+                size += len(data) if isinstance(data, str) else len(json.dumps(data))
+        if self.result is not None:
+            size += len(self.result)
+        return size
+
+    def as_dict(self) -> dict:
+        return {
+            "success": self.error is None and self.status != "aborted",
+            "execution_count": self.execution_count,
+            "outputs": self.output_buffer.outputs(),
+            "output_truncated": self.output_buffer.truncation_info(),
+            "result": self.result,
+            "images": self.images,
+            "error": self.error,
+        }
 
 
 class KernelExecutor:
     """カーネルとの通信を管理するクラス"""
 
-    def __init__(self, kernel_id: str, kernel_manager):
+    def __init__(
+        self,
+        kernel_id: str,
+        connections: KernelConnectionPool,
+        image_store: Optional[ImageStore] = None,
+        scheduler: Optional[ExecutionScheduler] = None,
+        guard: Optional[ExecutionGuard] = None,
+        spills: Optional[SpillStore] = None,
+    ):
         self.kernel_id = kernel_id
-        self.kernel_manager = kernel_manager
+        self.connections = connections
+        self.image_store = image_store
+        # エージェント呼び出しを interactive 優先度で待ち行列に入れる
+        # （ユーザーコードの実行は呼び出し側が待ち行列に入れる）
+        self.scheduler = scheduler
+        # タイムアウトした実行を打ち切る
+        self.guard = guard
+        # 上限を超えた出力の退避先
+        self.spills = spills
+        # 最後に送信した execute_request の msg_id（切断時の打ち切り用）
+        self.inflight: list = []
+        # 実行の段階ごとの所要時間（秒）と出力の文字数（メトリクス用）
+        self.timings = {"connect": 0.0, "output": 0.0}
+        self.output_chars = 0
+
+    async def _image_event(self, image_id: str, mime_type: str, value: Any, options: ImageOptions) -> dict:
+        """図の出力イベントを生成（変換と保存はワーカースレッドで行う）"""
+        started = time.perf_counter()
+        fields = await prepare_image_async(self.image_store, mime_type, value, options)
+        self.timings["output"] += time.perf_counter() - started
+        if "size" in fields:
+            metrics.IMAGE_BYTES.labels(fields["mime_type"]).observe(fields["size"])
+        return {"event": "image", "id": image_id, **fields}
+
+    async def _connect(self) -> KernelConnection:
+        """接続を取得し、所要時間を記録する"""
+        started = time.perf_counter()
+        conn = await self.connections.get(self.kernel_id)
+        self.timings["connect"] += time.perf_counter() - started
+        return conn
+
+    async def stream(
+        self,
+        code: str,
+        timeout: int = 30,
+        image_options: Optional[ImageOptions] = None,
+    ) -> AsyncIterator[dict]:
+        """コードを実行し、出力をイベントとして到着順に返す
+
+        図（PNG / SVG / Plotly）は image_options に従って変換し、画像ストアに保存して
+        参照（url, sha256）を返す。image_options.inline が True の場合はデータも含める。
+
+        イベントの種類（"event" キー）:
+            stream: 標準出力/標準エラー出力のチャンク
+            image:  画像出力
+            result: 実行結果（text/plain）
+            error:  実行エラー
+            done:   実行完了（execution_count を含む、常に最後）
+
+        タイムアウトした場合は実行を打ち切り、ExecutionTimeoutError を送出する。
+        """
+        conn = await self._connect()
+
+        # 送信した要求の応答だけが届く（同一カーネルへの同時要求と混ざらない）
+        async with conn.execute(code) as request:
+            self.inflight = [request.msg_id]
+            try:
+                async for event in self._stream_request(request, timeout, image_options or ImageOptions()):
+                    yield event
+            except TimeoutError as e:
+                raise await self._timed_out(e)
+
+    async def _timed_out(self, e: TimeoutError) -> ExecutionTimeoutError:
+        """タイムアウトした実行（後続の送信済みの要求を含む）を打ち切る"""
+        outcome = RUNNING
+        if self.guard is not None:
+            outcome = await self.guard.stop(self.kernel_id, self.inflight, TIMEOUT)
+        return ExecutionTimeoutError(str(e), outcome)
+
+    async def _stream_request(
+        self, request: PendingRequest, timeout: float, image_options: ImageOptions
+    ) -> AsyncIterator[dict]:
+        """送信済みの execute_request の応答をイベントとして返す（stream を参照）
+
+        done イベントには execute_reply の status（ok / error / aborted）も含める。
+        """
+        image_count = 0
+        execution_count = 0
+        status = None
+        idle = False
+        replied = False
+
+        deadline = asyncio.get_event_loop().time() + timeout
+
+        # IOPub の idle と shell の execute_reply の両方を受信したら完了
+        while not (idle and replied):
+            remaining = deadline - asyncio.get_event_loop().time()
+            if remaining <= 0:
+                raise TimeoutError(f"Execution timed out after {timeout} seconds")
 
-    def _parse_json_output(self, outputs: list) -> Optional[Any]:
-        """標準出力からJSON結果をパースする共通処理"""
-        for output in outputs:
-            if output.get("type") == "stdout":
+            try:
+                msg = await request.next(timeout=remaining)
+            except asyncio.TimeoutError:
+                continue
+
+            msg_type = msg["header"]["msg_type"]
+            content = msg["content"]
+
+            if msg_type == "execute_reply":
+                replied = True
+                status = content.get("status")
+                execution_count = content.get("execution_count", execution_count)
+
+            elif msg_type == "status":
+                if content.get("execution_state") == "idle":
+                    idle = True
+
+            elif msg_type == "execute_input":
+                execution_count = content.get("execution_count", 0)
+
+            elif msg_type == "stream":
+                text = content.get("text", "")
+                self.output_chars += len(text)
+                yield {
+                    "event": "stream",
+                    "type": content.get("name", "stdout"),
+                    "text": text,
+                }
+
+            elif msg_type in ("execute_result", "display_data"):
+                data = content.get("data", {})
+                if msg_type == "execute_result":
+                    execution_count = content.get("execution_count", 0)
+                    if "text/plain" in data:
+                        yield {"event": "result", "result": data["text/plain"]}
+
+                mime_type = pick_figure(data)
+                if mime_type is not None:
+                    image_count += 1
+                    yield await self._image_event(
+                        f"img-{image_count:03d}", mime_type, data[mime_type], image_options
+                    )
+
+            elif msg_type == "error":
+                yield {
+                    "event": "error",
+                    "error": {
+                        "type": content.get("ename", "Error"),
+                        "message": content.get("evalue", "Unknown error"),
+                        "traceback": content.get("traceback", []),
+                    },
+                }
+
+        yield {"event": "done", "execution_count": execution_count, "status": status}
+
+    async def stream_batch(
+        self,
+        codes: list,
+        timeout: int = 30,
+        stop_on_error: bool = True,
+        image_options: Optional[ImageOptions] = None,
+    ) -> AsyncIterator[dict]:
+        """複数のコードを順に実行し、出力をイベントとして返す
+
+        すべての execute_request を 1 つの接続で続けて送信し、カーネル側のキューで
+        順に実行させる（セルごとの往復を待たない）。stop_on_error が True の場合、
+        エラーになったセル以降はカーネルが実行せずに aborted として応答する。
+
+        各イベントには "cell"（0 始まりの位置）を付ける。done はセルごとに送られる。
+        timeout はセルごとの待ち時間で、超過した場合は以降のセルも含めて実行を打ち切る。
+        """
+        image_options = image_options or ImageOptions()
+        conn = await self._connect()
+
+        requests = [conn.execute(code, stop_on_error=stop_on_error) for code in codes]
+        self.inflight = [request.msg_id for request in requests]
+        try:
+            for index, request in enumerate(requests):
                 try:
-                    return json.loads(output["text"].strip())
-                except (json.JSONDecodeError, KeyError):
-                    pass
-        return None
-
-    async def _get_client(self) -> AsyncKernelClient:
-        """カーネルクライアントを取得"""
-        kernel = self.kernel_manager.get_kernel(self.kernel_id)
-        client = kernel.client()
-        client.start_channels()
-        # チャンネルの準備を待つ
-        await asyncio.sleep(0.1)
-        return client
-
-    async def execute(self, code: str, timeout: int = 30) -> dict:
+                    async for event in self._stream_request(request, timeout, image_options):
+                        event["cell"] = index
+                        yield event
+                except TimeoutError as e:
+                    raise await self._timed_out(e)
+                conn.release(request.msg_id)
+        finally:
+            for request in requests:
+                conn.release(request.msg_id)
+
+    async def execute(self, code: str, timeout: int = 30, image_options: Optional[ImageOptions] = None) -> dict:
         """コードを実行"""
-        client = await self._get_client()
+        collector = ResultCollector(self.spills)
+        try:
+            async for event in self.stream(code, timeout=timeout, image_options=image_options):
+                collector.add(event)
+        finally:
+            collector.close()
+        return collector.as_dict()
+
+    async def execute_batch(
+        self,
+        codes: list,
+        timeout: int = 30,
+        stop_on_error: bool = True,
+        image_options: Optional[ImageOptions] = None,
+    ) -> dict:
+        """複数のコードを順に実行し、セルごとの結果をまとめて返す（stream_batch を参照）
+
+        各セルの status は ok / error / aborted（前のセルのエラーで実行されなかった）/
+        pending（タイムアウト等で完了を待たなかった）のいずれか。
+        """
+        loop = asyncio.get_event_loop()
+        started = loop.time()
+        cell_started = started
+        cells = []
+        collector = ResultCollector(self.spills)
+
+        def finish_cell(status: Optional[str] = None):
+            nonlocal collector, cell_started
+            collector.close()
+            now = loop.time()
+            cells.append({
+                "index": len(cells),
+                "status": status or collector.status or ("error" if collector.error else "ok"),
+                **collector.as_dict(),
+                "execution_time_ms": int((now - cell_started) * 1000),
+            })
+            collector = ResultCollector(self.spills)
+            cell_started = now
 
         try:
-            # コードを実行
-            msg_id = client.execute(code)
+            async for event in self.stream_batch(
+                codes, timeout=timeout, stop_on_error=stop_on_error, image_options=image_options
+            ):
+                event.pop("cell")
+                is_done = event["event"] == "done"
+                collector.add(event)
+                if is_done:
+                    finish_cell()
+        except Exception as e:
+            if len(cells) < len(codes):
+                collector.error = {"type": type(e).__name__, "message": str(e), "traceback": []}
+                if isinstance(e, ExecutionTimeoutError):
+                    collector.error.update(type="TimeoutError", outcome=e.outcome)
+                finish_cell("error")
+        finally:
+            collector.close()
 
-            # 結果を収集
-            outputs = []
-            images = []
-            result = None
-            error = None
-            execution_count = 0
+        for index in range(len(cells), len(codes)):
+            cells.append({"index": index, "status": "pending", "success": False})
 
-            deadline = asyncio.get_event_loop().time() + timeout
+        return {
+            "success": all(cell["success"] for cell in cells),
+            "cells": cells,
+            "execution_time_ms": int((loop.time() - started) * 1000),
+        }
 
+    async def _run_silent(self, conn: KernelConnection, code: str, user_expressions: dict, timeout: float) -> dict:
+        """履歴に残さずにコードを実行し、execute_reply の content を返す"""
+        async with conn.execute(
+            code, silent=True, store_history=False, user_expressions=user_expressions
+        ) as request:
+            deadline = asyncio.get_event_loop().time() + timeout
             while True:
                 remaining = deadline - asyncio.get_event_loop().time()
                 if remaining <= 0:
                     raise TimeoutError(f"Execution timed out after {timeout} seconds")
-
                 try:
-                    msg = await asyncio.wait_for(
-                        client.get_iopub_msg(),
-                        timeout=min(remaining, 1.0)
-                    )
+                    msg = await request.next(timeout=remaining)
                 except asyncio.TimeoutError:
                     continue
-
-                msg_type = msg["header"]["msg_type"]
-                content = msg["content"]
-
-                if msg_type == "status":
-                    if content.get("execution_state") == "idle":
-                        break
-
-                elif msg_type == "execute_input":
-                    execution_count = content.get("execution_count", 0)
-
-                elif msg_type == "stream":
-                    stream_name = content.get("name", "stdout")
-                    text = content.get("text", "")
-                    outputs.append({
-                        "type": stream_name,
-                        "text": text,
-                    })
-
-                elif msg_type == "execute_result":
-                    execution_count = content.get("execution_count", 0)
-                    data = content.get("data", {})
-                    if "text/plain" in data:
-                        result = data["text/plain"]
-
-                elif msg_type == "display_data":
-                    data = content.get("data", {})
-                    if "image/png" in data:
-                        img_data = data["image/png"]
-                        images.append({
-                            "id": f"img-{len(images) + 1:03d}",
-                            "mime_type": "image/png",
-                            "data": img_data,
-                        })
-
-                elif msg_type == "error":
-                    error = {
-                        "type": content.get("ename", "Error"),
-                        "message": content.get("evalue", "Unknown error"),
-                        "traceback": content.get("traceback", []),
-                    }
-
-            return {
-                "success": error is None,
-                "execution_count": execution_count,
-                "outputs": outputs,
-                "result": result,
-                "images": images,
-                "error": error,
-            }
-
+                if msg["header"]["msg_type"] == "execute_reply":
+                    return msg["content"]
+
+    async def _install_agent(self, conn: KernelConnection, timeout: float):
+        """イントロスペクションエージェントをカーネルに読み込む"""
+        code = (
+            "def __custom_api_install(source):\n"
+            "    import sys, types\n"
+            f"    module = types.ModuleType({AGENT_MODULE!r})\n"
+            f"    exec(compile(source, {AGENT_MODULE!r}, 'exec'), module.__dict__)\n"
+            f"    sys.modules[{AGENT_MODULE!r}] = module\n"
+            f"__custom_api_install({_agent_source()!r})\n"
+            "del __custom_api_install\n"
+        )
+        reply = await self._run_silent(conn, code, {}, timeout)
+        if reply.get("status") != "ok":
+            raise RuntimeError(f"Failed to load introspection agent: {reply.get('ename')}: {reply.get('evalue')}")
+        conn.agent_installed = True
+
+    async def warm_up(self, code: str = "", timeout: float = 60):
+        """使用前にカーネルを準備する（履歴に残さずにコードを実行し、エージェントを読み込む）"""
+        conn = await self.connections.get(self.kernel_id)
+        if code:
+            reply = await self._run_silent(conn, code, {}, timeout)
+            if reply.get("status") != "ok":
+                raise RuntimeError(f"Warm-up failed: {reply.get('ename')}: {reply.get('evalue')}")
+        await self._install_agent(conn, timeout)
+
+    async def call_agent(self, method: str, timeout: float = 10, **kwargs) -> Any:
+        """カーネル内のエージェント関数を呼び出し、結果を返す
+
+        実行中のセルの終了を待ち続けないよう、順番待ちにも timeout を適用する。
+
+        Raises:
+            QueueFullError: 実行待ち行列が上限に達している場合・timeout 秒以内に順番が来なかった場合
+        """
+        if self.scheduler is None:
+            return await self._call_agent(method, timeout, kwargs)
+        ticket = self.scheduler.admit(self.kernel_id, "interactive")
+        await ticket.wait(timeout)
+        async with ticket:
+            return await self._call_agent(method, timeout, kwargs)
+
+    async def _call_agent(self, method: str, timeout: float, kwargs: dict) -> Any:
+        conn = await self.connections.get(self.kernel_id)
+        expression = f"__import__({AGENT_MODULE!r}).call({method!r}, {json.dumps(kwargs)!r})"
+
+        for attempt in range(2):
+            if not conn.agent_installed:
+                await self._install_agent(conn, timeout)
+
+            reply = await self._run_silent(conn, "", {"result": expression}, timeout)
+            if reply.get("status") != "ok":
+                raise RuntimeError(f"{reply.get('ename', 'Error')}: {reply.get('evalue', '')}")
+
+            value = reply.get("user_expressions", {}).get("result", {})
+            if value.get("status") == "ok":
+                return value["data"]["application/json"]["result"]
+
+            # 再起動などでエージェントが失われていたら読み込み直して再試行する
+            if value.get("ename") == "ModuleNotFoundError" and attempt == 0:
+                conn.agent_installed = False
+                continue
+            raise AgentError(value.get("ename", "Error"), value.get("evalue", ""))
+
+    async def get_variables(self, since: Optional[str] = None) -> dict:
+        """定義済み変数の一覧を取得
+
+        前回の取得以降にカーネルがコードを実行していなければキャッシュから返す。
+        since にバージョンを指定した場合はそれ以降の追加・変更・削除のみを返す。
+        """
+        conn = await self.connections.get(self.kernel_id)
+
+        async def fetch() -> list:
+            return (
+                await self.call_agent(
+                    "list_variables",
+                    sample_rows=config.VARIABLE_SAMPLE_ROWS,
+                    max_bytes=config.VARIABLE_VALUE_MAX_BYTES,
+                )
+                or []
+            )
+
+        await conn.variables.refresh((conn.restarts, conn.input_seq), fetch)
+        return conn.variables.listing(since)
+
+    async def get_variable(
+        self, name: str, profile: str = "fast", sample_rows: int = config.VARIABLE_SAMPLE_ROWS
+    ) -> Optional[dict]:
+        """指定した変数の詳細を取得
+
+        Args:
+            name: 変数名
+            profile: "fast"（大きな DataFrame はサンプルから集計）または "exact"（全行を集計）
+            sample_rows: "fast" でサンプリングに切り替える行数の閾値
+        """
+        return await self.call_agent(
+            "get_variable",
+            name=name,
+            profile=profile,
+            sample_rows=sample_rows,
+            max_bytes=config.VARIABLE_VALUE_MAX_BYTES,
+        )
+
+    async def get_rows(
+        self,
+        name: str,
+        offset: int = 0,
+        limit: int = 100,
+        columns: Optional[list] = None,
+        sort: Optional[str] = None,
+        orient: str = "columnar",
+    ) -> Optional[dict]:
+        """DataFrame の指定範囲の行を取得"""
+        return await self.call_agent(
+            "get_rows", name=name, offset=offset, limit=limit, columns=columns, sort=sort, orient=orient
+        )
+
+    async def load_dataset(self, name: str, path: str, fmt: str, timeout: float, **options) -> dict:
+        """データファイルをカーネルの変数に読み込む（kernel_agent.load_dataset を参照）"""
+        conn = await self.connections.get(self.kernel_id)
+        try:
+            return await self.call_agent("load_dataset", timeout=timeout, name=name, path=path, format=fmt, **options)
         finally:
-            client.stop_channels()
-
-    async def get_execution_count(self) -> int:
-        """現在の実行カウントを取得"""
-        result = await self.execute("_execution_count = get_ipython().execution_count; _execution_count", timeout=5)
-        if result["success"] and result["result"]:
-            try:
-                return int(result["result"])
-            except (ValueError, TypeError):
-                return 0
-        return 0
-
-    async def get_variables(self) -> list:
-        """定義済み変数の一覧を取得"""
-        code = '''
-import json
-import sys
-
-def _get_variable_info():
-    from IPython import get_ipython
-    ip = get_ipython()
-    user_ns = ip.user_ns
-
-    # システム変数を除外
-    exclude = {'In', 'Out', 'get_ipython', 'exit', 'quit', '_', '__', '___',
-               '_i', '_ii', '_iii', '_oh', '_dh', '_sh', '_execution_count'}
-
-    variables = []
-    for name, value in user_ns.items():
-        if name.startswith('_') or name in exclude:
-            continue
-        if callable(value) and not hasattr(value, '__module__'):
-            continue
-        if hasattr(value, '__module__') and value.__module__ and value.__module__.startswith('IPython'):
-            continue
-
-        var_info = {
-            'name': name,
-            'type': type(value).__name__,
-        }
-
-        # DataFrameの場合
-        if type(value).__name__ == 'DataFrame':
-            var_info['size'] = f"{len(value)} rows × {len(value.columns)} cols"
-            var_info['memory_bytes'] = int(value.memory_usage(deep=True).sum())
-        # 単純な値の場合
-        elif type(value).__name__ in ('int', 'float', 'str', 'bool'):
-            var_info['value'] = value
-        # リストや辞書の場合
-        elif type(value).__name__ in ('list', 'dict'):
-            var_info['size'] = str(len(value))
-
-        variables.append(var_info)
-
-    return variables
-
-print(json.dumps(_get_variable_info()))
-del _get_variable_info
-'''
-        result = await self.execute(code, timeout=10)
-        if result["success"] and result["outputs"]:
-            parsed = self._parse_json_output(result["outputs"])
-            if parsed is not None:
-                return parsed
-        return []
-
-    async def get_variable(self, name: str) -> Optional[dict]:
-        """指定した変数の詳細を取得"""
-        code = f'''
-import json
-
-def _get_variable_detail(var_name):
-    from IPython import get_ipython
-    ip = get_ipython()
-
-    if var_name not in ip.user_ns:
-        return None
-
-    value = ip.user_ns[var_name]
-    var_info = {{
-        'name': var_name,
-        'type': type(value).__name__,
-    }}
-
-    # DataFrameの場合
-    if type(value).__name__ == 'DataFrame':
-        var_info['shape'] = list(value.shape)
-        var_info['columns'] = [
-            {{'name': str(col), 'dtype': str(value[col].dtype)}}
-            for col in value.columns
-        ]
-        var_info['head'] = value.head(5).to_dict(orient='records')
-
-        # describeを計算
-        describe = {{}}
-        for col in value.select_dtypes(include=['number']).columns:
-            stats = value[col].describe()
-            describe[str(col)] = {{
-                'count': int(stats.get('count', 0)),
-                'mean': float(stats.get('mean', 0)),
-                'std': float(stats.get('std', 0)) if 'std' in stats else None,
-                'min': float(stats.get('min', 0)),
-                'max': float(stats.get('max', 0)),
-            }}
-        var_info['describe'] = describe
-        var_info['memory_bytes'] = int(value.memory_usage(deep=True).sum())
-
-    # 単純な値の場合
-    elif type(value).__name__ in ('int', 'float', 'str', 'bool'):
-        var_info['value'] = value
-
-    # リストの場合
-    elif type(value).__name__ == 'list':
-        var_info['value'] = value[:100]  # 最大100要素
-        var_info['size'] = str(len(value))
-
-    # 辞書の場合
-    elif type(value).__name__ == 'dict':
-        var_info['value'] = dict(list(value.items())[:100])  # 最大100項目
-        var_info['size'] = str(len(value))
-
-    return var_info
-
-result = _get_variable_detail("{name}")
-print(json.dumps(result))
-del _get_variable_detail
-'''
-        result = await self.execute(code, timeout=10)
-        if result["success"] and result["outputs"]:
-            return self._parse_json_output(result["outputs"])
-        return None
+            # エージェントの呼び出しは execute_input を伴わないため、変数一覧を取得し直させる
+            conn.variables.invalidate()
@@ -0,0 +1,243 @@
+"""
+ウォームカーネルプール
+
+ウォームアップコード（pandas / numpy / matplotlib の import 等）を実行済みの
+カーネルをバックグラウンドで用意しておき、カーネル起動要求に即座に割り当てる。
+プールの大きさは直近の起動要求数に合わせて増減し、利用可能なメモリが少ない場合は
+新たに起動しない。プール内のカーネルは一覧等の API から見えない。
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Optional
+
+from . import config
+from .kernel_connection import KernelConnectionPool
+from .kernel_executor import KernelExecutor
+
+logger = logging.getLogger(__name__)
+
+# プールの大きさを見直す間隔（秒）
+CHECK_INTERVAL = 30
+
+# 起動要求数を数える期間（秒）
+RATE_WINDOW = 300
+
+# ウォームアップに失敗した後、補充を再開するまでの待ち時間の上限（秒、失敗のたびに倍にする）
+MAX_RETRY_INTERVAL = 600
+
+
+def available_memory() -> Optional[int]:
+    """利用可能なメモリ（バイト、取得できない場合は None）
+
+    /proc/meminfo の MemAvailable と cgroup v2 のメモリ上限の残りのうち小さい方。
+    """
+    values = []
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    values.append(int(line.split()[1]) * 1024)
+                    break
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open("/sys/fs/cgroup/memory.max") as f:
+            limit = f.read().strip()
+        if limit != "max":
+            with open("/sys/fs/cgroup/memory.current") as f:
+                values.append(int(limit) - int(f.read().strip()))
+    except (OSError, ValueError):
+        pass
+
+    return min(values) if values else None
+
+
+class KernelPool:
+    """ウォームアップ済みカーネルのプール"""
+
+    def __init__(
+        self,
+        kernel_manager,
+        connections: KernelConnectionPool,
+        size: int = config.KERNEL_POOL_SIZE,
+        max_size: int = config.KERNEL_POOL_MAX_SIZE,
+        kernel_name: str = config.KERNEL_POOL_KERNEL_NAME,
+        warmup_code: str = config.KERNEL_POOL_WARMUP,
+        warmup_timeout: float = config.KERNEL_POOL_WARMUP_TIMEOUT,
+        min_available_memory: int = config.KERNEL_POOL_MIN_AVAILABLE_MEMORY,
+        max_warmup_failures: int = config.KERNEL_POOL_MAX_WARMUP_FAILURES,
+    ):
+        self.kernel_manager = kernel_manager
+        self.connections = connections
+        self.size = size
+        self.max_size = max(max_size, size)
+        self.kernel_name = kernel_name
+        self.warmup_code = warmup_code
+        self.warmup_timeout = warmup_timeout
+        self.min_available_memory = min_available_memory
+        self.max_warmup_failures = max_warmup_failures
+
+        self.hits = 0
+        self.misses = 0
+        # 割り当て可能なカーネル（古い順）
+        self._ready: deque[str] = deque()
+        # 起動・ウォームアップ中のカーネル
+        self._warming: set[str] = set()
+        # 直近の起動要求の時刻
+        self._requests: deque[float] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        # 連続したウォームアップの失敗回数と、補充を再開する時刻
+        self.warmup_failures = 0
+        self._retry_at = 0.0
+        # 失敗が続いたためプールを停止した
+        self.disabled = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and not self.disabled
+
+    def start(self):
+        """プールの補充を開始する"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def close(self):
+        """補充を停止する（プールのカーネルはサーバーの終了時に停止される）"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def is_pooled(self, kernel_id: str) -> bool:
+        """割り当て前のプールのカーネルか"""
+        return kernel_id in self._warming or kernel_id in self._ready
+
+    def acquire(self, kernel_name: str) -> Optional[str]:
+        """ウォームアップ済みのカーネルを取り出す（無い場合は None）"""
+        if not self.enabled or kernel_name != self.kernel_name:
+            return None
+
+        self._requests.append(time.monotonic())
+        kernel_id = None
+        while self._ready:
+            candidate = self._ready.popleft()
+            if candidate in self.kernel_manager:
+                kernel_id = candidate
+                break
+
+        if kernel_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        # 取り出した分を非同期に補充する
+        self._wakeup.set()
+        return kernel_id
+
+    def target_size(self) -> int:
+        """直近の起動要求数に合わせたプールの大きさ（size 以上 max_size 以下）"""
+        cutoff = time.monotonic() - RATE_WINDOW
+        while self._requests and self._requests[0] < cutoff:
+            self._requests.popleft()
+        return min(max(self.size, len(self._requests)), self.max_size)
+
+    def stats(self) -> dict:
+        return {
+            "target_size": self.target_size() if self.enabled else 0,
+            "ready": len(self._ready),
+            "warming": len(self._warming),
+            "hits": self.hits,
+            "misses": self.misses,
+            "warmup_failures": self.warmup_failures,
+            "disabled": self.disabled,
+        }
+
+    async def _run(self):
+        """プールの大きさを定期的に（または取り出しのたびに）目標に合わせる"""
+        while self.enabled:
+            self._wakeup.clear()
+            try:
+                await self._reconcile()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to refill kernel pool")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=CHECK_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _reconcile(self):
+        # 停止されたカーネルを除く
+        for kernel_id in [k for k in self._ready if k not in self.kernel_manager]:
+            self._ready.remove(kernel_id)
+
+        target = self.target_size()
+        memory = available_memory()
+        if memory is not None and memory < self.min_available_memory:
+            # メモリが少ない場合は補充せず、待機中のカーネルも解放する
+            logger.info("Kernel pool paused: available memory %d bytes", memory)
+            target = 0
+
+        while len(self._ready) > target:
+            await self._shutdown(self._ready.pop())
+
+        missing = target - len(self._ready) - len(self._warming)
+        if missing > 0 and time.monotonic() >= self._retry_at:
+            await asyncio.gather(*(self._add() for _ in range(missing)))
+
+    async def _add(self):
+        """カーネルを起動してウォームアップし、プールに加える"""
+        kernel_id = str(uuid.uuid4())
+        # 起動中から一覧に表示されないよう、ID を先に登録する
+        self._warming.add(kernel_id)
+        try:
+            await self.kernel_manager.start_kernel(kernel_id=kernel_id, kernel_name=self.kernel_name)
+            executor = KernelExecutor(kernel_id, self.connections)
+            await executor.warm_up(self.warmup_code, timeout=self.warmup_timeout)
+        except asyncio.CancelledError:
+            self._warming.discard(kernel_id)
+            raise
+        except Exception as e:
+            self._warming.discard(kernel_id)
+            await self._shutdown(kernel_id)
+            self._warmup_failed(kernel_id, e)
+            return
+        self._warming.discard(kernel_id)
+        self._ready.append(kernel_id)
+        self.warmup_failures = 0
+        self._retry_at = 0.0
+
+    def _warmup_failed(self, kernel_id: str, error: Exception):
+        """失敗が続く場合は補充の間隔を広げ、上限回数に達したらプールを停止する"""
+        self.warmup_failures += 1
+        if self.warmup_failures == 1:
+            logger.error("Failed to warm up pooled kernel %s", kernel_id, exc_info=error)
+        if self.max_warmup_failures > 0 and self.warmup_failures >= self.max_warmup_failures:
+            if not self.disabled:
+                self.disabled = True
+                logger.error(
+                    "Kernel pool disabled after %d consecutive warm-up failures (last: %s); "
+                    "kernels are started on demand",
+                    self.warmup_failures, error,
+                )
+            return
+        delay = min(CHECK_INTERVAL * 2 ** (self.warmup_failures - 1), MAX_RETRY_INTERVAL)
+        self._retry_at = time.monotonic() + delay
+        if self.warmup_failures > 1:
+            logger.warning(
+                "Failed to warm up pooled kernel %s (%d consecutive failures): %s; retrying in %ds",
+                kernel_id, self.warmup_failures, error, delay,
+            )
+
+    async def _shutdown(self, kernel_id: str):
+        self.connections.close(kernel_id)
+        if kernel_id in self.kernel_manager:
+            try:
+                await self.kernel_manager.shutdown_kernel(kernel_id)
+            except Exception:
+                logger.exception("Failed to shut down pooled kernel %s", kernel_id)
@@ -0,0 +1,179 @@
+"""
+Prometheus メトリクス
+
+Jupyter Server の GET /metrics（prometheus_client の既定のレジストリ）に
+custom_api_ で始まるメトリクスを追加する。ハンドラーごとの応答時間は Jupyter Server の
+http_request_duration_seconds が記録する。
+
+実行のたびに記録するのはヒストグラムとカウンターの加算のみで、カーネル数・待ち行列の長さ等の
+状態は収集時（/metrics の取得時）に各コンポーネントから読み取る。
+"""
+
+from typing import Optional
+
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# 実行の段階
+#   queue:     実行待ち行列での待ち時間
+#   connect:   カーネルへの接続（未接続の場合はチャネルの確立を含む）
+#   kernel:    送信から完了までのうち、出力の処理を除いた時間（カーネルでの実行時間）
+#   output:    画像出力の変換・保存
+#   serialize: レスポンスの JSON エンコード
+#   write:     レスポンスの書き込み
+PHASES = ("queue", "connect", "kernel", "output", "serialize", "write")
+
+_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, float("inf"))
+_SIZE_BUCKETS = tuple(float(1024 * 4**i) for i in range(10)) + (float("inf"),)
+
+EXECUTE_PHASE_SECONDS = Histogram(
+    "custom_api_execute_phase_seconds",
+    "Time spent in each phase of a code execution",
+    ["endpoint", "phase"],
+    buckets=_LATENCY_BUCKETS,
+)
+EXECUTE_OUTPUT_CHARS = Histogram(
+    "custom_api_execute_output_chars",
+    "Number of stdout/stderr characters produced by one execution",
+    ["endpoint"],
+    buckets=_SIZE_BUCKETS,
+)
+IMAGE_BYTES = Histogram(
+    "custom_api_image_bytes",
+    "Size of images stored from execution outputs",
+    ["mime_type"],
+    buckets=_SIZE_BUCKETS,
+)
+REQUEST_BYTES = Counter(
+    "custom_api_request_bytes",
+    "Request body bytes received",
+    ["handler"],
+)
+RESPONSE_BYTES = Counter(
+    "custom_api_response_bytes",
+    "Response body bytes sent",
+    ["handler"],
+)
+
+
+def observe_phase(endpoint: str, phase: str, seconds: float):
+    EXECUTE_PHASE_SECONDS.labels(endpoint, phase).observe(seconds)
+
+
+def observe_execution(endpoint: str, executor, queue_wait_ms: Optional[int], run_seconds: float):
+    """1 回の実行（バッチの場合は全セル）の段階ごとの時間と出力サイズを記録する
+
+    run_seconds: 接続から完了までの時間（connect / output を除いた残りを kernel とする）
+    """
+    if queue_wait_ms is not None:
+        observe_phase(endpoint, "queue", queue_wait_ms / 1000)
+    timings = executor.timings
+    observe_phase(endpoint, "connect", timings["connect"])
+    observe_phase(endpoint, "output", timings["output"])
+    observe_phase(endpoint, "kernel", max(run_seconds - timings["connect"] - timings["output"], 0.0))
+    EXECUTE_OUTPUT_CHARS.labels(endpoint).observe(executor.output_chars)
+
+
+class CustomApiCollector:
+    """カーネル・待ち行列・ジョブ等の状態を収集時に読み取るコレクター"""
+
+    def __init__(self, settings: dict):
+        self.settings = settings
+
+    def collect(self):
+        kernel_manager = self.settings["kernel_manager"]
+        kernel_pool = self.settings["custom_api_kernel_pool"]
+        scheduler = self.settings["custom_api_scheduler"]
+        jobs = self.settings["custom_api_jobs"]
+        guard = self.settings["custom_api_execution_guard"]
+
+        kernel_ids = [k for k in kernel_manager.list_kernel_ids() if not kernel_pool.is_pooled(k)]
+        yield GaugeMetricFamily("custom_api_kernels_active", "Kernels started through the API", len(kernel_ids))
+
+        queue_depth = GaugeMetricFamily(
+            "custom_api_kernel_queue_depth", "Executions waiting in the kernel's queue", labels=["kernel_id"]
+        )
+        for kernel_id in kernel_ids:
+            queue_depth.add_metric([kernel_id], scheduler.queue_depth(kernel_id))
+        yield queue_depth
+
+        stats = scheduler.stats()
+        yield GaugeMetricFamily("custom_api_executions_running", "Executions holding a scheduler slot", stats["running"])
+        yield GaugeMetricFamily("custom_api_executions_queued", "Executions waiting for a scheduler slot", stats["queued"])
+
+        stats = kernel_pool.stats()
+        pool = GaugeMetricFamily("custom_api_kernel_pool_kernels", "Kernels in the warm pool", labels=["state"])
+        pool.add_metric(["ready"], stats["ready"])
+        pool.add_metric(["warming"], stats["warming"])
+        yield pool
+        acquires = CounterMetricFamily(
+            "custom_api_kernel_pool_acquires", "Kernel start requests served by the pool", labels=["result"]
+        )
+        acquires.add_metric(["hit"], stats["hits"])
+        acquires.add_metric(["miss"], stats["misses"])
+        yield acquires
+
+        stats = self.settings["custom_api_kernel_culler"].stats()
+        culled = CounterMetricFamily("custom_api_kernels_culled", "Kernels stopped by the culler", labels=["reason"])
+        culled.add_metric(["idle"], stats["culled_idle"])
+        culled.add_metric(["memory"], stats["culled_memory"])
+        yield culled
+        snapshots = CounterMetricFamily(
+            "custom_api_kernel_snapshots", "Namespace snapshots taken before culling", labels=["result"]
+        )
+        snapshots.add_metric(["saved"], stats["snapshots_saved"])
+        snapshots.add_metric(["failed"], stats["snapshots_failed"])
+        yield snapshots
+
+        stats = jobs.stats()
+        job_states = GaugeMetricFamily("custom_api_jobs", "Jobs held in the job store", labels=["status"])
+        for status, count in stats.items():
+            if status not in ("jobs", "output_bytes"):
+                job_states.add_metric([status], count)
+        yield job_states
+        yield GaugeMetricFamily(
+            "custom_api_job_output_bytes", "Output bytes held by finished jobs", stats["output_bytes"]
+        )
+
+        stats = self.settings["custom_api_notebook_cache"].stats()
+        notebooks = GaugeMetricFamily(
+            "custom_api_notebook_cache_documents", "Notebooks held in the cache", labels=["state"]
+        )
+        notebooks.add_metric(["clean"], stats["documents"] - stats["dirty"])
+        notebooks.add_metric(["dirty"], stats["dirty"])
+        yield notebooks
+        yield CounterMetricFamily("custom_api_notebook_saves", "Coalesced notebook saves", stats["saves"])
+        yield CounterMetricFamily(
+            "custom_api_notebook_conflicts", "Notebooks modified on disk while cached", stats["conflicts"]
+        )
+
+        stats = self.settings["custom_api_directory_lister"].stats()
+        listings = CounterMetricFamily(
+            "custom_api_contents_list_cache", "File listings served from the cache", labels=["result"]
+        )
+        listings.add_metric(["hit"], stats["hits"])
+        listings.add_metric(["miss"], stats["misses"])
+        yield listings
+
+        stops = CounterMetricFamily(
+            "custom_api_execution_stops", "Executions stopped after a timeout, disconnect or cancel", labels=["reason"]
+        )
+        for reason, count in guard.counts.items():
+            stops.add_metric([reason], count)
+        yield stops
+        outcomes = CounterMetricFamily(
+            "custom_api_execution_stop_outcomes", "Outcome of stopping executions", labels=["outcome"]
+        )
+        for outcome, count in guard.outcomes.items():
+            outcomes.add_metric([outcome], count)
+        yield outcomes
+
+
+def register_collector(settings: dict) -> CustomApiCollector:
+    collector = CustomApiCollector(settings)
+    REGISTRY.register(collector)
+    return collector
+
+
+def unregister_collector(collector: CustomApiCollector):
+    REGISTRY.unregister(collector)
@@ -0,0 +1,293 @@
+"""
+ノートブックのキャッシュ
+
+編集中のノートブックをメモリに保持し、セルの編集のたびにファイル全体を読み込み・保存
+しないようにする。編集後の保存は一定時間まとめてから行い（連続した編集は 1 回の保存になる）、
+キャッシュから外す際・停止時には未保存の変更を保存する。ファイルの更新時刻を確認し、
+他のクライアントによる変更を検出する。
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from tornado import web
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# セルの種類
+_CELL_TYPES = ("code", "markdown", "raw")
+
+
+class NotebookConflictError(RuntimeError):
+    """未保存の変更があるノートブックが他のクライアントにより変更された"""
+
+
+class CellOperationError(ValueError):
+    """セル操作が不正（index は操作の位置）"""
+
+    def __init__(self, message: str, index: int, invalid_cell_index: bool = False):
+        super().__init__(message)
+        self.index = index
+        self.invalid_cell_index = invalid_cell_index
+
+
+class NotebookDocument:
+    """キャッシュ中のノートブック"""
+
+    def __init__(self, path: str, content: dict, mtime: Any):
+        self.path = path
+        self.content = content
+        # 読み込み・保存時のファイルの更新時刻
+        self.mtime = mtime
+        self.dirty = False
+        # 最初の未保存の変更の時刻（保存を先送りする上限の判定用）
+        self.dirty_since: Optional[float] = None
+        self.last_access = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.save_timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def cells(self) -> list:
+        return self.content.setdefault("cells", [])
+
+
+def _new_cell(cell: dict) -> dict:
+    cell_type = cell.get("cell_type", "code")
+    if cell_type not in _CELL_TYPES:
+        raise ValueError(f"Invalid cell_type: {cell_type}")
+    new_cell = {
+        "cell_type": cell_type,
+        "source": cell.get("source", ""),
+        "metadata": cell.get("metadata") or {},
+    }
+    if cell_type == "code":
+        new_cell["outputs"] = []
+        new_cell["execution_count"] = None
+    return new_cell
+
+
+def _check_index(index: Any, size: int, position: int, name: str = "index"):
+    if not isinstance(index, int) or isinstance(index, bool) or index < 0 or index >= size:
+        raise CellOperationError(f"Invalid {name}: {index}", position, invalid_cell_index=True)
+
+
+def apply_operations(cells: list, operations: list) -> list:
+    """セル操作を順に適用した新しいセルのリストを返す（cells は変更しない）
+
+    操作は add / update / delete / move のいずれか。1 つでも不正な操作があれば
+    CellOperationError を送出し、どの操作も適用しない。
+    """
+    cells = list(cells)
+    for position, op in enumerate(operations):
+        if not isinstance(op, dict):
+            raise CellOperationError("Operation must be an object", position)
+        action = op.get("action")
+        cell = op.get("cell") or {}
+        index = op.get("index")
+        if not isinstance(cell, dict):
+            raise CellOperationError("cell must be an object", position)
+
+        try:
+            if action == "add":
+                new_cell = _new_cell(cell)
+                if isinstance(index, int) and 0 <= index <= len(cells):
+                    cells.insert(index, new_cell)
+                else:
+                    cells.append(new_cell)
+
+            elif action == "update":
+                _check_index(index, len(cells), position)
+                updated = dict(cells[index])
+                if cell.get("source") is not None:
+                    updated["source"] = cell["source"]
+                if cell.get("cell_type") is not None and cell["cell_type"] != updated.get("cell_type"):
+                    # 種類が変わる場合は出力等の種類ごとのフィールドを作り直す
+                    updated = {**_new_cell({**updated, "cell_type": cell["cell_type"]}), "source": updated["source"]}
+                if cell.get("metadata") is not None:
+                    updated["metadata"] = cell["metadata"]
+                cells[index] = updated
+
+            elif action == "delete":
+                _check_index(index, len(cells), position)
+                cells.pop(index)
+
+            elif action == "move":
+                _check_index(op.get("from"), len(cells), position, "from")
+                _check_index(op.get("to"), len(cells), position, "to")
+                cells.insert(op["to"], cells.pop(op["from"]))
+
+            else:
+                raise CellOperationError(f"Unknown action: {action}", position)
+        except CellOperationError:
+            raise
+        except ValueError as e:
+            raise CellOperationError(str(e), position)
+    return cells
+
+
+class NotebookCache:
+    """ノートブックのキャッシュと遅延保存"""
+
+    def __init__(
+        self,
+        contents_manager,
+        save_delay: float = config.NOTEBOOK_SAVE_DELAY,
+        max_save_delay: float = config.NOTEBOOK_SAVE_MAX_DELAY,
+        max_documents: int = config.NOTEBOOK_CACHE_MAX_DOCUMENTS,
+        idle_timeout: float = config.NOTEBOOK_CACHE_IDLE_TIMEOUT,
+    ):
+        self.contents_manager = contents_manager
+        self.save_delay = save_delay
+        self.max_save_delay = max_save_delay
+        self.max_documents = max_documents
+        self.idle_timeout = idle_timeout
+        # 最近使った順（末尾が最新）
+        self._documents: OrderedDict[str, NotebookDocument] = OrderedDict()
+        self.saves = 0
+        self.conflicts = 0
+
+    async def get(self, path: str) -> NotebookDocument:
+        """ノートブックを取得（キャッシュに無い・ファイルが変更された場合は読み込む）
+
+        Raises:
+            FileNotFoundError: ファイルが存在しない場合
+            ValueError: ノートブックではない場合
+            NotebookConflictError: 未保存の変更があるノートブックが他で変更された場合
+        """
+        doc = self._documents.get(path)
+        if doc is not None:
+            model = await self._get_model(path, content=False)
+            if model["last_modified"] == doc.mtime:
+                doc.last_access = time.monotonic()
+                self._documents.move_to_end(path)
+                return doc
+            # 他のクライアントによる変更
+            self._forget(path)
+            if doc.dirty:
+                self.conflicts += 1
+                raise NotebookConflictError(
+                    f"Notebook was modified on disk and unsaved edits were discarded: {path}"
+                )
+
+        model = await self._get_model(path, content=True)
+        if model["type"] != "notebook":
+            raise ValueError("Not a notebook")
+        doc = NotebookDocument(path, model["content"], model["last_modified"])
+        self._documents[path] = doc
+        await self._evict()
+        return doc
+
+    async def _get_model(self, path: str, content: bool) -> dict:
+        try:
+            return await self.contents_manager.get(path, content=content)
+        except web.HTTPError as e:
+            # ContentsManager は存在しないファイルを HTTP 404 で通知する
+            if e.status_code == 404:
+                raise FileNotFoundError(path) from e
+            raise
+
+    async def apply(self, path: str, operations: list) -> NotebookDocument:
+        """セル操作をまとめて適用し、保存を予約する（apply_operations を参照）"""
+        doc = await self.get(path)
+        async with doc.lock:
+            doc.content["cells"] = apply_operations(doc.cells, operations)
+            self._mark_dirty(doc)
+        return doc
+
+    async def discard(self, path: str):
+        """キャッシュから外す（上書き・削除の前に呼ぶ。未保存の変更は破棄する）
+
+        保存中の場合は保存が終わるまで待つ。
+        """
+        doc = self._forget(path)
+        if doc is not None:
+            async with doc.lock:
+                pass
+
+    def _mark_dirty(self, doc: NotebookDocument):
+        """保存を予約する（編集が続く間は先送りするが、最初の編集から max_save_delay 以内に保存する）"""
+        now = time.monotonic()
+        if not doc.dirty:
+            doc.dirty = True
+            doc.dirty_since = now
+        if doc.save_timer is not None:
+            doc.save_timer.cancel()
+        delay = min(self.save_delay, max(doc.dirty_since + self.max_save_delay - now, 0))
+        doc.save_timer = asyncio.get_event_loop().call_later(
+            delay, lambda: asyncio.ensure_future(self._flush_logged(doc))
+        )
+
+    async def _flush_logged(self, doc: NotebookDocument):
+        try:
+            await self.flush(doc)
+        except Exception:
+            logger.exception("Failed to save notebook %s", doc.path)
+
+    async def flush(self, doc: NotebookDocument):
+        """未保存の変更を保存する
+
+        ファイルが読み込み後に他で変更・削除されていた場合は保存せずにキャッシュから外す。
+        """
+        async with doc.lock:
+            if doc.save_timer is not None:
+                doc.save_timer.cancel()
+                doc.save_timer = None
+            if not doc.dirty or self._documents.get(doc.path) is not doc:
+                # キャッシュから外されたノートブックは保存しない
+                return
+            try:
+                current = await self._get_model(doc.path, content=False)
+            except FileNotFoundError:
+                current = None
+            if current is None or current["last_modified"] != doc.mtime:
+                self.conflicts += 1
+                logger.warning("Notebook %s was modified on disk, unsaved edits were discarded", doc.path)
+                self._forget(doc.path)
+                return
+
+            model = await self.contents_manager.save(
+                {"type": "notebook", "format": "json", "content": doc.content}, doc.path
+            )
+            doc.mtime = model["last_modified"]
+            doc.dirty = False
+            doc.dirty_since = None
+            self.saves += 1
+
+    async def flush_all(self):
+        for doc in list(self._documents.values()):
+            await self._flush_logged(doc)
+
+    async def _evict(self):
+        """使われていない・上限を超えた古いノートブックを保存してキャッシュから外す"""
+        now = time.monotonic()
+        for path, doc in list(self._documents.items()):
+            idle = now - doc.last_access > self.idle_timeout
+            if not idle and len(self._documents) <= self.max_documents:
+                break
+            await self._flush_logged(doc)
+            if self._documents.get(path) is doc and not doc.dirty:
+                del self._documents[path]
+
+    def _forget(self, path: str) -> Optional[NotebookDocument]:
+        doc = self._documents.pop(path, None)
+        if doc is not None and doc.save_timer is not None:
+            doc.save_timer.cancel()
+            doc.save_timer = None
+        return doc
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self._documents),
+            "dirty": sum(1 for doc in self._documents.values() if doc.dirty),
+            "saves": self.saves,
+            "conflicts": self.conflicts,
+        }
+
+    async def close(self):
+        """未保存の変更を保存する（停止時。保存の予約は取り消す）"""
+        await self.flush_all()
@@ -0,0 +1,351 @@
+"""
+実行出力バッファ
+
+stream 出力を追加時に同じ種類の連続する出力へ結合しながら蓄積し、1 回の実行で保持する
+サイズを上限内に収める。上限を超えた場合は先頭と末尾だけをメモリに残し、出力全体は
+ファイルに退避する（書き込みはワーカースレッドで行い、イベントループを止めない）。
+退避したファイルは GET /api/outputs/{id} で取得でき、合計サイズと経過時間に基づいて
+古いものから削除する。
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# 退避ファイルの書き込み用のワーカースレッド（1 つのみとし、書き込みの順序を保つ）
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="custom-api-spill")
+
+# 小さな断片はこの数・バイト数に達するごとに 1 つの文字列に結合する
+# （大きくしすぎると末尾を切り詰める際に大きな文字列をエンコードし直すことになる）
+_MERGE_PARTS = 64
+_MERGE_BYTES = 4096
+
+# 退避ファイルへはこのバイト数ごとにまとめて書き込む
+_SPILL_BATCH_BYTES = 64 * 1024
+
+# 末尾保持分はこのバイト数を超えて溜まるごとに切り詰める（出力を返す際は正確に切り詰める）
+_TRIM_SLACK = 64 * 1024
+
+
+def _encoded_size(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+class _Run:
+    """同じ stream の連続する出力"""
+
+    __slots__ = ("name", "parts", "size", "_pending", "_pending_bytes")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.parts: deque = deque()
+        self.size = 0
+        # 末尾のまだ結合していない小さな断片の数とバイト数
+        self._pending = 0
+        self._pending_bytes = 0
+
+    def append(self, text: str, size: int):
+        self.parts.append(text)
+        self.size += size
+        if size >= _MERGE_BYTES:
+            self._pending = self._pending_bytes = 0
+            return
+        self._pending += 1
+        self._pending_bytes += size
+        if self._pending >= _MERGE_PARTS or self._pending_bytes >= _MERGE_BYTES:
+            # 末尾を切り詰めた際に取り除かれた断片は数えない
+            count = min(self._pending, len(self.parts))
+            merged = [self.parts.pop() for _ in range(count)]
+            merged.reverse()
+            self.parts.append("".join(merged))
+            self._pending = self._pending_bytes = 0
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+class SpillStore:
+    """退避した出力ファイルの保存先（合計サイズと経過時間に基づいて古いものから削除）"""
+
+    def __init__(
+        self,
+        root: str = config.OUTPUT_SPILL_DIR,
+        max_bytes: int = config.OUTPUT_SPILL_MAX_BYTES,
+        max_age: int = config.OUTPUT_SPILL_MAX_AGE,
+        url_prefix: str = "/api/outputs",
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.url_prefix = url_prefix
+        # 前回の起動時に残ったファイルを削除する
+        _writer.submit(self._evict)
+
+    def url_for(self, spill_id: str) -> str:
+        return f"{self.url_prefix}/{spill_id}"
+
+    def path_for(self, spill_id: str) -> str:
+        return os.path.join(self.root, f"{spill_id}.log")
+
+    def create(self) -> str:
+        """新しい退避ファイルの ID（作成はワーカースレッドで行う）"""
+        _writer.submit(self._evict)
+        return uuid.uuid4().hex
+
+    async def get(self, spill_id: str) -> Optional[str]:
+        """退避ファイルのパス（存在しない・期限切れの場合は None）
+
+        それまでに依頼した書き込みが終わるのを待ってから返す。
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(_writer, self._find, spill_id)
+
+    def _find(self, spill_id: str) -> Optional[str]:
+        path = self.path_for(spill_id)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        if time.time() - mtime > self.max_age:
+            return None
+        return path
+
+    def _evict(self):
+        """期限切れと容量超過のファイルを古い順に削除（ワーカースレッドで実行）"""
+        try:
+            entries = [e for e in os.scandir(self.root) if e.is_file() and e.name.endswith(".log")]
+        except FileNotFoundError:
+            return
+        now = time.time()
+        files = []
+        total = 0
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.max_age:
+                self._remove(entry.path)
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class OutputBuffer:
+    """上限付きの stream 出力バッファ"""
+
+    def __init__(self, max_bytes: int = config.MAX_OUTPUT_SIZE, spills: Optional[SpillStore] = None):
+        self.max_bytes = max_bytes
+        # 退避先（None の場合は切り詰めた出力を保存しない）
+        self.spills = spills
+        # 切り詰め時は先頭側と末尾側にそれぞれ上限の半分ずつ割り当てる
+        self._head_budget = max_bytes // 2
+        self._tail_budget = max_bytes - self._head_budget
+        self._head: list = []  # _Run
+        self._head_bytes = 0
+        self._tail: deque = deque()  # _Run
+        self._tail_bytes = 0
+        self._total_bytes = 0
+        self._truncated = False
+        self._spill_id: Optional[str] = None
+        # 退避ファイルへの書き込み待ちの出力
+        self._spill_pending: list = []
+        self._spill_pending_bytes = 0
+        # 以下はワーカースレッドのみが扱う
+        self._spill_file = None
+
+    @property
+    def truncated(self) -> bool:
+        return self._truncated
+
+    @property
+    def held_bytes(self) -> int:
+        """メモリに保持している出力のバイト数"""
+        return self._head_bytes + self._tail_bytes
+
+    def append(self, stream_name: str, text: str):
+        """stream 出力を追加"""
+        if not text:
+            return
+        size = _encoded_size(text)
+        self._total_bytes += size
+
+        if not self._truncated:
+            if self._head_bytes + size <= self.max_bytes:
+                _append_run(self._head, stream_name, text, size)
+                self._head_bytes += size
+                return
+            # 上限を超えたので、これまでの出力をファイルへ退避して末尾保持に切り替える
+            self._start_spill()
+            self._split_head()
+            self._spill(text, size)
+            # 先頭側の予算の残りはこのチャンクの先頭で埋める（1 回の大きな出力でも先頭を残す）
+            room = self._head_budget - self._head_bytes
+            if room > 0:
+                head = text.encode("utf-8")[:room].decode("utf-8", errors="ignore")
+                head_size = _encoded_size(head)
+                _append_run(self._head, stream_name, head, head_size)
+                self._head_bytes += head_size
+                text = text[len(head):]
+                size -= head_size
+                if not text:
+                    return
+        else:
+            self._spill(text, size)
+
+        _append_run(self._tail, stream_name, text, size)
+        self._tail_bytes += size
+        self._trim_tail(_TRIM_SLACK)
+
+    def close(self):
+        """退避ファイルを閉じる"""
+        if self._spill_id is not None:
+            self._flush_spill()
+            _writer.submit(self._close_file)
+
+    def outputs(self) -> list:
+        """保持している出力を返す（切り詰めた場合は省略位置に注記を挟む）"""
+        self._trim_tail()
+        outputs = [{"type": run.name, "text": run.text()} for run in self._head]
+        if self._truncated:
+            info = self.truncation_info()
+            saved = f"; full output: {info['url']}" if info["url"] else ""
+            outputs.append({
+                "type": "stderr",
+                "text": f"\n... [{info['omitted_bytes']} bytes omitted{saved}] ...\n",
+            })
+            outputs.extend({"type": run.name, "text": run.text()} for run in self._tail)
+        return outputs
+
+    def truncation_info(self) -> Optional[dict]:
+        """切り詰め情報（切り詰めていない場合は None）"""
+        if not self._truncated:
+            return None
+        self._trim_tail()
+        return {
+            "total_bytes": self._total_bytes,
+            "omitted_bytes": self._total_bytes - self._head_bytes - self._tail_bytes,
+            "url": self.spills.url_for(self._spill_id) if self._spill_id is not None else None,
+        }
+
+    def _start_spill(self):
+        self._truncated = True
+        if self.spills is None:
+            return
+        self._spill_id = self.spills.create()
+        _writer.submit(self._open_file, self.spills.path_for(self._spill_id), [run.text() for run in self._head])
+
+    def _spill(self, text: str, size: int):
+        if self._spill_id is None:
+            return
+        self._spill_pending.append(text)
+        self._spill_pending_bytes += size
+        if self._spill_pending_bytes >= _SPILL_BATCH_BYTES:
+            self._flush_spill()
+
+    def _flush_spill(self):
+        if self._spill_pending:
+            _writer.submit(self._write_file, "".join(self._spill_pending))
+            self._spill_pending = []
+            self._spill_pending_bytes = 0
+
+    def _open_file(self, path: str, texts: list):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._spill_file = open(path, "w", encoding="utf-8")
+            for text in texts:
+                self._spill_file.write(text)
+        except OSError:
+            logger.exception("Failed to create output spill file %s", path)
+            self._close_file()
+
+    def _write_file(self, text: str):
+        if self._spill_file is None:
+            return
+        try:
+            self._spill_file.write(text)
+        except OSError:
+            logger.exception("Failed to write output spill file")
+            self._close_file()
+
+    def _close_file(self):
+        if self._spill_file is not None:
+            try:
+                self._spill_file.close()
+            except OSError:
+                pass
+            self._spill_file = None
+
+    def _split_head(self):
+        """先頭保持分を先頭側の予算まで縮める（超過分はファイルにのみ残る）"""
+        kept = []
+        kept_bytes = 0
+        for run in self._head:
+            if kept_bytes + run.size <= self._head_budget:
+                kept.append(run)
+                kept_bytes += run.size
+                continue
+            room = self._head_budget - kept_bytes
+            if room > 0:
+                part = run.text().encode("utf-8")[:room].decode("utf-8", errors="ignore")
+                cut = _Run(run.name)
+                cut.append(part, _encoded_size(part))
+                kept.append(cut)
+                kept_bytes += cut.size
+            break
+        self._head = kept
+        self._head_bytes = kept_bytes
+
+    def _trim_tail(self, slack: int = 0):
+        """末尾保持分が末尾側の予算を slack より多く超えていたら、予算まで古い方から捨てる"""
+        if self._tail_bytes <= self._tail_budget + slack:
+            return
+        while self._tail_bytes > self._tail_budget and self._tail:
+            run = self._tail[0]
+            excess = self._tail_bytes - self._tail_budget
+            if run.size <= excess:
+                self._tail.popleft()
+                self._tail_bytes -= run.size
+                continue
+            # 先頭の出力の古い断片から捨てる
+            while excess > 0 and run.parts:
+                part = run.parts[0]
+                part_size = _encoded_size(part)
+                if part_size <= excess:
+                    run.parts.popleft()
+                    removed = part_size
+                else:
+                    rest = part.encode("utf-8")[excess:].decode("utf-8", errors="ignore")
+                    run.parts[0] = rest
+                    removed = part_size - _encoded_size(rest)
+                run.size -= removed
+                self._tail_bytes -= removed
+                excess -= removed
+
+
+def _append_run(runs, name: str, text: str, size: int):
+    """直前の出力が同じ stream なら結合し、そうでなければ新しい出力を追加する"""
+    if not runs or runs[-1].name != name:
+        runs.append(_Run(name))
+    runs[-1].append(text, size)
@@ -0,0 +1,231 @@
+"""
+実行スケジューラー
+
+カーネルは 1 度に 1 つのセルしか実行できないため、カーネルごとの待ち行列で
+実行要求を 1 つずつ送る。待ち行列は優先度ごとの FIFO で、変数の取得などの
+対話的な要求をバッチ実行より先に通す。サーバー全体で同時に実行するカーネル数にも
+上限を設け、待ち行列が上限を超えた要求は待たせずに拒否する（429 Retry-After）。
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from typing import Optional
+
+from . import config
+
+# 優先度（先頭ほど優先）
+PRIORITIES = ("interactive", "normal", "batch")
+
+# 実行時間の移動平均の重み
+_EWMA_WEIGHT = 0.2
+
+# 実行時間の平均の初期値（秒）
+_DEFAULT_RUN_SECONDS = 1.0
+
+# Retry-After の上限（秒）
+MAX_RETRY_AFTER = 300
+
+
+class QueueFullError(Exception):
+    """待ち行列が上限に達しているため要求を受け付けられない"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """待ち行列に入った 1 つの実行要求
+
+    async with で実行の順番が来るまで待ち、抜けると次の要求に順番を渡す。
+    """
+
+    def __init__(self, scheduler: "ExecutionScheduler", kernel_id: str, priority: str):
+        self.scheduler = scheduler
+        self.kernel_id = kernel_id
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.cancelled = False
+        self._granted = asyncio.get_event_loop().create_future()
+
+    @property
+    def wait_ms(self) -> int:
+        """順番が来るまで待った時間（ミリ秒）"""
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return int((end - self.enqueued_at) * 1000)
+
+    async def __aenter__(self) -> "Ticket":
+        await self.wait()
+        return self
+
+    async def wait(self, timeout: Optional[float] = None):
+        """順番が来るまで待つ
+
+        Raises:
+            QueueFullError: timeout 秒以内に順番が来なかった場合（順番待ちは取り消す）
+        """
+        try:
+            await asyncio.wait_for(self._granted, timeout)
+        except asyncio.TimeoutError:
+            self.scheduler._cancel(self)
+            raise QueueFullError(
+                f"Kernel {self.kernel_id} is busy (waited {timeout:g}s in the execution queue)",
+                self.scheduler.retry_after(self.kernel_id),
+            ) from None
+        except asyncio.CancelledError:
+            self.scheduler._cancel(self)
+            raise
+
+    async def __aexit__(self, *exc):
+        self.scheduler._release(self)
+
+
+class _KernelQueue:
+    """1 つのカーネルの待ち行列"""
+
+    def __init__(self):
+        self.waiting: list = []  # (priority, seq, ticket) のヒープ
+        self.depth = 0
+        self.running: Optional[Ticket] = None
+        self.avg_run_seconds = _DEFAULT_RUN_SECONDS
+
+    def head(self) -> Optional[tuple]:
+        """取り消し済みを除いた先頭の要素"""
+        while self.waiting and self.waiting[0][2].cancelled:
+            heapq.heappop(self.waiting)
+        return self.waiting[0] if self.waiting else None
+
+
+class ExecutionScheduler:
+    """カーネルごとの優先度付き待ち行列と全体の同時実行数の上限"""
+
+    def __init__(
+        self,
+        max_concurrent: int = config.EXECUTION_MAX_CONCURRENT,
+        max_queue: int = config.EXECUTION_MAX_QUEUE,
+        max_queue_total: int = config.EXECUTION_MAX_QUEUE_TOTAL,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_total = max_queue_total
+        self._queues: dict[str, _KernelQueue] = {}
+        self._seq = itertools.count()
+        self._running = 0
+        self._waiting = 0
+        self._avg_wait_ms = 0.0
+
+    def admit(self, kernel_id: str, priority: str = "normal") -> Ticket:
+        """実行要求を待ち行列に入れる
+
+        Raises:
+            QueueFullError: カーネルまたは全体の待ち行列が上限に達している場合
+        """
+        queue = self._queues.setdefault(kernel_id, _KernelQueue())
+        if queue.depth >= self.max_queue:
+            raise QueueFullError(
+                f"Too many pending executions for kernel {kernel_id} ({queue.depth})",
+                self._retry_after(queue),
+            )
+        if self._waiting >= self.max_queue_total:
+            raise QueueFullError(f"Too many pending executions ({self._waiting})", self._retry_after(queue))
+
+        ticket = Ticket(self, kernel_id, priority)
+        heapq.heappush(queue.waiting, (PRIORITIES.index(priority), next(self._seq), ticket))
+        queue.depth += 1
+        self._waiting += 1
+        self._dispatch()
+        return ticket
+
+    def retry_after(self, kernel_id: str) -> int:
+        """カーネルの待ち行列が空くまでの見込み時間（秒）"""
+        return self._retry_after(self._queues.get(kernel_id) or _KernelQueue())
+
+    def _retry_after(self, queue: _KernelQueue) -> int:
+        """待ち行列が空くまでの見込み時間（秒）
+
+        実行中の要求が平均より長く続いている場合は、経過時間と同じだけ続くとみなす。
+        """
+        current = queue.avg_run_seconds
+        if queue.running is not None and queue.running.started_at is not None:
+            current = max(current, time.monotonic() - queue.running.started_at)
+        estimate = current + queue.avg_run_seconds * queue.depth
+        return min(max(math.ceil(estimate), 1), MAX_RETRY_AFTER)
+
+    def _dispatch(self):
+        """空いている枠に、優先度・到着順で先頭の要求を割り当てる"""
+        while self._running < self.max_concurrent:
+            best = None
+            for queue in self._queues.values():
+                if queue.running is not None:
+                    continue
+                head = queue.head()
+                if head is not None and (best is None or head[:2] < best[1][:2]):
+                    best = (queue, head)
+            if best is None:
+                return
+
+            queue, (_, _, ticket) = best
+            heapq.heappop(queue.waiting)
+            queue.depth -= 1
+            self._waiting -= 1
+            if ticket._granted.cancelled():
+                # 待機中のタスクが取り消された（_cancel より先にここへ来た）
+                ticket.cancelled = True
+                continue
+            queue.running = ticket
+            self._running += 1
+            ticket.started_at = time.monotonic()
+            self._avg_wait_ms += _EWMA_WEIGHT * (ticket.wait_ms - self._avg_wait_ms)
+            ticket._granted.set_result(None)
+
+    def _release(self, ticket: Ticket):
+        """実行を終えた要求の枠を解放する"""
+        queue = self._queues.get(ticket.kernel_id)
+        if queue is None or queue.running is not ticket:
+            return
+        elapsed = time.monotonic() - ticket.started_at
+        queue.avg_run_seconds += _EWMA_WEIGHT * (elapsed - queue.avg_run_seconds)
+        queue.running = None
+        self._running -= 1
+        self._dispatch()
+
+    def _cancel(self, ticket: Ticket):
+        """順番待ちを取り消す（割り当て済みなら解放する）"""
+        if ticket._granted.done() and not ticket._granted.cancelled():
+            self._release(ticket)
+            return
+        queue = self._queues.get(ticket.kernel_id)
+        if queue is None or ticket.cancelled:
+            return
+        # ヒープからは先頭に来たときに取り除く
+        ticket.cancelled = True
+        queue.depth -= 1
+        self._waiting -= 1
+
+    def forget(self, kernel_id: str):
+        """停止したカーネルの待ち行列を破棄する（実行中・待機中の要求が無い場合のみ）"""
+        queue = self._queues.get(kernel_id)
+        if queue is not None and queue.running is None and queue.depth == 0:
+            del self._queues[kernel_id]
+
+    def is_idle(self, kernel_id: str) -> bool:
+        """カーネルに実行中・待機中の要求が無いか"""
+        queue = self._queues.get(kernel_id)
+        return queue is None or (queue.running is None and queue.depth == 0)
+
+    def queue_depth(self, kernel_id: str) -> int:
+        """カーネルの待ち行列の長さ（実行中を除く）"""
+        queue = self._queues.get(kernel_id)
+        return queue.depth if queue is not None else 0
+
+    def stats(self) -> dict:
+        return {
+            "running": self._running,
+            "queued": self._waiting,
+            "max_concurrent": self.max_concurrent,
+            "avg_queue_wait_ms": int(self._avg_wait_ms),
+        }
@@ -0,0 +1,164 @@
+"""
+レスポンスのシリアライズと圧縮
+
+JSON エンコードは orjson が利用可能な場合はそれを使い、無い場合・エンコードできない値
+（64 ビットを超える整数等）を含む場合は標準の json で行う。どちらも非 ASCII 文字は
+そのまま、未対応の型は str() で出力し、NaN / Infinity は null にする。
+大きなレスポンスはエンコードと圧縮をワーカースレッドで行い、イベントループを止めない。
+"""
+
+import asyncio
+import gzip
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from . import config
+
+try:
+    import orjson
+except ImportError:  # orjson が無い環境では標準の json を使う
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli が無い環境では gzip のみ
+    brotli = None
+
+# 圧縮レベル（応答ごとに圧縮するため速度を優先）
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+# 大きさの見積もりで辿る要素数の上限（超えた場合は大きいとみなす）
+_ESTIMATE_MAX_NODES = 10000
+
+# エンコード・圧縮用のワーカースレッド
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="custom-api-json")
+
+
+def _finite(value: Any) -> Any:
+    """NaN / Infinity を None に置き換える（orjson と同じ出力にする）"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {
+            "null" if isinstance(k, float) and not math.isfinite(k) else k: _finite(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [_finite(v) for v in value]
+    return value
+
+
+def _dumps_json(data: Any) -> bytes:
+    try:
+        text = json.dumps(data, ensure_ascii=False, default=str, allow_nan=False)
+    except ValueError:
+        # NaN / Infinity を含む場合のみ置き換えてからエンコードする
+        text = json.dumps(_finite(data), ensure_ascii=False, default=str, allow_nan=False)
+    return text.encode("utf-8")
+
+
+if orjson is not None:
+    # 日時・dataclass は標準の json と同じく default（str）に渡す
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def _dumps_orjson(data: Any) -> bytes:
+        try:
+            return orjson.dumps(data, default=str, option=_ORJSON_OPTIONS)
+        except TypeError:
+            # orjson でエンコードできない値（64 ビットを超える整数等）
+            return _dumps_json(data)
+
+
+_SERIALIZERS: dict[str, Callable[[Any], bytes]] = {"json": _dumps_json}
+if orjson is not None:
+    _SERIALIZERS["orjson"] = _dumps_orjson
+
+
+def get_serializer(name: str = config.JSON_SERIALIZER) -> Callable[[Any], bytes]:
+    """名前に対応するエンコード関数（auto は利用可能な中で最も速いもの）"""
+    if name == "auto":
+        return _SERIALIZERS.get("orjson", _dumps_json)
+    if name not in _SERIALIZERS:
+        raise ValueError(f"Unavailable JSON serializer: {name} (available: {', '.join(_SERIALIZERS)})")
+    return _SERIALIZERS[name]
+
+
+dumps = get_serializer()
+
+
+def is_large(data: Any, threshold: int = config.JSON_OFFLOAD_MIN_BYTES) -> bool:
+    """エンコード後の大きさが threshold バイトを超えそうか
+
+    文字列の長さを合計して見積もり、超えた時点または辿った要素数が上限に達した時点で打ち切る。
+    """
+    total = 0
+    nodes = 0
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        nodes += 1
+        if nodes > _ESTIMATE_MAX_NODES:
+            return True
+        if isinstance(value, str):
+            total += len(value)
+        elif isinstance(value, dict):
+            total += len(value) * 8
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            total += len(value)
+            stack.extend(value)
+        else:
+            total += 8
+        if total > threshold:
+            return True
+    return False
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Accept-Encoding から使用する圧縮方式を選ぶ（br を優先、q=0 は除外）"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def encode(data: Any, encoding: Optional[str], min_bytes: int = config.RESPONSE_COMPRESS_MIN_BYTES) -> tuple:
+    """エンコードし、min_bytes 以上の場合は圧縮する
+
+    Returns:
+        (body, 使用した圧縮方式。圧縮しなかった場合は None)
+    """
+    body = dumps(data)
+    if encoding is None or len(body) < min_bytes:
+        return body, None
+    return compress(body, encoding), encoding
+
+
+async def encode_async(data: Any, encoding: Optional[str]) -> tuple:
+    """encode と同じ（大きい場合はワーカースレッドで行う）"""
+    if not is_large(data):
+        return encode(data, encoding)
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(_executor, encode, data, encoding)
@@ -0,0 +1,122 @@
+"""
+変数一覧キャッシュ
+
+カーネルごとに直近の変数一覧を保持し、変数ごとにバージョンを付けて
+`since` 以降の追加・変更・削除だけを返せるようにする。
+カーネルがコードを実行・再起動していなければ（execute_input・status: starting を受信していなければ）
+カーネルに問い合わせずにキャッシュから返し、同時の更新要求は 1 回の取得にまとめる。
+"""
+
+import asyncio
+import uuid
+from typing import Awaitable, Callable, Optional
+
+# 保持する削除済み変数の記録の上限
+MAX_REMOVED = 1000
+
+
+class VariableCache:
+    """1 つのカーネルの変数一覧とバージョン"""
+
+    def __init__(self):
+        # トークンの接頭辞（再起動・再接続前のトークンと区別するため）
+        self.epoch = uuid.uuid4().hex[:8]
+        self._version = 0
+        self._entries: dict[str, tuple[int, dict, Optional[str]]] = {}  # name -> (version, summary, content_digest)
+        self._removed: dict[str, int] = {}  # name -> version
+        self._state: Optional[tuple] = None
+        self._inflight: Optional[asyncio.Future] = None
+        self._inflight_state: Optional[tuple] = None
+
+    @property
+    def token(self) -> str:
+        return f"{self.epoch}-{self._version}"
+
+    def invalidate(self):
+        """次回の取得でカーネルに問い合わせ直す"""
+        self._state = None
+
+    async def refresh(self, state: tuple, fetch: Callable[[], Awaitable[list]]):
+        """カーネルの状態が変わっていれば変数一覧を取得し直す
+
+        Args:
+            state: 接続が受信した status: starting の回数と execute_input の通番
+            fetch: カーネルから変数一覧を取得する関数
+        """
+        if self._state == state:
+            return
+
+        # 同じ状態に対する取得が進行中なら相乗りする
+        if self._inflight is not None and self._inflight_state == state:
+            await asyncio.shield(self._inflight)
+            return
+
+        future = asyncio.ensure_future(fetch())
+        self._inflight = future
+        self._inflight_state = state
+        try:
+            variables = await asyncio.shield(future)
+        finally:
+            if self._inflight is future:
+                self._inflight = None
+                self._inflight_state = None
+        self._apply(variables)
+        self._state = state
+
+    def _apply(self, variables: list):
+        """取得した一覧と比較してバージョンを更新"""
+        current = {}
+        for summary in variables:
+            name = summary["name"]
+            # DataFrame 等は要約が同じでも内容が変わっていれば変更とする
+            digest = summary.pop("content_digest", None)
+            previous = self._entries.get(name)
+            if previous is not None and previous[1] == summary and previous[2] == digest:
+                current[name] = previous
+                continue
+            self._version += 1
+            current[name] = (self._version, summary, digest)
+            self._removed.pop(name, None)
+
+        for name in self._entries.keys() - current.keys():
+            self._version += 1
+            self._removed[name] = self._version
+        if len(self._removed) > MAX_REMOVED:
+            oldest = sorted(self._removed, key=self._removed.get)[: len(self._removed) - MAX_REMOVED]
+            for name in oldest:
+                del self._removed[name]
+
+        self._entries = current
+
+    def listing(self, since: Optional[str] = None) -> dict:
+        """変数一覧を返す（since を指定した場合はそれ以降の差分のみ）"""
+        since_version = self._parse_token(since)
+        if since_version is None:
+            result = {
+                "variables": [summary for _, summary, _ in self._entries.values()],
+                "version": self.token,
+            }
+            if since:
+                # 基準にできないトークン（再起動前など）の場合は全件を返す
+                result["removed"] = []
+                result["full"] = True
+            return result
+
+        return {
+            "variables": [summary for version, summary, _ in self._entries.values() if version > since_version],
+            "removed": [name for name, version in self._removed.items() if version > since_version],
+            "version": self.token,
+            "full": False,
+        }
+
+    def _parse_token(self, since: Optional[str]) -> Optional[int]:
+        """差分の基準にできるトークンならバージョン番号を返す"""
+        if not since:
+            return None
+        epoch, _, version = since.partition("-")
+        if epoch != self.epoch or not version.isdigit() or int(version) > self._version:
+            return None
+        # 削除記録を破棄した範囲より前のトークンは差分を正しく返せない
+        if len(self._removed) >= MAX_REMOVED and int(version) < min(self._removed.values()):
+            return None
+        return int(version)